@@ -0,0 +1,312 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+import contextlib
+import numpy as np
+import pandas as pd
+import traj_supplement.supplement as supplement_module
+from traj_denoising.denoising import Denoising
+from traj_simplify.simplify import Simplify
+from traj_supplement.supplement import Supplement
+from traj_acquisition.fleet_generator import generate_fleet
+from utils.basic_utils import examine_and_update_raw_data, cal_traj_info, geojson_to_pd, pd_to_geojson
+from utils.coordinates import CoordinatesTransform
+from utils.traj_data import TrajData
+
+
+class StubTrajAcquisition:
+    """
+    路径规划的替身（不调用接口）：返回缺失段起终点连线上每100米一个轨迹点，可指定模拟的接口耗时
+    """
+    latency = 0
+
+    def __init__(self, origin, destination, logger=None, **kwargs):
+        self.origin = [float(value) for value in origin.split(',')]
+        self.destination = [float(value) for value in destination.split(',')]
+        self.logger = logger
+
+    def process(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        point_num = 20
+        ratio = np.linspace(0, 1, point_num)
+        data = pd.DataFrame({'lng': self.origin[0] + ratio * (self.destination[0] - self.origin[0]),
+                             'lat': self.origin[1] + ratio * (self.destination[1] - self.origin[1])})
+        return pd_to_geojson(data, {})
+
+
+class ErrorCollector(logging.Handler):
+    """
+    收集测试用例执行过程中的错误日志：各模块的process()会捕获异常、只记录错误日志，据此判断测试用例是否执行失败
+    """
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def check_meta(key):
+    """
+    检查处理结果（geojson或TrajData）的meta中是否包含指定字段，即处理环节是否顺利完成
+    :param key: meta中的字段，例如noise_info
+    :return: 检查函数（输入处理结果，返回错误信息，检查通过时为""）
+    """
+    def check(result):
+        meta = result.meta if isinstance(result, TrajData) else (result or {}).get("meta")
+        return "" if meta and key in meta else f"处理结果的meta中缺少{key}"
+    return check
+
+
+def get_commit():
+    """
+    当前代码版本（git提交），用于对比不同提交的测试结果
+    :return: 提交哈希，获取失败时返回"unknown"
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def measure(func, repeat, check, error_collector):
+    """
+    执行测试用例：先重复执行统计耗时（取最小值、中位数），再单独执行一次统计峰值内存（tracemalloc会拖慢执行速度）
+    每次执行后检查结果，执行失败（检查未通过或者有错误日志）时不再统计，避免记录失败的耗时
+    :param func: 测试用例（无参函数）
+    :param repeat: 重复次数
+    :param check: 结果检查函数（返回错误信息，检查通过时为""）
+    :param error_collector: 错误日志收集器
+    :return: 最小耗时、耗时中位数（单位：s），峰值内存（单位：MB），错误信息（执行成功时为""）
+    """
+    wall_times = []
+    for _ in range(repeat):
+        error_collector.messages.clear()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                result = func()
+                wall_times.append(time.perf_counter() - start)
+        except Exception as e:
+            return None, None, None, f"执行异常：{e}"
+        error = "；".join(error_collector.messages) or check(result)
+        if error:
+            return None, None, None, error
+
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(wall_times), float(np.median(wall_times)), peak_memory / 1024 / 1024, ""
+
+
+def build_cases(data_path, data_name, logger, route_plan_concurrency):
+    """
+    构建单个轨迹文件的测试用例：各模块主流程、轨迹检查、轨迹信息分析、坐标转换
+    :param data_path: 轨迹文件路径
+    :param data_name: 轨迹文件名称
+    :param logger: 日志对象
+    :param route_plan_concurrency: 路径规划并发数
+    :return: 测试用例（名称 ==> (无参函数, 结果检查函数)）
+    """
+    kwargs = {"data_path": data_path, "data_name": data_name, "logger": logger}
+    with open(os.path.join(data_path, data_name), encoding='utf-8') as f:
+        pd_data, coordinates = geojson_to_pd(json.load(f))
+    _, checked_data, _ = examine_and_update_raw_data(pd_data.copy())
+    coordinates = np.asarray(coordinates, dtype=float)
+
+    def check_coordinates(result):
+        # 坐标转换的结果与输入的形状一致，且均为有效值
+        if result.shape != coordinates.shape or not np.isfinite(result).all():
+            return "坐标转换结果的形状不一致或者包含无效值"
+        return ""
+
+    def check_examine(result):
+        available_flag, _, key_msg = result
+        return "" if available_flag else f"轨迹数据检查未通过：{key_msg}"
+
+    def check_traj_info(result):
+        return "" if result else "轨迹信息为空"
+
+    # 测试轨迹包含噪点、缺失段，各模块的结果均应包含对应的信息
+    cases = {
+        "denoising": (lambda: Denoising(**kwargs).process(), check_meta("noise_info")),
+        "simplify_interval_oriented": (lambda: Simplify(simplify_mode="interval_oriented", **kwargs).process(),
+                                       check_meta("simplify_info")),
+        "simplify_downclocking": (lambda: Simplify(simplify_mode="downclocking", **kwargs).process(),
+                                  check_meta("simplify_info")),
+        "simplify_rdp": (lambda: Simplify(simplify_mode="rdp", **kwargs).process(), check_meta("simplify_info")),
+        "simplify_opening_window": (lambda: Simplify(simplify_mode="opening_window", **kwargs).process(),
+                                    check_meta("simplify_info")),
+        "supplement_interpolate": (lambda: Supplement(supplement_mode="interpolate", **kwargs).process(),
+                                   check_meta("missing_supplement_info")),
+        "supplement_route_plan": (lambda: Supplement(supplement_mode="route_plan",
+                                                     route_plan_concurrency=route_plan_concurrency,
+                                                     **kwargs).process(),
+                                  check_meta("missing_supplement_info")),
+        "examine_and_update_raw_data": (lambda: examine_and_update_raw_data(pd_data.copy()), check_examine),
+        "cal_traj_info": (lambda: cal_traj_info(checked_data), check_traj_info),
+        "wgs84_to_gcj02": (lambda: CoordinatesTransform().coord_transform_array(coordinates, "wgs84", "gcj02"),
+                           check_coordinates),
+        "gcj02_to_wgs84": (lambda: CoordinatesTransform().coord_transform_array(coordinates, "gcj02", "wgs84"),
+                           check_coordinates),
+        "wgs84_to_bd09ll": (lambda: CoordinatesTransform().coord_transform_array(coordinates, "wgs84", "bd09ll"),
+                            check_coordinates),
+        "wgs84_to_gcj02_table": (lambda: CoordinatesTransform("table").coord_transform_array(coordinates, "wgs84",
+                                                                                              "gcj02"),
+                                 check_coordinates),
+        "gcj02_to_wgs84_table": (lambda: CoordinatesTransform("table").coord_transform_array(coordinates, "gcj02",
+                                                                                              "wgs84"),
+                                 check_coordinates),
+        "gcj02_to_wgs84_high": (lambda: CoordinatesTransform().coord_transform_array(coordinates, "gcj02", "wgs84",
+                                                                                     precision="high"),
+                                check_coordinates),
+    }
+    return cases
+
+
+def run_benchmark(sizes, repeat=3, cases=None, route_plan_latency=0, route_plan_concurrency=4, random_state=0):
+    """
+    性能测试：按轨迹点数量生成测试轨迹（包含孤立噪点、噪点簇、缺失段），统计各测试用例的耗时、吞吐量、峰值内存
+    :param sizes: 轨迹点数量列表
+    :param repeat: 每个测试用例重复执行的次数
+    :param cases: 需执行的测试用例名称，默认全部执行
+    :param route_plan_latency: 路径规划替身模拟的接口耗时（单位：s）
+    :param route_plan_concurrency: 路径规划并发数
+    :param random_state: 随机种子（测试轨迹）
+    :return: 测试结果（执行失败的测试用例不统计耗时，status为failed）
+    """
+    logger = logging.getLogger(__name__)
+    logger.propagate = False
+    # 只收集错误日志，用于判断测试用例是否执行失败
+    error_collector = ErrorCollector()
+    logger.handlers = [error_collector]
+
+    # 路径规划使用替身，不依赖网络
+    raw_traj_acquisition = supplement_module.TrajAcquisition
+    supplement_module.TrajAcquisition = StubTrajAcquisition
+    StubTrajAcquisition.latency = route_plan_latency
+
+    data_path = tempfile.mkdtemp(prefix="traj_benchmark_")
+    results = []
+    try:
+        for size in sizes:
+            file_path = generate_fleet(os.path.join(data_path, str(size)), vehicle_num=1, point_num=size,
+                                       noise_num=3, noise_cluster_num=1, missing_num=2, random_state=random_state)[0]
+            size_cases = build_cases(os.path.dirname(file_path), os.path.basename(file_path), logger,
+                                     route_plan_concurrency)
+            for name, (func, check) in size_cases.items():
+                if cases and name not in cases:
+                    continue
+                wall_time, wall_time_median, peak_memory, error = measure(func, repeat, check, error_collector)
+                if error:
+                    results.append({"case": name, "size": size, "status": "failed", "error": error})
+                    print(f"{name:<30}{size:>10}  执行失败：{error}")
+                    continue
+                result = {"case": name,
+                          "size": size,
+                          "status": "success",
+                          "wall_time": round(wall_time, 6),
+                          "wall_time_median": round(wall_time_median, 6),
+                          "points_per_second": round(size / wall_time, 1) if wall_time > 0 else None,
+                          "peak_memory_mb": round(peak_memory, 3)}
+                results.append(result)
+                print(f"{name:<30}{size:>10}{wall_time:>12.4f}s{result['points_per_second']:>16.1f} pts/s"
+                      f"{peak_memory:>12.2f} MB")
+    finally:
+        supplement_module.TrajAcquisition = raw_traj_acquisition
+        shutil.rmtree(data_path, ignore_errors=True)
+
+    return {"commit": get_commit(),
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "route_plan_latency": route_plan_latency,
+            "route_plan_concurrency": route_plan_concurrency,
+            "results": results}
+
+
+def compare_results(results, baseline, threshold=1.2):
+    """
+    与基准结果对比：耗时超过基准的threshold倍视为性能回退
+    :param results: 本次测试结果
+    :param baseline: 基准测试结果
+    :param threshold: 回退阈值
+    :return: 性能回退的测试用例
+    """
+    baseline_info = {(result["case"], result["size"]): result for result in baseline["results"]}
+    regressions = []
+    print(f"对比基准：{baseline.get('commit', 'unknown')} ==> {results['commit']}")
+    for result in results["results"]:
+        base_result = baseline_info.get((result["case"], result["size"]))
+        # 执行失败的测试用例没有耗时，不参与对比
+        if result.get("wall_time") is None or base_result is None or not base_result.get("wall_time"):
+            continue
+        ratio = result["wall_time"] / base_result["wall_time"]
+        flag = ""
+        if ratio > threshold:
+            flag = "（回退）"
+            regressions.append({"case": result["case"], "size": result["size"], "ratio": round(ratio, 3)})
+        print(f"{result['case']:<30}{result['size']:>10}{base_result['wall_time']:>12.4f}s"
+              f"{result['wall_time']:>12.4f}s{ratio:>8.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="性能测试：各模块在不同轨迹点数量下的耗时、吞吐量、峰值内存")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="轨迹点数量，以','分隔")
+    parser.add_argument("--repeat", type=int, default=3, help="每个测试用例重复执行的次数")
+    parser.add_argument("--cases", default="", help="需执行的测试用例，以','分隔，默认全部执行")
+    parser.add_argument("--route-plan-latency", type=float, default=0, help="路径规划替身模拟的接口耗时（单位：s）")
+    parser.add_argument("--route-plan-concurrency", type=int, default=4, help="路径规划并发数")
+    parser.add_argument("--output", default="", help="测试结果文件（json），默认为benchmark/results/<提交>.json")
+    parser.add_argument("--compare", default="", help="基准测试结果文件（json），对比耗时")
+    parser.add_argument("--threshold", type=float, default=1.2, help="耗时超过基准的倍数，视为性能回退")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    results = run_benchmark(sizes, args.repeat, cases, args.route_plan_latency, args.route_plan_concurrency)
+
+    output = args.output or os.path.join("benchmark", "results", f"{results['commit']}.json")
+    output_dir = os.path.dirname(output)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=4)
+    print(f"测试结果已保存：{output}")
+
+    failures = [{"case": result["case"], "size": result["size"]} for result in results["results"]
+                if result.get("status") == "failed"]
+    if failures:
+        print(f"{len(failures)}个测试用例执行失败：{failures}")
+        sys.exit(1)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)}个测试用例性能回退：{regressions}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
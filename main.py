@@ -7,6 +7,7 @@ import pandas as pd
 from traj_denoising.denoising import Denoising, DenoisingItem
 from traj_simplify.simplify import Simplify, SimplifyItem
 from traj_supplement.supplement import Supplement, SupplementItem
+from traj_pipeline.pipeline import Pipeline, PipelineItem
 
 import logging
 log_dir = './logs'
@@ -156,6 +157,30 @@ def traj_supplement_test():
         print(e)
         return None
 
+def traj_pipeline_test():
+    """
+    测试轨迹处理全流程（降噪 → 补全 → 抽稀，轨迹数据在内存中传递）
+    :return:
+    """
+    path = r'data/raw_data'
+    save_path = r'data/result_data'
+
+    file = '缺失段.json'
+    stages = [{"stage": "denoising", "denoising_level": "low"},
+              {"stage": "supplement", "supplement_mode": "interpolate"},
+              {"stage": "simplify", "simplify_mode": "rdp"}]
+    inputs = {'data_path': path, "save_path": save_path, 'data_name': file, 'stages': stages, "logger": logger}
+
+    try:
+        # 虽然logger不是必需字段，但是为了代码正常执行需要传入
+        PipelineItem(**inputs)
+        traj_pipeline = Pipeline(**inputs)
+        traj_data = traj_pipeline.process()
+        return traj_data
+    except ValidationError as e:
+        print(e)
+        return None
+
 
 if __name__ == '__main__':
     # 测试轨迹获取功能
@@ -178,5 +203,8 @@ if __name__ == '__main__':
     # 测试轨迹补全功能
     traj_info = traj_supplement_test()
 
+    # 测试轨迹处理全流程
+    # traj_info = traj_pipeline_test()
+
     print('finished')
 
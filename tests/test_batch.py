@@ -0,0 +1,31 @@
+import os
+import shutil
+from traj_pipeline.batch import run_batch, find_duplicate_names
+
+RAW_DATA_PATH = "data/raw_data"
+STAGES = [{"stage": "denoising"}, {"stage": "simplify", "simplify_mode": "rdp"}]
+
+
+def test_find_duplicate_names():
+    duplicate_info = find_duplicate_names(["a/孤立噪点.csv", "a/孤立噪点.json", "a/x.1.json", "a/x.2.json"])
+    assert duplicate_info == {"a/孤立噪点.csv": ["a/孤立噪点.json"], "a/孤立噪点.json": ["a/孤立噪点.csv"]}
+
+
+def test_run_batch_same_stem(tmp_path):
+    input_path = tmp_path / "input"
+    save_path = tmp_path / "output"
+    input_path.mkdir()
+    # 原文件名相同（扩展名不同）、原文件名包含多个"."
+    for source, target in [("孤立噪点.csv", "孤立噪点.csv"), ("孤立噪点.json", "孤立噪点.json"),
+                           ("缺失段.json", "缺失段.v1.json"), ("缺失段.json", "缺失段.v2.json")]:
+        shutil.copy(os.path.join(RAW_DATA_PATH, source), input_path / target)
+
+    results = run_batch(str(input_path), STAGES, str(save_path), workers=2,
+                        log_file_path=str(tmp_path / "batch.log"))
+
+    status = {os.path.basename(result["file"]): result for result in results}
+    assert status["孤立噪点.csv"]["status"] == "failed" and "重名" in status["孤立噪点.csv"]["message"]
+    assert status["孤立噪点.json"]["status"] == "failed" and "重名" in status["孤立噪点.json"]["message"]
+    assert status["缺失段.v1.json"]["status"] == "success"
+    assert status["缺失段.v2.json"]["status"] == "success"
+    assert sorted(os.listdir(save_path)) == ["缺失段.v1_denoising_simplify.json", "缺失段.v2_denoising_simplify.json"]
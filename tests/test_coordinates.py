@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from utils.coordinates import CoordinatesTransform, GCJ02_TABLE_BOUNDS
+
+# 查找表的最大误差（单位：m），与README一致
+TABLE_MAX_ERROR = 0.002
+
+
+def cal_offset_error(lng, lat):
+    """
+    查找表与公式计算的gcj02坐标（gcj02 ==> wgs84不判断是否在国内，范围之外的坐标同样计算偏移量）之间的距离（单位：m）
+    """
+    formula_lng, formula_lat = CoordinatesTransform("formula").gcj02_to_wgs84_array(lng, lat)
+    table_lng, table_lat = CoordinatesTransform("table").gcj02_to_wgs84_array(lng, lat)
+    return np.hypot((table_lng - formula_lng) * 111320 * np.cos(np.radians(lat)), (table_lat - formula_lat) * 110574)
+
+
+def test_offset_table_max_error():
+    assert CoordinatesTransform("table").offset_table_max_error() < TABLE_MAX_ERROR
+
+
+def test_offset_table_near_kink():
+    # 偏移公式包含sqrt(|lng - 105|)，在经度105附近不可导，线性插值的误差最大
+    lng, lat = np.meshgrid(105 + np.linspace(-0.01, 0.01, 2001), np.linspace(20, 50, 31))
+    assert cal_offset_error(lng.ravel(), lat.ravel()).max() < TABLE_MAX_ERROR
+
+
+@pytest.mark.parametrize("edge", ["min_lng", "max_lng", "min_lat", "max_lat"])
+def test_offset_table_edges(edge):
+    min_lng, max_lng, min_lat, max_lat = GCJ02_TABLE_BOUNDS
+    delta = np.array([-0.01, -1e-9, 0, 1e-9, 0.0005, 0.01])
+    inner = np.linspace(0.2, 0.8, 7)
+    if edge in ["min_lng", "max_lng"]:
+        lng, lat = np.meshgrid((min_lng if edge == "min_lng" else max_lng) + delta,
+                               min_lat + inner * (max_lat - min_lat))
+    else:
+        lng, lat = np.meshgrid(min_lng + inner * (max_lng - min_lng),
+                               (min_lat if edge == "min_lat" else max_lat) + delta)
+    lng, lat = lng.ravel(), lat.ravel()
+    error = cal_offset_error(lng, lat)
+    assert error.max() < TABLE_MAX_ERROR
+
+    # 查找表范围之外的坐标使用公式计算，结果完全一致
+    outside = (lng < min_lng) | (lng > max_lng) | (lat < min_lat) | (lat > max_lat)
+    assert outside.any()
+    np.testing.assert_array_equal(error[outside], 0)
+
+
+
+def sample_in_china(sample_num=100000, random_state=0):
+    rng = np.random.default_rng(random_state)
+    return rng.uniform(73.66, 135.05, sample_num), rng.uniform(3.86, 53.55, sample_num)
+
+
+@pytest.mark.parametrize("offset_mode", ["formula", "table"])
+@pytest.mark.parametrize("coord_type", ["gcj02", "bd09ll"])
+def test_high_precision_round_trip(offset_mode, coord_type):
+    # 国内的坐标：wgs84 ==> gcj02/bd09ll ==> wgs84（迭代求逆），往返误差小于1e-9度
+    ct = CoordinatesTransform(offset_mode)
+    coords = np.column_stack(sample_in_china())
+    converted = ct.coord_transform_array(coords, "wgs84", coord_type)
+    high = ct.coord_transform_array(converted, coord_type, "wgs84", precision="high")
+    assert np.abs(high - coords).max() < 1e-9
+    # 一步近似的误差为米级
+    normal = ct.coord_transform_array(converted, coord_type, "wgs84")
+    assert np.abs(normal - coords).max() > 1e-6
+
+
+@pytest.mark.parametrize("from_coord_type,to_coord_type", [("gcj02", "wgs84"), ("bd09ll", "wgs84"),
+                                                           ("bd09ll", "gcj02")])
+def test_high_precision_outside_china(from_coord_type, to_coord_type):
+    # 范围之外的坐标：两种精度的处理一致（均计算偏移量），结果只相差一步近似的误差
+    ct = CoordinatesTransform()
+    coords = np.array([[139.7, 35.7], [103.8, 1.35], [151.2, -33.9]])
+    normal = ct.coord_transform_array(coords, from_coord_type, to_coord_type)
+    high = ct.coord_transform_array(coords, from_coord_type, to_coord_type, precision="high")
+    assert np.all(np.abs(normal - coords).max(axis=1) > 1e-3)
+    assert np.abs(high - normal).max() < 1e-4
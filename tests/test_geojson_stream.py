@@ -0,0 +1,42 @@
+import glob
+import json
+import numpy as np
+import pytest
+from utils.geojson_stream import ArrayBuffer, read_geojson_stream
+
+RAW_DATA_FILES = sorted(glob.glob("data/raw_data/*.json"))
+
+
+def test_array_buffer_trim():
+    buffer = ArrayBuffer(4)
+    buffer.append(np.arange(5, dtype=np.float64))
+    assert len(buffer.values) == 8
+    array = buffer.to_array()
+    # 原地截取，不复制
+    assert array is buffer.values
+    np.testing.assert_array_equal(array, np.arange(5))
+    buffer.append([5, 6])
+    np.testing.assert_array_equal(buffer.to_array(), np.arange(7))
+
+
+@pytest.mark.parametrize("chunk_size", [4 * 1024 * 1024, 100, 7])
+@pytest.mark.parametrize("file_path", RAW_DATA_FILES)
+def test_read_geojson_stream(file_path, chunk_size):
+    with open(file_path, encoding='utf-8') as f:
+        expected = json.load(f)
+    data, columns = read_geojson_stream(file_path, chunk_size=chunk_size)
+
+    line = [feature for feature in expected["features"] if feature["geometry"]["type"] == "LineString"][0]
+    coordinates = np.array(line["geometry"]["coordinates"], dtype=np.float64)
+    np.testing.assert_array_equal(columns["lng"], coordinates[:, 0])
+    np.testing.assert_array_equal(columns["lat"], coordinates[:, 1])
+    properties = line["properties"]
+    np.testing.assert_array_equal(columns["timestamp"], np.array(properties["timestamps"], dtype=np.int64))
+    np.testing.assert_array_equal(columns["speed"], np.array(properties["speeds"], dtype=np.float64))
+    np.testing.assert_array_equal(columns["direction"], np.array(properties["directions"], dtype=np.float64))
+
+    # 骨架中LineString的数组为空，其余部分与json.load的结果一致
+    line["geometry"]["coordinates"] = []
+    for name in ["timestamps", "speeds", "directions"]:
+        properties[name] = []
+    assert data == expected
@@ -0,0 +1,52 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from utils.basic_utils import pd_to_geojson, save_data
+from utils.geojson_writer import write_geojson_compact
+from utils.traj_data import TrajData
+
+
+def build_data(point_num=1000, random_state=0):
+    rng = np.random.default_rng(random_state)
+    return pd.DataFrame({"lng": rng.uniform(-180, 180, point_num),
+                         "lat": rng.uniform(-90, 90, point_num),
+                         "timestamp": 1700000000000 + np.arange(point_num) * 1000,
+                         "speed": rng.uniform(0, 30, point_num).astype(np.float32),
+                         "direction": rng.uniform(-180, 180, point_num)})
+
+
+@pytest.mark.parametrize("precision", [3, 6])
+def test_write_geojson_compact(tmp_path, precision):
+    data = build_data()
+    file_path = tmp_path / "compact.json"
+    write_geojson_compact(str(file_path), data, {}, precision)
+    content = file_path.read_text(encoding='utf-8')
+    # 不包含右对齐时补齐的空格
+    assert " " not in content
+
+    saved = json.loads(content)
+    expected = pd_to_geojson(data, {})
+    assert saved["meta"] == json.loads(json.dumps(expected["meta"]))
+    line = saved["features"][-1]
+    expected_line = expected["features"][-1]
+    tolerance = 0.5 * 10 ** -precision + 1e-12
+    np.testing.assert_allclose(line["geometry"]["coordinates"], expected_line["geometry"]["coordinates"],
+                               rtol=0, atol=tolerance)
+    assert line["properties"]["timestamps"] == expected_line["properties"]["timestamps"]
+    # 速度、航向角默认与坐标的小数位数相同
+    for name in ["speeds", "directions"]:
+        np.testing.assert_allclose(line["properties"][name], expected_line["properties"][name], rtol=0, atol=tolerance)
+
+
+def test_write_geojson_compact_empty(tmp_path):
+    with pytest.raises(Exception, match="轨迹数据为空"):
+        write_geojson_compact(str(tmp_path / "empty.json"), build_data().iloc[:0], {})
+
+
+def test_save_npz_meta(tmp_path):
+    data = build_data()
+    save_data(data, {"method": "test"}, str(tmp_path), "traj", "npz", return_json=False)
+    meta = TrajData.from_npz(str(tmp_path / "traj.npz")).meta
+    expected = pd_to_geojson(data, {"generate_info": {"method": "test"}})
+    assert meta == json.loads(json.dumps(expected["meta"]))
@@ -0,0 +1,86 @@
+import time
+import threading
+import pytest
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from traj_acquisition.http_session import get_http_session, get_timeout
+
+RETRIES = 2
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """
+    本地测试服务：/error返回503，/slow延迟后返回200，记录收到的请求数量
+    """
+    request_num = 0
+    slow_seconds = 1.0
+
+    def __respond(self):
+        FlakyHandler.request_num += 1
+        if self.path.startswith("/slow"):
+            time.sleep(self.slow_seconds)
+        status = 503 if self.path.startswith("/error") else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def do_GET(self):
+        self.__respond()
+
+    def do_POST(self):
+        self.__respond()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    FlakyHandler.request_num = 0
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def build_http_config(read_timeout=5):
+    return {"connect_timeout": 1, "read_timeout": read_timeout, "retries": RETRIES, "backoff_factor": 0,
+            "pool_maxsize": 2}
+
+
+def test_get_retry_on_5xx(server_url):
+    # 会话按服务商共享，每个测试使用单独的服务商名称
+    http_config = build_http_config()
+    session = get_http_session("test_get_retry", http_config)
+    response = session.get(f"{server_url}/error", timeout=get_timeout(http_config))
+    # 重试次数用完后返回最后一次的响应
+    assert response.status_code == 503
+    assert FlakyHandler.request_num == RETRIES + 1
+
+
+def test_post_not_retried(server_url):
+    http_config = build_http_config()
+    session = get_http_session("test_post_not_retried", http_config)
+    response = session.post(f"{server_url}/error", timeout=get_timeout(http_config))
+    assert response.status_code == 503
+    assert FlakyHandler.request_num == 1
+
+
+def test_read_timeout(server_url):
+    http_config = build_http_config(read_timeout=0.2)
+    assert get_timeout(http_config) == (1, 0.2)
+    session = get_http_session("test_read_timeout", http_config)
+    start_time = time.time()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        session.get(f"{server_url}/slow", timeout=get_timeout(http_config))
+    # 每次请求在读取超时后放弃，不等待服务端返回（共RETRIES + 1次）
+    assert FlakyHandler.request_num == RETRIES + 1
+    assert time.time() - start_time < FlakyHandler.slow_seconds * (RETRIES + 1)
+
+
+def test_session_shared():
+    http_config = build_http_config()
+    assert get_http_session("test_session_shared", http_config) is get_http_session("test_session_shared", http_config)
@@ -0,0 +1,32 @@
+import json
+import logging
+import pytest
+from traj_denoising.denoising import Denoising
+from traj_simplify.simplify import Simplify
+from traj_supplement.supplement import Supplement
+from utils.traj_data import TrajData
+
+RAW_DATA_PATH = "data/raw_data"
+STAGES = [(Denoising, {}, "_denoising"),
+          (Simplify, {"simplify_mode": "rdp"}, "_simplify"),
+          (Supplement, {"supplement_mode": "interpolate"}, "_supplement")]
+
+
+@pytest.mark.parametrize("save_type, save_compact", [("json", False), ("json", True), ("npz", False)])
+@pytest.mark.parametrize("stage_class, params, suffix", STAGES)
+def test_saved_meta_contains_perf(tmp_path, stage_class, params, suffix, save_type, save_compact):
+    stage = stage_class(data_path=RAW_DATA_PATH, data_name="孤立噪点.json", save_path=str(tmp_path),
+                        save_type=save_type, save_compact=save_compact, profile=True,
+                        logger=logging.getLogger(__name__), **params)
+    result = stage.process()
+
+    file_path = tmp_path / f"孤立噪点{suffix}.{save_type}"
+    if save_type == "npz":
+        saved_meta = TrajData.from_npz(str(file_path)).meta
+    else:
+        with open(file_path, encoding='utf-8') as f:
+            saved_meta = json.load(f)["meta"]
+    # 保存的文件包含保存之前的各个环节，返回结果额外包含save环节
+    assert {"read", "examine", "core"} <= set(saved_meta["perf"]["phases"])
+    assert "save" not in saved_meta["perf"]["phases"]
+    assert "save" in result["meta"]["perf"]["phases"]
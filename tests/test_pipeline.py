@@ -0,0 +1,43 @@
+import json
+import logging
+import numpy as np
+import pytest
+from traj_pipeline.pipeline import Pipeline
+from utils.traj_data import TrajData
+from utils.coordinates import CoordinatesTransform
+
+RAW_DATA_PATH = "data/raw_data"
+STAGES = [{"stage": "denoising"}, {"stage": "simplify", "simplify_mode": "rdp"}]
+
+
+@pytest.mark.parametrize("save_compact", [False, True])
+def test_save_json_from_npz(tmp_path, save_compact):
+    with open(f"{RAW_DATA_PATH}/孤立噪点.json", encoding='utf-8') as f:
+        TrajData.from_geojson(json.load(f)).to_npz(str(tmp_path / "孤立噪点.npz"))
+
+    pipeline = Pipeline(data_path=str(tmp_path), data_name="孤立噪点.npz", stages=STAGES, data_type="npz",
+                        save_path=str(tmp_path), save_type="json", save_compact=save_compact,
+                        logger=logging.getLogger(__name__))
+    result = pipeline.process()
+
+    assert isinstance(result, TrajData)
+    with open(tmp_path / "孤立噪点_denoising_simplify.json", encoding='utf-8') as f:
+        saved = json.load(f)
+    assert len(saved["features"][-1]["geometry"]["coordinates"]) == len(result)
+    assert "pipeline_info" in saved["meta"]
+
+
+def test_coord_type_after_failed_stage():
+    with open(f"{RAW_DATA_PATH}/孤立噪点.json", encoding='utf-8') as f:
+        traj_data = TrajData.from_geojson(json.load(f))
+    # 第一个环节执行失败（降噪等级不存在），后续环节仍需将gcj02坐标转换为wgs84坐标
+    stages = [{"stage": "denoising", "denoising_level": "unknown"}, {"stage": "simplify", "simplify_mode": "downclocking"}]
+    pipeline = Pipeline(data_path=RAW_DATA_PATH, data_name="孤立噪点.json", stages=stages, coord_type="gcj02",
+                        traj_data=traj_data, logger=logging.getLogger(__name__))
+    result = pipeline.process()
+
+    assert isinstance(result, TrajData)
+    assert [stage["status"] for stage in result.meta["pipeline_info"]] == ["failed", "success"]
+    expected = CoordinatesTransform().coord_transform_array(traj_data.coordinates, "gcj02", "wgs84")
+    distance = np.abs(result.coordinates[:, None, :] - expected[None, :, :]).max(axis=2).min(axis=1)
+    assert np.all(distance < 1e-9)
@@ -0,0 +1,46 @@
+import os
+import sqlite3
+from traj_acquisition.route_cache import RouteCache
+from utils.config_parse import PROJECT_ROOT, read_config, get_route_cache_config
+
+
+def count_entries(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM route_cache").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_prune_interval(tmp_path):
+    path = str(tmp_path / "route_cache.sqlite")
+    route_cache = RouteCache(path, max_entries=10, prune_interval=5)
+    for i in range(12):
+        route_cache.set(f"key_{i}", [[i, i]])
+    # 第10次写入时淘汰至上限，之后的写入在下一次检查前可能超出上限
+    assert count_entries(path) == 12
+    for i in range(12, 15):
+        route_cache.set(f"key_{i}", [[i, i]])
+    assert count_entries(path) == 10
+    # 淘汰最近最少使用的缓存
+    assert route_cache.get("key_0") is None
+    assert route_cache.get("key_14") == [[14, 14]]
+
+    # 重新打开时检查一次条目数量
+    RouteCache(path, max_entries=5)
+    assert count_entries(path) == 5
+
+
+def test_ttl(tmp_path):
+    route_cache = RouteCache(str(tmp_path / "route_cache.sqlite"), ttl=-1)
+    route_cache.set("key", [[1, 2]])
+    assert route_cache.get("key") is None
+
+
+def test_config_parsed_once():
+    assert read_config() is read_config()
+    cache_config = get_route_cache_config(PROJECT_ROOT)
+    if cache_config is not None:
+        # 相对路径以项目根目录为基准
+        assert os.path.isabs(cache_config["path"])
+        assert cache_config["path"].startswith(PROJECT_ROOT)
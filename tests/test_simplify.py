@@ -0,0 +1,65 @@
+import json
+import math
+import logging
+import numpy as np
+import pytest
+from traj_simplify.simplify import Simplify
+
+RAW_DATA_PATH = "data/raw_data"
+RAW_DATA_FILES = ["1765598740674.json", "孤立噪点.json", "缺失段.json"]
+RDP_LIMIT = {"low": 5, "mid": 8, "high": 10}
+
+
+def cal_haversine_dis(cur_point, next_point):
+    """
+    逐点计算的haversine距离（单位：m），与向量化之前的实现一致
+    """
+    lng1, lat1, lng2, lat2 = map(math.radians, [*cur_point, *next_point])
+    d = (math.sin((lat2 - lat1) * 0.5) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) * 0.5) ** 2)
+    return 2 * 6371.0088 * math.asin(math.sqrt(d)) * 1000
+
+
+def rdp_reference(coordinates, distance_limit):
+    """
+    向量化之前的rdp实现（递归、逐点计算海伦公式），作为抽稀结果的基准
+    """
+    def cal_projection_distance(left_p, right_p, other_p):
+        a = cal_haversine_dis(left_p, other_p)
+        b = cal_haversine_dis(right_p, other_p)
+        c = cal_haversine_dis(left_p, right_p)
+        if a + b > c and b + c > a and c + a > b:
+            s = (a + b + c) / 2
+            return 2 * np.sqrt(s * (s - a) * (s - b) * (s - c)) / c
+        return 0
+
+    def rdp_core(left, right):
+        if right - left < 2 or np.all(coordinates[left] == coordinates[right]):
+            return [left, right]
+        max_dis, max_i = 0.0, 0
+        for i in range(left + 1, right):
+            distance = cal_projection_distance(coordinates[left], coordinates[right], coordinates[i])
+            if distance > max_dis:
+                max_i, max_dis = i, distance
+        if max_dis > distance_limit:
+            return rdp_core(left, max_i)[:-1] + rdp_core(max_i, right)
+        return [left, right]
+
+    return rdp_core(0, len(coordinates) - 1)
+
+
+@pytest.mark.parametrize("simplify_level", ["low", "mid", "high"])
+@pytest.mark.parametrize("data_name", RAW_DATA_FILES)
+def test_rdp_matches_reference(data_name, simplify_level):
+    with open(f"{RAW_DATA_PATH}/{data_name}", encoding='utf-8') as f:
+        data = json.load(f)
+    line = [feature for feature in data["features"] if feature["geometry"]["type"] == "LineString"][0]
+    coordinates = np.asarray(line["geometry"]["coordinates"], dtype=float)
+
+    simplify = Simplify(data_path=RAW_DATA_PATH, data_name=data_name, logger=logging.getLogger(__name__),
+                        simplify_mode="rdp", simplify_level=simplify_level)
+    result = simplify.process()
+
+    remained = rdp_reference(coordinates, RDP_LIMIT[simplify_level])
+    result_line = result["features"][-1]["geometry"]["coordinates"]
+    np.testing.assert_array_equal(np.asarray(result_line), coordinates[remained])
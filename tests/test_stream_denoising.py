@@ -0,0 +1,70 @@
+import glob
+import json
+import logging
+import numpy as np
+import pytest
+from traj_denoising.denoising import Denoising, DENOISING_LIMIT_INFO
+from traj_denoising.stream_denoising import StreamDenoising
+from utils.basic_utils import cal_haversine_dis_pairs
+from utils.traj_data import TrajData
+
+RAW_DATA_FILES = sorted(glob.glob("data/raw_data/*.json"))
+DENOISING_LEVELS = list(DENOISING_LIMIT_INFO)
+
+
+def load_traj_data(file_path):
+    with open(file_path, encoding='utf-8') as f:
+        return TrajData.from_geojson(json.load(f))
+
+
+def run_stream(traj_data, denoising_level, max_latency):
+    """
+    逐点输入，记录每个轨迹点的输出时机（输入第几个轨迹点之后输出，flush时为轨迹点数量）
+    :return: 流式降噪对象、输出的轨迹点列表（每项为(索引, 是否为噪点, 输出时机)）
+    """
+    stream = StreamDenoising(denoising_level, max_latency)
+    emitted = []
+    for push_index, (lng, lat) in enumerate(zip(traj_data.lng, traj_data.lat)):
+        emitted.extend((index, noise_flag, push_index) for index, _, noise_flag in stream.push(lng, lat))
+    emitted.extend((index, noise_flag, len(traj_data)) for index, _, noise_flag in stream.flush())
+    return stream, emitted
+
+
+def expected_expired_num(traj_data, denoising_level, max_latency):
+    """
+    逐段统计：噪点段之后连续max_latency个轨迹点均未出现下一个噪点段时，放弃等待
+    """
+    coordinates = traj_data.coordinates
+    distance = cal_haversine_dis_pairs(coordinates[:-1], coordinates[1:])
+    # 噪点段的终点索引
+    segment_end = np.flatnonzero(distance >= DENOISING_LIMIT_INFO[denoising_level]["distance_limit"]) + 1
+    next_end = np.append(segment_end[1:], np.inf)
+    return int(np.sum((next_end - segment_end > max_latency) & (segment_end + max_latency < len(coordinates))))
+
+
+@pytest.mark.parametrize("denoising_level", DENOISING_LEVELS)
+@pytest.mark.parametrize("file_path", RAW_DATA_FILES)
+def test_same_as_batch(file_path, denoising_level):
+    traj_data = load_traj_data(file_path)
+    batch_result = Denoising(data_path="", data_name=file_path, traj_data=traj_data, denoising_level=denoising_level,
+                             logger=logging.getLogger(__name__)).process()
+    stream, emitted = run_stream(traj_data, denoising_level, max_latency=len(traj_data))
+
+    assert stream.expired_num == 0
+    kept_index = [index for index, noise_flag, _ in emitted if not noise_flag]
+    np.testing.assert_array_equal(traj_data.coordinates[kept_index], batch_result.coordinates)
+    assert stream.noise_num == len(traj_data) - len(batch_result)
+
+
+@pytest.mark.parametrize("max_latency", [1, 2, 3, 5, 10])
+@pytest.mark.parametrize("denoising_level", DENOISING_LEVELS)
+@pytest.mark.parametrize("file_path", RAW_DATA_FILES)
+def test_expired_num(file_path, denoising_level, max_latency):
+    traj_data = load_traj_data(file_path)
+    stream, emitted = run_stream(traj_data, denoising_level, max_latency)
+
+    assert stream.expired_num == expected_expired_num(traj_data, denoising_level, max_latency)
+    # 每个轨迹点按顺序输出一次，延迟不超过max_latency个轨迹点（flush除外）
+    assert [index for index, _, _ in emitted] == list(range(len(traj_data)))
+    assert all(push_index - index <= max_latency for index, _, push_index in emitted if push_index < len(traj_data))
+    assert stream.noise_num == sum(noise_flag for _, noise_flag, _ in emitted)
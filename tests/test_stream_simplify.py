@@ -0,0 +1,72 @@
+import glob
+import json
+import logging
+import numpy as np
+import pytest
+from traj_simplify.simplify import Simplify
+from traj_simplify.stream_simplify import StreamSimplify, METER_PER_DEGREE
+from utils.traj_data import TrajData
+
+RAW_DATA_FILES = sorted(glob.glob("data/raw_data/*.json"))
+
+
+def load_traj_data(file_path):
+    with open(file_path, encoding='utf-8') as f:
+        return TrajData.from_geojson(json.load(f))
+
+
+def run_stream(traj_data, max_error, sync_time, window_size):
+    stream = StreamSimplify(max_error, sync_time, window_size)
+    kept_index = []
+    for lng, lat, timestamp in zip(traj_data.lng, traj_data.lat, traj_data.timestamp):
+        kept_index.extend(index for index, _ in stream.push(lng, lat, timestamp))
+    kept_index.extend(index for index, _ in stream.flush())
+    return stream, np.array(kept_index)
+
+
+def cal_error(traj_data, start, end, sync_time):
+    """
+    被剔除的轨迹点（start, end）到抽稀后线段start ==> end的误差（单位：m），局部平面近似
+    """
+    lng, lat, timestamp = traj_data.lng, traj_data.lat, traj_data.timestamp.astype(np.float64)
+    cos_lat = np.cos(np.radians((lat[start] + lat[end]) / 2))
+    x = (lng[start + 1:end] - lng[start]) * METER_PER_DEGREE * cos_lat
+    y = (lat[start + 1:end] - lat[start]) * METER_PER_DEGREE
+    dx = (lng[end] - lng[start]) * METER_PER_DEGREE * cos_lat
+    dy = (lat[end] - lat[start]) * METER_PER_DEGREE
+    if sync_time:
+        duration = timestamp[end] - timestamp[start]
+        ratio = (timestamp[start + 1:end] - timestamp[start]) / duration if duration > 0 else 0.0
+    else:
+        square_length = dx ** 2 + dy ** 2
+        ratio = np.clip((x * dx + y * dy) / square_length, 0, 1) if square_length > 0 else 0.0
+    return np.hypot(x - ratio * dx, y - ratio * dy)
+
+
+@pytest.mark.parametrize("window_size", [3, 100])
+@pytest.mark.parametrize("sync_time", [False, True])
+@pytest.mark.parametrize("max_error", [1, 5, 10])
+@pytest.mark.parametrize("file_path", RAW_DATA_FILES)
+def test_error_bound(file_path, max_error, sync_time, window_size):
+    traj_data = load_traj_data(file_path)
+    stream, kept_index = run_stream(traj_data, max_error, sync_time, window_size)
+
+    # 保留首尾轨迹点，索引递增，相邻保留点之间最多window_size - 1个被剔除的轨迹点
+    assert kept_index[0] == 0 and kept_index[-1] == len(traj_data) - 1
+    gap = np.diff(kept_index)
+    assert np.all(gap > 0) and np.all(gap <= window_size)
+    assert stream.point_num == len(traj_data) and stream.remained_num == len(kept_index)
+    # 被剔除的轨迹点到抽稀后轨迹的误差不超过max_error
+    for start, end in zip(kept_index[:-1], kept_index[1:]):
+        if end - start > 1:
+            assert cal_error(traj_data, start, end, sync_time).max() <= max_error + 1e-6
+
+
+@pytest.mark.parametrize("simplify_level,max_error", [("low", 5), ("mid", 8), ("high", 10)])
+@pytest.mark.parametrize("file_path", RAW_DATA_FILES)
+def test_same_as_batch(file_path, simplify_level, max_error):
+    traj_data = load_traj_data(file_path)
+    batch_result = Simplify(data_path="", data_name=file_path, traj_data=traj_data, simplify_mode="opening_window",
+                            simplify_level=simplify_level, logger=logging.getLogger(__name__)).process()
+    _, kept_index = run_stream(traj_data, max_error, False, 100)
+    np.testing.assert_array_equal(traj_data.coordinates[kept_index], batch_result.coordinates)
@@ -0,0 +1,241 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from utils.basic_utils import save_data, cal_direction
+from traj_acquisition.traj_info_perfection import DrivingStateSimulate
+
+# 每经度/纬度对应的距离（单位：m，赤道附近），经度方向需乘以cos(纬度)
+METER_PER_DEGREE = 111320
+# 路线生成时假定的行驶速度（单位：km/h），与驾驶状态模拟中稳定行驶的速度接近
+CRUISE_SPEED = 70
+
+
+def offset_coordinates(lng, lat, distance, bearing):
+    """
+    按距离、方位角偏移坐标（局部平面近似，适用于几十公里以内）
+    :param lng: 经度（数组）
+    :param lat: 纬度（数组）
+    :param distance: 偏移距离（单位：m）
+    :param bearing: 方位角（单位：度，正北为0，顺时针）
+    :return: 偏移后的经度、纬度
+    """
+    bearing = np.radians(bearing)
+    new_lat = lat + distance * np.cos(bearing) / METER_PER_DEGREE
+    new_lng = lng + distance * np.sin(bearing) / (METER_PER_DEGREE * np.cos(np.radians(lat)))
+    return new_lng, new_lat
+
+
+def fold_coordinates(values, center, bound):
+    """
+    坐标折返到区域内：超出边界的部分按边界镜像反射（三角波），相邻轨迹点的间距不变
+    :param values: 经度或纬度（数组）
+    :param center: 区域中心的经度或纬度
+    :param bound: 区域边界相对中心的偏移（单位：度）
+    :return: 折返后的经度或纬度
+    """
+    return center + np.abs(np.mod(values - center - bound, 4 * bound) - 2 * bound) - bound
+
+
+def generate_route(rng, point_num, sample_interval, center=(121.2, 31.2), region=0.3, turn_std=5.0, bound=1.0):
+    """
+    生成路线坐标：起点在给定区域内随机选取，航向角随机游走，相邻轨迹点间距约为采样间隔内行驶的距离
+    超长路线（例如上百万个轨迹点）在区域边界处折返，避免经纬度超出有效范围
+    :param rng: 随机数生成器
+    :param point_num: 轨迹点数量
+    :param sample_interval: 采样间隔（单位：s）
+    :param center: 区域中心坐标（经度、纬度）
+    :param region: 起点相对区域中心的偏移范围（单位：度）
+    :param turn_std: 相邻轨迹点航向角变化的标准差（单位：度）
+    :param bound: 路线相对区域中心的最大偏移（单位：度）
+    :return: 路线坐标（dataframe，包含lng、lat）
+    """
+    start_lng, start_lat = np.asarray(center) + rng.uniform(-region, region, 2)
+    step = sample_interval * CRUISE_SPEED / 3.6 * rng.uniform(0.8, 1.2, point_num - 1)
+    bearing = rng.uniform(0, 360) + np.cumsum(rng.normal(0, turn_std, point_num - 1))
+
+    # 纬度方向的偏移与经度无关，先累加纬度，再按各点纬度换算经度方向的偏移
+    lat = start_lat + np.concatenate(([0.0], np.cumsum(step * np.cos(np.radians(bearing)) / METER_PER_DEGREE)))
+    lat = fold_coordinates(lat, center[1], bound)
+    lng_step = step * np.sin(np.radians(bearing)) / (METER_PER_DEGREE * np.cos(np.radians(lat[:-1])))
+    lng = fold_coordinates(start_lng + np.concatenate(([0.0], np.cumsum(lng_step))), center[0], bound)
+    return pd.DataFrame({'lng': lng, 'lat': lat})
+
+
+def inject_anomalies(rng, data, noise_num=0, noise_cluster_num=0, missing_num=0,
+                     noise_distance=(15000, 30000), noise_cluster_size=(2, 5), missing_length=(15000, 30000)):
+    """
+    注入异常：孤立噪点、噪点簇（连续多个轨迹点向同一方向偏移）、缺失段（连续多个轨迹点丢失）
+    轨迹平均分为若干区间，每个区间放置一个异常（区间顺序随机），避免异常之间相互影响
+    噪点偏移距离、缺失段长度的默认值大于降噪（low）、补全模块的默认阈值，保证能被识别
+    :param rng: 随机数生成器
+    :param data: 轨迹数据（dataframe）
+    :param noise_num: 孤立噪点数量
+    :param noise_cluster_num: 噪点簇数量
+    :param missing_num: 缺失段数量
+    :param noise_distance: 噪点偏移距离范围（单位：m）
+    :param noise_cluster_size: 噪点簇包含的轨迹点数量范围
+    :param missing_length: 缺失段长度范围（单位：m），区间内轨迹点不足时缺失段会变短
+    :return: 注入异常后的轨迹数据、异常信息（轨迹点索引对应注入异常后的轨迹）
+    """
+    event_types = ["noise"] * noise_num + ["noise_cluster"] * noise_cluster_num + ["missing"] * missing_num
+    rng.shuffle(event_types)
+
+    point_num = len(data)
+    slot_length = point_num // (len(event_types) + 1) if event_types else point_num
+    # 每个区间两侧各保留2个正常轨迹点
+    margin = 2
+    if event_types and slot_length < 2 * margin + 1:
+        raise Exception(f"轨迹点数量（{point_num}）过少，无法注入{len(event_types)}个异常")
+
+    lng = data['lng'].values.copy()
+    lat = data['lat'].values.copy()
+    # 相邻轨迹点的距离（平面近似），用于确定缺失段包含的轨迹点数量
+    step = np.hypot(np.diff(lng) * np.cos(np.radians(lat[:-1])), np.diff(lat)) * METER_PER_DEGREE
+    keep_mask = np.ones(point_num, dtype=bool)
+    noise_segments = []
+    missing_segments = []
+
+    for slot, event_type in enumerate(event_types):
+        slot_start = (slot + 1) * slot_length - slot_length // 2 + margin
+        slot_end = slot_start + slot_length - 2 * margin
+        if event_type == "missing":
+            start = int(rng.integers(slot_start, slot_start + max(1, (slot_end - slot_start) // 2)))
+            # 从start开始丢失轨迹点，直至累计距离达到缺失段长度（不超出区间）
+            length = rng.uniform(*missing_length)
+            end = start + int(np.searchsorted(np.cumsum(step[start - 1:slot_end - 1]), length))
+            end = min(max(end, start + 1), slot_end)
+            keep_mask[start:end] = False
+            missing_segments.append([start - 1, end])
+        else:
+            size = 1 if event_type == "noise" else int(rng.integers(noise_cluster_size[0], noise_cluster_size[1] + 1))
+            size = min(size, slot_end - slot_start)
+            start = int(rng.integers(slot_start, slot_end - size + 1))
+            # 噪点簇内的轨迹点整体偏移（附加少量随机扰动）
+            distance = rng.uniform(*noise_distance) + rng.normal(0, 20, size)
+            bearing = rng.uniform(0, 360) + rng.normal(0, 1, size)
+            lng[start:start + size], lat[start:start + size] = offset_coordinates(
+                lng[start:start + size], lat[start:start + size], distance, bearing)
+            noise_segments.append([start, start + size])
+
+    result = data.copy()
+    result['lng'] = lng
+    result['lat'] = lat
+    result = result.iloc[keep_mask].reset_index(drop=True)
+
+    # 轨迹点索引转换为丢失轨迹点后的索引
+    new_index = np.cumsum(keep_mask) - 1
+    anomaly_info = {"noise_points": [], "noise_clusters": [], "missing_segments": []}
+    for start, end in sorted(noise_segments):
+        index = new_index[start:end].tolist()
+        anomaly_info["noise_points" if end - start == 1 else "noise_clusters"].append(index)
+    anomaly_info["noise_points"] = [index[0] for index in anomaly_info["noise_points"]]
+    anomaly_info["missing_segments"] = [[int(new_index[start]), int(new_index[end])]
+                                        for start, end in sorted(missing_segments)]
+    return result, anomaly_info
+
+
+def generate_vehicle_day(rng, point_num=1000, sample_interval=30, start_time="2024-01-01 08:00:00", stop_num=0,
+                         noise_num=0, noise_cluster_num=0, missing_num=0, center=(121.2, 31.2)):
+    """
+    生成一辆车一天的轨迹：路线坐标、航向角，驾驶状态模拟生成速度、时间戳，最后注入异常
+    :param rng: 随机数生成器
+    :param point_num: 轨迹点数量（注入缺失段前）
+    :param sample_interval: 采样间隔（单位：s）
+    :param start_time: 起点时刻
+    :param stop_num: 停留段数量
+    :param noise_num: 孤立噪点数量
+    :param noise_cluster_num: 噪点簇数量
+    :param missing_num: 缺失段数量
+    :param center: 区域中心坐标（经度、纬度）
+    :return: 轨迹数据（dataframe）、异常信息
+    """
+    if point_num < 2:
+        raise Exception("轨迹点数量至少为2")
+
+    data = generate_route(rng, point_num, sample_interval, center)
+    # 航向角按真实路线计算（噪点的航向角与实际行驶方向一致）
+    cal_direction(data)
+
+    # 采样间隔在[sample_interval / 2, sample_interval * 2]范围内随速度变化
+    driving_state_simulate = DrivingStateSimulate(data, start_time=start_time,
+                                                  lower_time_interval=max(1, sample_interval / 2),
+                                                  upper_time_interval=sample_interval * 2,
+                                                  stop_flag=stop_num > 0, stop_num=stop_num, random_state=rng)
+    data = driving_state_simulate.process()
+
+    return inject_anomalies(rng, data, noise_num, noise_cluster_num, missing_num)
+
+
+def generate_fleet(save_path, vehicle_num=10, point_num=1000, sample_interval=30, start_time="2024-01-01 08:00:00",
+                   stop_num=0, noise_num=0, noise_cluster_num=0, missing_num=0, center=(121.2, 31.2),
+                   save_type="json", random_state=None, compact=False):
+    """
+    批量生成车队轨迹（不依赖路径规划接口），文件格式与轨迹获取模块一致，可用于各模块的压力测试
+    每辆车使用独立的随机数生成器（由random_state派生），结果可复现且与生成顺序无关
+    :param save_path: 保存路径
+    :param vehicle_num: 车辆数量（每辆车生成一条轨迹）
+    :param point_num: 每条轨迹的轨迹点数量（注入缺失段前）
+    :param sample_interval: 采样间隔（单位：s）
+    :param start_time: 起点时刻
+    :param stop_num: 每条轨迹的停留段数量
+    :param noise_num: 每条轨迹的孤立噪点数量
+    :param noise_cluster_num: 每条轨迹的噪点簇数量
+    :param missing_num: 每条轨迹的缺失段数量
+    :param center: 区域中心坐标（经度、纬度）
+    :param save_type: 保存类型：json、csv、npz
+    :param random_state: 随机种子
+    :param compact: 保存为json文件时，是否使用紧凑格式（生成超大轨迹时速度更快、文件更小）
+    :return: 轨迹文件路径列表
+    """
+    if not os.path.exists(save_path):
+        os.makedirs(save_path)
+
+    seed_sequences = np.random.SeedSequence(random_state).spawn(vehicle_num)
+    file_paths = []
+    start = time.time()
+    for vehicle_id, seed_sequence in enumerate(seed_sequences):
+        rng = np.random.default_rng(seed_sequence)
+        data, anomaly_info = generate_vehicle_day(rng, point_num, sample_interval, start_time, stop_num,
+                                                  noise_num, noise_cluster_num, missing_num, center)
+
+        file_name = f"vehicle_{vehicle_id:05d}"
+        generate_info = {"final_method_type": "synthetic",
+                         "result_coord_type": "wgs84",
+                         "vehicle_id": vehicle_id,
+                         "sample_interval": sample_interval,
+                         "random_state": random_state,
+                         **anomaly_info}
+        save_data(data, generate_info, save_path, file_name, save_type, compact, return_json=False)
+        file_paths.append(os.path.join(save_path, file_name + '.' + save_type))
+
+    print(f"共生成{vehicle_num}条轨迹，每条{point_num}个轨迹点，耗时{time.time() - start:.2f}s")
+    return file_paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量生成车队轨迹（离线，不调用路径规划接口）")
+    parser.add_argument("save_path", help="保存路径")
+    parser.add_argument("--vehicle-num", type=int, default=10, help="车辆数量")
+    parser.add_argument("--point-num", type=int, default=1000, help="每条轨迹的轨迹点数量")
+    parser.add_argument("--sample-interval", type=float, default=30, help="采样间隔（单位：s）")
+    parser.add_argument("--start-time", default="2024-01-01 08:00:00", help="起点时刻")
+    parser.add_argument("--stop-num", type=int, default=0, help="每条轨迹的停留段数量")
+    parser.add_argument("--noise-num", type=int, default=0, help="每条轨迹的孤立噪点数量")
+    parser.add_argument("--noise-cluster-num", type=int, default=0, help="每条轨迹的噪点簇数量")
+    parser.add_argument("--missing-num", type=int, default=0, help="每条轨迹的缺失段数量")
+    parser.add_argument("--center", default="121.2,31.2", help="区域中心坐标，经度在前，纬度在后")
+    parser.add_argument("--save-type", default="json", choices=["json", "csv", "npz"], help="保存类型")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    parser.add_argument("--compact", action="store_true", help="json文件使用紧凑格式")
+    args = parser.parse_args()
+
+    center = tuple(float(value) for value in args.center.split(','))
+    generate_fleet(args.save_path, args.vehicle_num, args.point_num, args.sample_interval, args.start_time,
+                   args.stop_num, args.noise_num, args.noise_cluster_num, args.missing_num, center,
+                   args.save_type, args.seed, args.compact)
+
+
+if __name__ == '__main__':
+    main()
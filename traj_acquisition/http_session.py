@@ -0,0 +1,67 @@
+import threading
+import requests
+import openrouteservice as ors
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 进程内共享的HTTP会话（每个服务商一个连接池），避免每次请求重新建立DNS、TCP、TLS连接
+_session_registry = {}
+_ors_client_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_http_session(provider, http_config):
+    """
+    获取服务商对应的共享HTTP会话：连接池 + 5xx及超时的指数退避重试
+    :param provider: 服务商（amap、baidu）
+    :param http_config: HTTP配置（retries、backoff_factor、pool_maxsize）
+    :return: requests.Session
+    """
+    with _registry_lock:
+        session = _session_registry.get(provider)
+        if session is None:
+            retry = Retry(total=http_config["retries"],
+                          connect=http_config["retries"],
+                          read=http_config["retries"],
+                          status=http_config["retries"],
+                          backoff_factor=http_config["backoff_factor"],
+                          status_forcelist=[500, 502, 503, 504],
+                          allowed_methods=frozenset(["GET"]),
+                          # 重试次数用完后返回最后一次的响应，由调用方根据status_code处理
+                          raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=http_config["pool_maxsize"], max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session_registry[provider] = session
+        return session
+
+
+def get_ors_client(key, http_config):
+    """
+    获取共享的ors客户端（openrouteservice库自带会话及5xx、429重试）
+    :param key: ors key
+    :param http_config: HTTP配置（connect_timeout、read_timeout、retries、backoff_factor、ors_url）
+    :return: openrouteservice.Client
+    """
+    with _registry_lock:
+        client = _ors_client_registry.get(key)
+        if client is None:
+            params = {"key": key,
+                      "timeout": get_timeout(http_config),
+                      # ors客户端按总时长控制重试，与backoff_factor、retries对应的最长等待时间保持一致
+                      "retry_timeout": http_config["backoff_factor"] * (2 ** http_config["retries"] - 1)}
+            if "ors_url" in http_config:
+                params["base_url"] = http_config["ors_url"]
+            client = ors.Client(**params)
+            _ors_client_registry[key] = client
+        return client
+
+
+def get_timeout(http_config):
+    """
+    请求超时：连接超时、读取超时
+    :param http_config: HTTP配置
+    :return: (connect_timeout, read_timeout)
+    """
+    return http_config["connect_timeout"], http_config["read_timeout"]
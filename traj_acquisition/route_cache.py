@@ -0,0 +1,155 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class RouteCache:
+    def __init__(self, path, precision=5, ttl=604800, max_entries=100000, prune_interval=1000):
+        """
+        路径规划结果缓存：使用SQLite保存，支持有效期（TTL）及按最近最少使用（LRU）淘汰
+        命中、未命中次数由调用方（TrajAcquisition的route_cache_info）按每次获取轨迹统计
+        :param path: 缓存文件路径
+        :param precision: 坐标量化精度（小数位数）
+        :param ttl: 缓存有效期（单位：s）
+        :param max_entries: 缓存条目上限
+        :param prune_interval: 每写入多少次检查一次条目数量并淘汰，两次检查之间条目数量可能超出上限（每个进程最多prune_interval个）
+        """
+        self.path = path
+        self.precision = precision
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prune_interval = max(1, prune_interval)
+
+        # 写入次数（进程内累计），用于确定何时淘汰
+        self.insert_num = 0
+        self.lock = threading.Lock()
+
+        cache_dir = os.path.dirname(self.path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        with self.__connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS route_cache ("
+                         "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed_at ON route_cache (accessed_at)")
+            self.__prune(conn)
+
+    @contextmanager
+    def __connect(self):
+        """
+        每次操作单独建立连接（结束时提交并关闭）：可在多线程（缺失段并发补全）、多进程（批量处理）中使用
+        :return: 数据库连接
+        """
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def quantize(self, coord):
+        """
+        坐标量化：提取坐标中的数值并按精度取整，例如'116.4810281,39.9896432' ==> '116.48103,39.98964'
+        :param coord: 坐标（str形如'112,32;113,33'，或者list形如[[112,32],[113,33]]）
+        :return: 量化后的坐标（str）
+        """
+        if coord is None:
+            return ""
+        if not isinstance(coord, str):
+            coord = json.dumps(coord)
+        values = re.findall(r'-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?', coord)
+        return ','.join(f"{float(value):.{self.precision}f}" for value in values)
+
+    def make_key(self, method_type, origin, destination, way_points="", params=None):
+        """
+        根据请求生成缓存键：方法、量化后的起终点及途经点、其他参数
+        :param method_type: 获取轨迹的方法
+        :param origin: 起点坐标
+        :param destination: 终点坐标
+        :param way_points: 途经点坐标
+        :param params: 其他参数（例如profile）
+        :return: 缓存键
+        """
+        key = {"method_type": method_type,
+               "origin": self.quantize(origin),
+               "destination": self.quantize(destination),
+               "way_points": self.quantize(way_points),
+               "params": params or {}}
+        return json.dumps(key, sort_keys=True, ensure_ascii=False)
+
+    def get(self, key):
+        """
+        查询缓存：过期的缓存视为未命中并删除
+        :param key: 缓存键
+        :return: 缓存的路线坐标，未命中时返回None
+        """
+        now = time.time()
+        with self.__connect() as conn:
+            row = conn.execute("SELECT value, created_at FROM route_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM route_cache WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                conn.execute("UPDATE route_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return None if row is None else json.loads(row[0])
+
+    def __prune(self, conn):
+        """
+        超出条目上限时淘汰最近最少使用的缓存
+        :param conn: 数据库连接
+        :return:
+        """
+        entry_num = conn.execute("SELECT COUNT(*) FROM route_cache").fetchone()[0]
+        if entry_num > self.max_entries:
+            conn.execute("DELETE FROM route_cache WHERE key IN "
+                         "(SELECT key FROM route_cache ORDER BY accessed_at ASC LIMIT ?)",
+                         (entry_num - self.max_entries,))
+
+    def set(self, key, value):
+        """
+        写入缓存，每写入prune_interval次检查一次条目数量（COUNT需要扫描全表，不在每次写入时执行）
+        :param key: 缓存键
+        :param value: 路线坐标
+        :return:
+        """
+        now = time.time()
+        with self.lock:
+            self.insert_num += 1
+            prune_flag = self.insert_num % self.prune_interval == 0
+        with self.__connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO route_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                         (key, json.dumps(value), now, now))
+            if prune_flag:
+                self.__prune(conn)
+
+    def clear(self):
+        """
+        清空缓存
+        :return:
+        """
+        with self.__connect() as conn:
+            conn.execute("DELETE FROM route_cache")
+
+
+# 进程内共享的缓存对象（按缓存文件路径区分）
+_route_cache_registry = {}
+_route_cache_lock = threading.Lock()
+
+
+def get_route_cache(cache_config):
+    """
+    获取进程内共享的缓存对象
+    :param cache_config: 缓存配置（path、precision、ttl、max_entries、prune_interval），为None时不使用缓存
+    :return: 缓存对象或None
+    """
+    if cache_config is None:
+        return None
+    with _route_cache_lock:
+        route_cache = _route_cache_registry.get(cache_config["path"])
+        if route_cache is None:
+            route_cache = RouteCache(**cache_config)
+            _route_cache_registry[cache_config["path"]] = route_cache
+        return route_cache
@@ -1,14 +1,13 @@
 import numpy as np
 import pandas as pd
-import requests
-import openrouteservice as ors
 from pydantic import BaseModel, ValidationError
-from pyproj import CRS, Transformer
-from shapely.geometry import Point, LineString
 from utils.coordinates import CoordinatesTransform
-from utils.config_parse import get_api_key
+from utils.config_parse import get_api_key, get_route_cache_config, get_http_config
 from utils.basic_utils import save_data, cal_direction
+from utils.projection import get_utm_transformers
 from traj_acquisition.traj_info_perfection import DrivingStateSimulate
+from traj_acquisition.route_cache import get_route_cache
+from traj_acquisition.http_session import get_http_session, get_ors_client, get_timeout
 
 
 class TrajAcquisitionItem(BaseModel):
@@ -20,19 +19,24 @@ class TrajAcquisitionItem(BaseModel):
     other_params: dict = None
     interpolate_flag: bool = False
     noise_flag: bool = False
+    noise_correlation: float = 0
     simulate_flag: bool = True
     result_coord_type: str = "wgs84"
     save_path: str = ""
     save_name: str = ""
     result_type: str = "csv"
+    save_compact: bool = False
+    utm_zone: int = None
+    random_state: int = None
     logger: object = None
 
 
 class TrajAcquisition:
     def __init__(self, origin, destination, way_points="",
                  method_type="amap", coord_type="gcj02", other_params=None, interpolate_flag=False, noise_flag=False,
-                 simulate_flag=False, result_coord_type="wgs84",
-                 save_path="", save_name="", result_type="csv", logger=None):
+                 noise_correlation=0, simulate_flag=False, result_coord_type="wgs84",
+                 save_path="", save_name="", result_type="csv", save_compact=False, utm_zone=None,
+                 random_state=None, logger=None):
         self.raw_origin = origin
         self.raw_destination = destination
         self.raw_way_points = way_points
@@ -45,11 +49,19 @@ class TrajAcquisition:
         self.noise_flag = noise_flag
         # 默认噪声等级
         self.noise_level = "low"
+        # 噪声空间相关的轨迹点数量，默认为0（各个轨迹点独立偏移）
+        self.noise_correlation = noise_correlation
         self.simulate_flag = simulate_flag
         self.result_coord_type = result_coord_type
         self.save_path = save_path
         self.save_name = save_name
         self.result_type = result_type
+        # 保存为json文件时，是否使用紧凑格式（无缩进，数组直接由numpy格式化）
+        self.save_compact = save_compact
+        # 投影坐标系的UTM带号（1~60），默认根据轨迹中心自动确定
+        self.utm_zone = utm_zone
+        # 随机数生成器（噪声、驾驶状态模拟共用）：可以指定随机种子（int）或者np.random.Generator，保证结果可复现
+        self.rng = np.random.default_rng(random_state)
         self.logger = logger
 
         self.alternative_methods = ["amap", "baidu", "ors"]
@@ -58,6 +70,10 @@ class TrajAcquisition:
         # 对于ors，使用sdk的方式调用（python库openrouteservice）
         self.amap_url = "https://restapi.amap.com/v5/direction/driving"
         self.baidu_url = "https://api.map.baidu.com/direction/v2/driving"
+        # HTTP配置（在config.ini中配置）：连接池、超时、重试，可替换接口地址
+        self.http_config = get_http_config()
+        self.amap_url = self.http_config.get("amap_url", self.amap_url)
+        self.baidu_url = self.http_config.get("baidu_url", self.baidu_url)
         # 定位精度，与noise_level相关：噪声等级为low，定位精度高，轨迹点偏移范围为20米
         # 20米为实际的GPS定位点，50米为GPS点 + 精度较高的WIFI定位点，100米为GPS点 + 大部分WIFI定位点
         self.gps_accuracy_info = {"low": 20, "mid": 50, "high": 100}
@@ -65,6 +81,10 @@ class TrajAcquisition:
         self.coordinates = None
         self.result_data = None
 
+        # 路径规划结果缓存（在config.ini中配置），记录本次获取轨迹时缓存的命中、未命中次数
+        self.route_cache = get_route_cache(get_route_cache_config())
+        self.route_cache_info = {"hit_num": 0, "miss_num": 0}
+
         self.final_method_type = self.method_type
 
         # 一方面，将result_info作为主流程的返回值
@@ -76,12 +96,6 @@ class TrajAcquisition:
                             "final_method_type": self.final_method_type,
                             "result_coord_type": self.result_coord_type}
 
-        self.from_crs = CRS('EPSG: 4326')
-        self.to_crs = CRS('EPSG: 32648')
-
-        self.trans_4326 = Transformer.from_crs(self.from_crs, self.to_crs, always_xy=True)
-        self.trans_32648 = Transformer.from_crs(self.to_crs, self.from_crs, always_xy=True)
-
     def __check_input_params(self):
         """
         入参检查：是否包含经纬度、是否在国内...
@@ -208,7 +222,7 @@ class TrajAcquisition:
         """
         # 调用direction函数确定两点之间的最短路
         key = get_api_key(method='ors')
-        client = ors.Client(key=key)
+        client = get_ors_client(key, self.http_config)
 
         params = {"coordinates": self.coordinates}
         # 更新参数，使用字典作为输入
@@ -248,7 +262,8 @@ class TrajAcquisition:
 
         try:
             # 默认返回高德推荐，同高德地图APP（可能有多条路线）
-            response = requests.get(url=self.amap_url, params=params)
+            session = get_http_session("amap", self.http_config)
+            response = session.get(url=self.amap_url, params=params, timeout=get_timeout(self.http_config))
             if response.status_code == 200:
                 response = response.json()
                 coors_list = []
@@ -292,7 +307,8 @@ class TrajAcquisition:
 
         try:
             # 默认返回一条推荐路线
-            response = requests.get(url=self.baidu_url, params=params)
+            session = get_http_session("baidu", self.http_config)
+            response = session.get(url=self.baidu_url, params=params, timeout=get_timeout(self.http_config))
             if response.status_code == 200:
                 response = response.json()
                 coors_list = []
@@ -310,38 +326,69 @@ class TrajAcquisition:
             self.logger.error(f'baidu 获取路径失败: {e}')
             # raise Exception(e)
 
+    def __route_cache_key(self):
+        """
+        根据请求（方法、起终点、途经点、相关参数）生成缓存键
+        :return: 缓存键
+        """
+        params = {}
+        if self.other_params is not None:
+            for param in ['profile', 'format', 'show_fields']:
+                if param in self.other_params:
+                    params[param] = self.other_params[param]
+        if "ors" == self.method_type:
+            return self.route_cache.make_key(self.method_type, self.coordinates, "", "", params)
+        if "baidu" == self.method_type:
+            params["coord_type"] = self.coord_type
+        return self.route_cache.make_key(self.method_type, self.origin, self.destination, self.way_points, params)
+
+    def __acquire_traj_cache(self, cache_key):
+        """
+        查询路径规划结果缓存
+        :param cache_key: 缓存键
+        :return: 是否命中缓存
+        """
+        coors_list = self.route_cache.get(cache_key)
+        if coors_list is None:
+            self.route_cache_info["miss_num"] += 1
+            return False
+
+        self.route_cache_info["hit_num"] += 1
+        print(f'路径规划获取的路线包含{len(coors_list)}个轨迹点（缓存）')
+        self.logger.info(f'路径规划获取的路线包含{len(coors_list)}个轨迹点（缓存）')
+        self.result_data = coors_list
+        return True
+
     def __enhance_by_interpolate(self, tem_coord_type):
         """
         等距插值，增加轨迹点数量
         :param tem_coord_type: 所获取的轨迹的坐标系
         :return:
         """
-        # 坐标系转换
-        coords = CoordinatesTransform().coord_transform(self.result_data.values.tolist(), tem_coord_type, 'wgs84', 'list')
-
-        # 地理坐标系转换为投影坐标系
-        points_utm = [self.trans_4326.transform(lng, lat) for lng, lat in coords]
-        line_utm = LineString(points_utm)
-        # 给result_data新增distance列
-        distance_list = [line_utm.project(Point(point)) for point in points_utm]
-        self.result_data['distance'] = distance_list
-
-        resample_data = pd.DataFrame()
-        total_length = line_utm.length
-        distance_list = [i * self.interpolate_interval for i in range(int(total_length / self.interpolate_interval))]
-        points_utm = [line_utm.interpolate(distance) for distance in distance_list]
-        points_wgs84 = [self.trans_32648.transform(point.x, point.y) for point in points_utm]
-        resample_data[['lng', 'lat']] = points_wgs84
-        resample_data['distance'] = distance_list
-        # 指定node_type
-        # resample_data['node_type'] = 'resample'
-
-        self.result_data = pd.concat([self.result_data, resample_data], ignore_index=True)
-
-        self.result_data.sort_values(by='distance', inplace=True)
-        self.result_data.drop_duplicates(subset='distance', keep='first', inplace=True)
-        self.result_data.reset_index(drop=True, inplace=True)
-        self.result_data.drop(columns='distance', inplace=True)
+        # 坐标系转换（转换后的坐标同时作为原轨迹点的坐标，与插值点的坐标系保持一致）
+        coords = CoordinatesTransform().coord_transform_array(self.result_data[['lng', 'lat']].values, tem_coord_type, 'wgs84')
+
+        # 地理坐标系批量转换为投影坐标系，计算各个轨迹点沿路线的累计长度
+        trans_to_utm, trans_to_wgs84 = get_utm_transformers(coords[:, 0], coords[:, 1], self.utm_zone)
+        x, y = trans_to_utm.transform(coords[:, 0], coords[:, 1])
+        vertex_distance = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))))
+
+        # 沿路线等距采样：根据累计长度插值得到投影坐标，再批量转换为经纬度
+        total_length = vertex_distance[-1]
+        resample_distance = np.arange(int(total_length / self.interpolate_interval)) * float(self.interpolate_interval)
+        resample_x = np.interp(resample_distance, vertex_distance, x)
+        resample_y = np.interp(resample_distance, vertex_distance, y)
+        resample_lng, resample_lat = trans_to_wgs84.transform(resample_x, resample_y)
+
+        # 原轨迹点与插值点按累计长度合并排序（稳定排序），累计长度相同的只保留第一个（原轨迹点优先）
+        distance = np.concatenate((vertex_distance, resample_distance))
+        order = np.argsort(distance, kind='stable')
+        keep_mask = np.concatenate(([True], np.diff(distance[order]) != 0))
+        order = order[keep_mask]
+
+        lng = np.concatenate((coords[:, 0], resample_lng))[order]
+        lat = np.concatenate((coords[:, 1], resample_lat))[order]
+        self.result_data = pd.DataFrame({'lng': lng, 'lat': lat})
 
     def __make_noise(self, tem_coord_type):
         """
@@ -349,18 +396,37 @@ class TrajAcquisition:
         :param tem_coord_type: 所获取的轨迹的坐标系
         :return:
         """
-        # 坐标系转换
-        coords = CoordinatesTransform().coord_transform(self.result_data.values.tolist(), tem_coord_type, 'wgs84','list')
-        points_utm = [self.trans_4326.transform(lng, lat) for lng, lat in coords]
+        # 坐标系转换，批量转换为投影坐标系
+        coords = CoordinatesTransform().coord_transform_array(self.result_data[['lng', 'lat']].values, tem_coord_type, 'wgs84')
+        trans_to_utm, trans_to_wgs84 = get_utm_transformers(coords[:, 0], coords[:, 1], self.utm_zone)
+        x, y = trans_to_utm.transform(coords[:, 0], coords[:, 1])
 
         # 指定轨迹点采集精度：20（作为正态分布的方差），实际使用时需除以更号2
         gps_accuracy = self.gps_accuracy_info[self.noise_level] / np.sqrt(2)
-        delta_list = np.random.normal(0, gps_accuracy, [len(coords), 2])
-        # 更新坐标
-        points_utm = delta_list + points_utm
-        # 转换为经纬度
-        points_wgs84 = [self.trans_32648.transform(lng, lat) for lng, lat in points_utm]
-        self.result_data[['lng', 'lat']] = points_wgs84
+        # 一次性生成所有轨迹点的偏移量
+        delta_list = self.rng.normal(0, gps_accuracy, [len(coords), 2])
+        if self.noise_correlation > 0:
+            delta_list = self.__correlate_noise(delta_list)
+        # 更新坐标，转换为经纬度
+        lng, lat = trans_to_wgs84.transform(x + delta_list[:, 0], y + delta_list[:, 1])
+        self.result_data[['lng', 'lat']] = np.column_stack((lng, lat))
+
+    def __correlate_noise(self, delta_list):
+        """
+        噪声空间相关：相邻轨迹点的偏移量相近（模拟实际定位时连续一段轨迹点向同一方向漂移）
+        对独立的偏移量做高斯加权平均（noise_correlation为相关的轨迹点数量，作为高斯核的标准差），并按权重重新归一化，保持各个轨迹点偏移量的方差不变
+        :param delta_list: 独立的偏移量
+        :return: 空间相关的偏移量
+        """
+        radius = int(np.ceil(3 * self.noise_correlation))
+        offset = np.arange(-radius, radius + 1)
+        weight = np.exp(-0.5 * (offset / self.noise_correlation) ** 2)
+
+        # 轨迹首尾参与加权的轨迹点较少，需分别计算各个轨迹点的权重平方和
+        # 使用完整卷积后截取中间部分（轨迹点数量少于高斯核长度时同样适用）
+        index = slice(radius, radius + len(delta_list))
+        norm = np.sqrt(np.convolve(np.ones(len(delta_list)), weight ** 2)[index])
+        return np.column_stack([np.convolve(delta_list[:, i], weight)[index] / norm for i in range(2)])
 
     def __acquire_traj_process(self):
         """
@@ -374,6 +440,13 @@ class TrajAcquisition:
         while self.result_data is None and len(self.alternative_methods) > 0:
             self.final_method_type = self.alternative_methods.pop(0)
             self.__transform_input_coord()
+            # 优先查询缓存，命中则不再调用API
+            cache_key = None
+            if self.route_cache is not None:
+                cache_key = self.__route_cache_key()
+                if self.__acquire_traj_cache(cache_key):
+                    continue
+
             # 根据method_type检查必填的参数
             if "ors" == self.method_type:
                 self.__acquire_traj_ors()
@@ -384,6 +457,12 @@ class TrajAcquisition:
             if "baidu" == self.method_type:
                 self.__acquire_traj_baidu()
 
+            if cache_key is not None and self.result_data is not None:
+                self.route_cache.set(cache_key, self.result_data)
+
+        if self.route_cache is not None:
+            self.result_info["route_cache_info"] = self.route_cache_info
+
         if self.result_data is not None:
             self.result_data = pd.DataFrame(self.result_data, columns=['lng', 'lat'])
             # 确定所获取的轨迹的坐标系（由method_type决定）
@@ -399,7 +478,7 @@ class TrajAcquisition:
                 tem_coord_type = 'wgs84'
 
             # 坐标系转换为result_coord_type
-            coords = CoordinatesTransform().coord_transform(self.result_data.values.tolist(), tem_coord_type, self.result_coord_type, 'list')
+            coords = CoordinatesTransform().coord_transform_array(self.result_data[['lng', 'lat']].values, tem_coord_type, self.result_coord_type)
             self.result_data[['lng', 'lat']] = coords
             self.result_info["final_method_type"] = self.final_method_type
             self.logger.info(f"获取轨迹的方法最终为：{self.final_method_type}")
@@ -428,11 +507,12 @@ class TrajAcquisition:
 
                 # 生成timestamp、speed
                 if self.simulate_flag:
-                    driving_state_simulate = DrivingStateSimulate(self.result_data)
+                    driving_state_simulate = DrivingStateSimulate(self.result_data, random_state=self.rng)
                     self.result_data = driving_state_simulate.process()
 
                 # 保存轨迹信息（保存为pd、json文件）
-                json_data = save_data(self.result_data, self.result_info, self.save_path, self.save_name, self.result_type)
+                json_data = save_data(self.result_data, self.result_info, self.save_path, self.save_name, self.result_type,
+                                      self.save_compact)
                 return json_data
             else:
                 return None
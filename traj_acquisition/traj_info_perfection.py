@@ -4,12 +4,12 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
-from utils.basic_utils import cal_bearing, cal_haversine_dis, split_segment
+from utils.basic_utils import cal_bearing, cal_haversine_dis_pairs, split_segment
 
 
 class DrivingStateSimulate:
     def __init__(self, raw_data, start_time="2014-06-07 08:00:00", max_speed=100,
-                 lower_time_interval=5, upper_time_interval=30, stop_flag=False, stop_num=5):
+                 lower_time_interval=5, upper_time_interval=30, stop_flag=False, stop_num=5, random_state=None):
         self.traj_data = raw_data.copy()
         self.start_time = start_time
         self.max_speed = max_speed
@@ -17,6 +17,8 @@ class DrivingStateSimulate:
         self.upper_time_interval = upper_time_interval
         self.stop_flag = stop_flag
         self.stop_num = stop_num
+        # 随机数生成器：可以指定随机种子（int）或者np.random.Generator，保证结果可复现
+        self.rng = np.random.default_rng(random_state)
 
         self.start_time = datetime.datetime.strptime(self.start_time, "%Y-%m-%d %H:%M:%S")
 
@@ -37,69 +39,52 @@ class DrivingStateSimulate:
 
     def __generate_speed(self):
         """
-        生成速度
+        生成速度：预先分块生成随机数，状态转移使用数组查表
+        速度仍逐点计算：每一步的速度状态（决定速度变化范围、状态转移概率）取决于上一步截断、取整后的速度，无法整体向量化；
+        按加速度状态的持续长度分段（np.repeat/cumsum）生成时，段内的速度状态固定，会改变模拟结果，
+        且各状态的平均持续长度仅约1.4~5个轨迹点，逐段调用numpy的开销不低于逐点计算
         :return:
         """
-        def get_speed_state(speed):
-            """
-            确定速度状态：低速、中速、高速、超高速
-            :param speed: 速度（单位：km/h）
-            :return: 速度状态
-            """
-            if speed < 50:
-                ss = "low_speed"
-            elif speed < 70:
-                ss = "mid_speed"
-            elif speed < 90:
-                ss = "high_speed"
-            else:
-                ss = "super_high_speed"
-            return ss
-
-        def get_next_state(speed_state, state):
-            """
-            根据速度状态、加速度状态确定下一时刻的加速度状态
-            :param speed_state: 速度状态
-            :param state: 加速度状态
-            :return: 下一时刻的加速度状态
-            """
-            state_probability = self.state_transform_info[speed_state][state]
-            value = np.random.uniform(0, 1)
-            if value < state_probability[0]:
-                return "accelerate"
-            elif value < state_probability[0] + state_probability[1]:
-                return "decelerate"
-            else:
-                return "cruise"
-
-        speed_list = []
+        # 速度状态：低速（<50）、中速（<70）、高速（<90）、超高速
+        speed_bounds = [50, 70, 90]
+        speed_states = ["low_speed", "mid_speed", "high_speed", "super_high_speed"]
+        # 加速度状态：0加速、1减速、2匀速
+        states = ["accelerate", "decelerate", "cruise"]
+        # 状态转移的累积概率：[速度状态][加速度状态] ==> [加速的概率, 加速或减速的概率]
+        transform_table = [[[self.state_transform_info[ss][state][0],
+                             self.state_transform_info[ss][state][0] + self.state_transform_info[ss][state][1]]
+                            for state in states] for ss in speed_states]
+        # 速度变化范围：[速度状态][加速度状态] ==> [下限, 范围]（减速时为负值）
+        delta_table = [[[4, 4], [-2, -4], [-2, 4]],
+                       [[4, 4], [-2, -4], [-2, 4]],
+                       [[2, 4], [-4, -4], [-2, 4]],
+                       [[2, 4], [-4, -4], [-2, 4]]]
+
+        traj_num = len(self.traj_data)
+        speed_list = np.empty(traj_num)
         speed = 10
-        state = "accelerate"
-        for i in range(len(self.traj_data)):
-            speed_list.append(speed)
-
-            ss = get_speed_state(speed)
-
-            # update speed
-            if state == 'accelerate':
-                if ss == 'high_speed' or ss == 'super_high_speed':
-                    low, high = 2, 6
-                else:
-                    low, high = 4, 8
-                speed += np.random.uniform(low, high)
-            elif state == 'decelerate':
-                if ss == 'high_speed' or ss == 'super_high_speed':
-                    low, high = 4, 8
-                else:
-                    low, high = 2, 6
-                speed -= np.random.uniform(low, high)
-            else:
-                speed += np.random.uniform(-2, 2)
-
-            speed = min(max(0.0, round(speed, 2)), self.max_speed)
-
-            # update state
-            state = get_next_state(ss, state)
+        state = 0
+        block_size = 65536
+        for block_start in range(0, traj_num, block_size):
+            block_end = min(traj_num, block_start + block_size)
+            # 每个轨迹点使用两个随机数：速度变化、状态转移
+            speed_random, state_random = self.rng.random((2, block_end - block_start)).tolist()
+            for i in range(block_end - block_start):
+                speed_list[block_start + i] = speed
+
+                ss = 0
+                while ss < 3 and speed >= speed_bounds[ss]:
+                    ss += 1
+
+                # update speed
+                low, scale = delta_table[ss][state]
+                speed += low + scale * speed_random[i]
+                speed = min(max(0.0, round(speed, 2)), self.max_speed)
+
+                # update state
+                probability = transform_table[ss][state]
+                value = state_random[i]
+                state = 0 if value < probability[0] else (1 if value < probability[1] else 2)
 
         # plt.plot(speed_list)
         # plt.show()
@@ -110,31 +95,22 @@ class DrivingStateSimulate:
         生成时间戳
         :return:
         """
-        self.traj_data['lng_up'] = self.traj_data['lng'].shift(1)
-        self.traj_data['lat_up'] = self.traj_data['lat'].shift(1)
-        self.traj_data[['lng_up', 'lat_up']] = self.traj_data[['lng_up', 'lat_up']].bfill()
-
-        self.traj_data['distance'] = self.traj_data.apply(
-            lambda row: cal_haversine_dis([row['lng_up'], row['lat_up']], [row['lng'], row['lat']]), axis=1)
-        speed_list = self.traj_data['speed'].tolist()
-        distance_list = self.traj_data['distance'].tolist()
-        timestamp_list = [self.start_time.timestamp() * 1000] * len(self.traj_data)
-        for i in range(1, len(distance_list)):
-            avg_speed = (speed_list[i] + speed_list[i - 1]) / 2
-            # 若速度为0，则固定增加10s
-            if avg_speed > 0:
-                delta_time = min(max(distance_list[i] / (avg_speed / 3.6), self.lower_time_interval),
-                                 self.upper_time_interval)
-            else:
-                delta_time = 10
-
-            # 单位ms
-            timestamp_list[i] = timestamp_list[i - 1] + delta_time * 1000
-
-        self.traj_data['timestamp'] = timestamp_list
+        # 相邻轨迹点的距离、平均速度
+        coordinates = self.traj_data[['lng', 'lat']].values
+        distance_list = cal_haversine_dis_pairs(coordinates[:-1], coordinates[1:])
+        speed_list = self.traj_data['speed'].values
+        avg_speed = (speed_list[1:] + speed_list[:-1]) / 2
+
+        # 若速度为0，则固定增加10s
+        moving_mask = avg_speed > 0
+        delta_time = np.full(len(avg_speed), 10.0)
+        delta_time[moving_mask] = np.minimum(np.maximum(distance_list[moving_mask] / (avg_speed[moving_mask] / 3.6),
+                                                        self.lower_time_interval), self.upper_time_interval)
+
+        # 单位ms
+        timestamp_list = np.cumsum(np.concatenate(([self.start_time.timestamp() * 1000], delta_time * 1000)))
         # 指定为int64而不是int，避免超出范围
-        self.traj_data['timestamp'] = self.traj_data['timestamp'].astype('int64')
-        self.traj_data.drop(columns=['lng_up', 'lat_up', 'distance'], inplace=True)
+        self.traj_data['timestamp'] = timestamp_list.astype('int64')
 
     def __generate_direction(self):
         """
@@ -174,7 +150,7 @@ class DrivingStateSimulate:
         """
         # 直接修改速度
         for i in range(self.stop_num):
-            stop_point = np.random.uniform(0, len(self.traj_data) - 1)
+            stop_point = self.rng.uniform(0, len(self.traj_data) - 1)
             stop_left = max(0, int(stop_point) - 5)
             stop_right = min(len(self.traj_data) - 1, int(stop_point) + 5)
             speeds = [0] * (stop_right - stop_left + 1)
@@ -3,8 +3,19 @@ import json
 import numpy as np
 import pandas as pd
 from pydantic import BaseModel, ValidationError
-from utils.basic_utils import (cal_haversine_dis, cal_haversine_dis_vector,
+from utils.basic_utils import (cal_haversine_dis_pairs, cal_haversine_dis_vector,
                                examine_and_update_raw_data, update_pd_data, cal_traj_info, pd_to_geojson, geojson_to_pd)
+from utils.traj_data import TrajData
+from utils.perf import PerfRecorder
+from utils.geojson_stream import geojson_stream_to_pd
+from utils.geojson_writer import write_geojson_compact
+
+# denoising_level越大，表示降噪力度越大，判断异常点的阈值越小（更容易触发）
+DENOISING_LIMIT_INFO = {
+    "low": {"distance_limit": 10000, "time_limit": 3},
+    "mid": {"distance_limit": 8000, "time_limit": 2},
+    "high": {"distance_limit": 5000, "time_limit": 1},
+}
 
 
 class DenoisingItem(BaseModel):
@@ -17,29 +28,40 @@ class DenoisingItem(BaseModel):
     denoising_level: str = "low"
     data_info: object = None
     logger: object = None
+    traj_data: object = None
+    profile: bool = False
+    stream_read: bool = False
+    save_compact: bool = False
+    save_precision: int = 6
 
 
 class Denoising(object):
     def __init__(self, data_path, data_name, data_type='json', data_info=None, logger=None, coord_type="wgs84",
                  save_path="", save_type='json',
-                 denoising_level="low"):
+                 denoising_level="low", traj_data=None, profile=False, stream_read=False,
+                 save_compact=False, save_precision=6):
         self.data_path = data_path
         self.data_name = data_name
         self.data_type = data_type
         # 若为json文件，轨迹信息在meta字段中；若为csv文件，则需要额外传入轨迹信息
         self.data_info = data_info
         self.logger = logger
+        # 内存中的轨迹数据（TrajData）：若传入，则不再读取文件，处理结果同样以TrajData的形式返回
+        self.traj_data = traj_data
+        # 性能记录（默认不开启）：各环节的耗时、轨迹点数量、峰值内存，记录在meta的perf字段中
+        self.perf = PerfRecorder(profile)
+        # 流式读取json文件（内存占用与轨迹点数量成正比，适用于超大文件），处理失败时返回None而不是原始轨迹
+        self.stream_read = stream_read
+        # 结果保存为紧凑格式的json文件（无缩进，坐标保留save_precision位小数），数组直接由numpy格式化，适用于超大轨迹
+        self.save_compact = save_compact
+        self.save_precision = save_precision
         self.coord_type = coord_type
         self.save_path = save_path
         self.save_type = save_type
         self.denoising_level = denoising_level
 
         # denoising_level越大，表示降噪力度越大，判断异常点的阈值越小（更容易触发）
-        self.denoising_limit_info = {
-            "low": {"distance_limit": 10000, "time_limit": 3},
-            "mid": {"distance_limit": 8000, "time_limit": 2},
-            "high": {"distance_limit": 5000, "time_limit": 1},
-        }
+        self.denoising_limit_info = DENOISING_LIMIT_INFO
 
         self.data = None
         self.pd_data = None
@@ -52,7 +74,24 @@ class Denoising(object):
         读取轨迹数据并检查关键字段
         :return:
         """
-        if self.data_type == "json":
+        self.perf.begin("read")
+        if self.traj_data is None and self.data_type == "npz":
+            # npz文件以内存映射的方式加载为TrajData，按内存中的轨迹数据处理（结果同样为TrajData）
+            self.traj_data = TrajData.from_npz(os.path.join(self.data_path, self.data_name))
+        if self.traj_data is not None:
+            self.data = self.traj_data
+            self.result_info = self.traj_data
+            self.data_info = self.traj_data.meta
+            self.pd_data = self.traj_data.to_pd()
+            self.coordinates = self.pd_data[["lng", "lat"]].values
+
+        elif self.data_type == "json" and self.stream_read:
+            self.pd_data, self.coordinates, self.data_info = geojson_stream_to_pd(
+                os.path.join(self.data_path, self.data_name))
+            if self.data_info is None:
+                self.data_info = {}
+
+        elif self.data_type == "json":
             with open(os.path.join(self.data_path, self.data_name), encoding='utf-8') as f:
                 self.data = json.load(f)
                 self.result_info = self.data
@@ -72,10 +111,14 @@ class Denoising(object):
                 self.data_info = {}
             self.result_info = pd_to_geojson(self.pd_data, self.data_info)
         else:
-            self.logger.error("暂不支持该类轨迹文件，请转换为json或csv格式")
-            raise Exception("暂不支持该类轨迹文件，请转换为json或csv格式")
+            self.logger.error("暂不支持该类轨迹文件，请转换为json、csv或npz格式")
+            raise Exception("暂不支持该类轨迹文件，请转换为json、csv或npz格式")
+
+        self.perf.end("read", points_out=len(self.pd_data))
 
         # 检查轨迹数据：关键字段
+        self.perf.begin("examine")
+        points_in = len(self.pd_data)
         available_flag, self.pd_data, key_msg = examine_and_update_raw_data(self.pd_data)
 
         # 分情况处理轨迹信息
@@ -89,6 +132,7 @@ class Denoising(object):
         else:
             self.logger.error(f"轨迹数据存在异常：{key_msg}")
             raise Exception(f'轨迹数据存在异常：{key_msg}')
+        self.perf.end("examine", points_in, len(self.pd_data))
 
 
     def __denoising_core(self):
@@ -109,24 +153,27 @@ class Denoising(object):
         detected_noise_segments = np.column_stack((detected_noise_segments, detected_noise_segments + 1))
 
         # Step2：根据相邻的noise_segment，判断要剔除的噪点
-        # 记录要剔除的轨迹点
-        noise_list = []
-        for i in range(len(detected_noise_segments) - 1):
-            left_index = detected_noise_segments[i][0]
-            right_index = detected_noise_segments[i + 1][1]
-            cur_point = self.coordinates[left_index]
-            next_point = self.coordinates[right_index]
-            dis = cal_haversine_dis(cur_point, next_point)
-            if (
-                    segment_dis_list[i] >= time_limit * dis
-                    and segment_dis_list[i + 1] >= time_limit * dis
-            ):
-                noise_list.extend(list(range(left_index + 1, right_index)))
+        # 相邻的两个noise_segment构成候选对：前一段的起点、后一段的终点，一次性计算所有候选对的“轴向间距”
+        left_index = detected_noise_segments[:-1, 0]
+        right_index = detected_noise_segments[1:, 1]
+        axial_dis = cal_haversine_dis_pairs(self.coordinates[left_index], self.coordinates[right_index])
+        noise_pair = ((segment_dis_list[:-1] >= time_limit * axial_dis)
+                      & (segment_dis_list[1:] >= time_limit * axial_dis))
+
+        # 记录要剔除的轨迹点：候选对之间的轨迹点（left_index, right_index）均为噪点，使用差分数组 + 累加得到噪点掩码
+        noise_flag = np.zeros(len(self.coordinates) + 1, dtype=np.int64)
+        np.add.at(noise_flag, left_index[noise_pair] + 1, 1)
+        np.add.at(noise_flag, right_index[noise_pair], -1)
+        noise_mask = np.cumsum(noise_flag[:-1]) > 0
+        noise_list = np.flatnonzero(noise_mask)
 
         if len(noise_list) == 0:
             print("未识别到噪点")
             self.logger.info("未识别到噪点")
             self.data_info["noise_info"] = {"noise_num": len(noise_list)}
+            # 输入为TrajData（或者流式读取，未保留原始轨迹）时，返回检查、坐标转换后的轨迹
+            if self.traj_data is not None or self.result_info is None:
+                self.__update_result_info()
             return
         else:
             print(f"识别到{len(noise_list)}个噪点，信息如下：")
@@ -134,16 +181,28 @@ class Denoising(object):
             self.data_info["noise_info"] = {"noise_num": len(noise_list),
                                             "noise_points": self.pd_data.iloc[noise_list].to_dict(orient='records')}
 
-            for i in sorted(noise_list):
+            for i in noise_list:
                 print(i, "\t", self.coordinates[i], "\t")
 
-            # 确定降噪后的轨迹点、坐标
-            remained_points = sorted(set(range(len(self.coordinates))) - set(noise_list))
-            self.coordinates = self.coordinates[remained_points]
-            self.pd_data = self.pd_data.iloc[remained_points]
+            # 确定降噪后的轨迹点、坐标：使用布尔掩码保留非噪点
+            keep_mask = ~noise_mask
+            self.coordinates = self.coordinates[keep_mask]
+            self.pd_data = self.pd_data.iloc[keep_mask]
             self.pd_data.reset_index(drop=True, inplace=True)
 
-        self.result_info = pd_to_geojson(self.pd_data, self.data_info)
+        self.__update_result_info()
+
+    def __update_result_info(self):
+        """
+        更新处理结果：输入为TrajData时返回TrajData（不构造geojson），否则返回geojson
+        :return:
+        """
+        self.perf.begin("serialize")
+        if self.traj_data is not None:
+            self.result_info = TrajData.from_pd(self.pd_data, self.data_info)
+        else:
+            self.result_info = pd_to_geojson(self.pd_data, self.data_info)
+        self.perf.end("serialize", len(self.pd_data))
 
     def process(self):
         """
@@ -155,22 +214,48 @@ class Denoising(object):
             self.__read_examine_update_traj()
             self.logger.info("轨迹数据检查完毕")
             # 计算轨迹基础信息
+            self.perf.begin("traj_info")
             traj_info = cal_traj_info(self.pd_data)
             self.data_info["traj_info"] = traj_info
+            self.perf.end("traj_info", len(self.pd_data))
 
             # 识别噪点并剔除
+            points_in = len(self.pd_data)
+            self.perf.begin("core")
             self.__denoising_core()
+            self.perf.end("core", points_in, len(self.pd_data))
             self.logger.info("轨迹降噪成功")
             if self.save_path != "":
-                # 结果保存为geojson格式，噪点信息放在meta字段中
-                file_path = os.path.join(self.save_path, self.data_name.split('.')[0] + '_denoising.json')
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    # 使用json.dump()方法将feature_collection对象写入文件
-                    json.dump(self.result_info, f, ensure_ascii=False, indent=4)
+                # 保存前写入性能记录（不含保存环节），保存的文件同样包含meta中的perf字段
+                self.perf.record(self.data_info)
+                # 结果保存为geojson格式（save_type为npz时保存为npz格式），噪点信息放在meta字段中
+                file_type = "npz" if self.save_type == "npz" else "json"
+                file_path = os.path.join(self.save_path, os.path.splitext(self.data_name)[0] + '_denoising.' + file_type)
+                if file_type == "npz":
+                    self.perf.begin("save")
+                    TrajData.from_pd(self.pd_data, self.data_info).to_npz(file_path)
+                    self.perf.end("save", len(self.pd_data))
+                elif self.save_compact:
+                    # 格式化与写入同时进行，统一记录在save环节中
+                    self.perf.begin("save")
+                    write_geojson_compact(file_path, self.pd_data, self.data_info, self.save_precision)
+                    self.perf.end("save", len(self.pd_data))
+                else:
+                    self.perf.begin("serialize")
+                    json_data = (self.result_info.to_geojson() if isinstance(self.result_info, TrajData)
+                                 else self.result_info)
+                    content = json.dumps(json_data, ensure_ascii=False, indent=4)
+                    self.perf.end("serialize", len(self.pd_data))
+
+                    self.perf.begin("save")
+                    with open(file_path, 'w', encoding='utf-8') as f:
+                        f.write(content)
+                    self.perf.end("save", len(self.pd_data))
         except Exception as e:
             print(f"轨迹降噪失败: {e}")
             self.logger.error(f"轨迹降噪失败: {e}")
 
+        self.perf.finish(self.data_info, self.logger, "denoising", self.data_name)
         return self.result_info
 
 
@@ -0,0 +1,124 @@
+from collections import deque
+from utils.basic_utils import cal_haversine_dis_pairs
+from traj_denoising.denoising import DENOISING_LIMIT_INFO
+
+
+class StreamDenoising(object):
+    """
+    流式（在线）轨迹降噪：逐个接收轨迹点，判断规则与Denoising的两步判断一致，每辆车（每条轨迹）使用一个实例
+    - 出现噪点段（相邻轨迹点距离 >= distance_limit）后，其后的轨迹点暂存在缓冲区，等待下一个噪点段确定是否为噪点
+    - 缓冲区最多max_latency个轨迹点，超出时放弃等待，缓冲区中的轨迹点按非噪点输出，因此每个轨迹点的延迟不超过max_latency个轨迹点
+    - 相邻噪点段之间的轨迹点数量不超过max_latency时，判断结果与批量降噪完全一致
+    """
+    def __init__(self, denoising_level="low", max_latency=100, logger=None):
+        if denoising_level not in DENOISING_LIMIT_INFO:
+            raise Exception(f"暂不支持该降噪等级：{denoising_level}，请换用low、mid或者high")
+        if max_latency < 1:
+            raise Exception(f"max_latency需大于0：{max_latency}")
+        self.distance_limit = DENOISING_LIMIT_INFO[denoising_level]["distance_limit"]
+        self.time_limit = DENOISING_LIMIT_INFO[denoising_level]["time_limit"]
+        self.max_latency = max_latency
+        self.logger = logger
+
+        # 已接收的轨迹点数量、识别的噪点数量
+        self.point_num = 0
+        self.noise_num = 0
+        # 因缓冲区已满而放弃等待的噪点段数量（大于0时，判断结果可能与批量降噪不一致）
+        self.expired_num = 0
+
+        # 上一个轨迹点的坐标；待配对的噪点段（起点坐标、距离）；等待判断的轨迹点（索引、轨迹点）
+        self.last_coord = None
+        self.pending_segment = None
+        self.buffer = deque()
+
+    def __release(self, noise_flag):
+        """
+        输出缓冲区中的全部轨迹点
+        :param noise_flag: 是否为噪点
+        :return: 轨迹点列表，每项为(索引, 轨迹点, 是否为噪点)
+        """
+        result = [(index, point, noise_flag) for index, point in self.buffer]
+        if noise_flag:
+            self.noise_num += len(result)
+        self.buffer.clear()
+        return result
+
+    def push(self, lng, lat, point=None):
+        """
+        接收一个轨迹点（wgs84坐标系，与批量降噪转换坐标系之后一致），输出已确定是否为噪点的轨迹点
+        :param lng: 经度
+        :param lat: 纬度
+        :param point: 轨迹点（原样输出），默认为{"lng": lng, "lat": lat}
+        :return: 轨迹点列表，每项为(索引, 轨迹点, 是否为噪点)，按接收顺序输出
+        """
+        index = self.point_num
+        self.point_num += 1
+        item = (index, {"lng": lng, "lat": lat} if point is None else point)
+        coord = (float(lng), float(lat))
+        last_coord, self.last_coord = self.last_coord, coord
+        # 第一个轨迹点不会是噪点
+        if last_coord is None:
+            return [item + (False,)]
+
+        distance = cal_haversine_dis_pairs([last_coord], [coord])[0]
+        if distance < self.distance_limit:
+            # 没有待配对的噪点段时，当前轨迹点不会是噪点，直接输出
+            if self.pending_segment is None:
+                return [item + (False,)]
+            self.buffer.append(item)
+            if len(self.buffer) <= self.max_latency:
+                return []
+            # 缓冲区已满：放弃等待，缓冲区中的轨迹点按非噪点输出
+            self.expired_num += 1
+            self.pending_segment = None
+            if self.logger is not None:
+                self.logger.warning(f"噪点段之后超过{self.max_latency}个轨迹点未出现下一个噪点段，放弃等待")
+            return self.__release(False)
+
+        # Step1：当前为噪点段；Step2：与待配对的噪点段构成候选对，根据“轴向间距”判断两者之间的轨迹点是否为噪点
+        result = []
+        if self.pending_segment is not None:
+            left_coord, left_dis = self.pending_segment
+            axial_dis = cal_haversine_dis_pairs([left_coord], [coord])[0]
+            noise_flag = bool((left_dis >= self.time_limit * axial_dis) & (distance >= self.time_limit * axial_dis))
+            result = self.__release(noise_flag)
+        # 当前噪点段等待与下一个噪点段配对，其终点（当前轨迹点）开始暂存
+        self.pending_segment = (last_coord, distance)
+        self.buffer.append(item)
+        return result
+
+    def flush(self):
+        """
+        轨迹结束：之后不会再出现噪点段，缓冲区中的轨迹点均不是噪点
+        :return: 轨迹点列表，每项为(索引, 轨迹点, 是否为噪点)
+        """
+        self.pending_segment = None
+        return self.__release(False)
+
+
+if __name__ == '__main__':
+    import json
+    import logging
+    from traj_denoising.denoising import Denoising
+
+    path = r'../data/raw_data'
+    file = '孤立噪点.json'
+    logger = logging.getLogger(__name__)
+
+    # 批量降噪的结果
+    denoising = Denoising(data_path=path, data_name=file, logger=logger)
+    denoising.process()
+    batch_noise = [[point["lng"], point["lat"]] for point in denoising.data_info["noise_info"].get("noise_points", [])]
+
+    # 逐点输入，流式降噪
+    with open(f"{path}/{file}", encoding='utf-8') as f:
+        line = [feature for feature in json.load(f)["features"] if feature["geometry"]["type"] == "LineString"][0]
+    stream = StreamDenoising(logger=logger)
+    emitted = []
+    for lng, lat in line["geometry"]["coordinates"]:
+        emitted.extend(stream.push(lng, lat))
+    emitted.extend(stream.flush())
+    stream_noise = [[point["lng"], point["lat"]] for _, point, noise_flag in emitted if noise_flag]
+    print(f"批量降噪：{batch_noise}")
+    print(f"流式降噪：{stream_noise}，判断结果{'一致' if batch_noise == stream_noise else '不一致'}")
+    print("finished")
@@ -0,0 +1,189 @@
+import os
+import glob
+import json
+import argparse
+import logging
+import logging.handlers
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from traj_pipeline.pipeline import Pipeline, PipelineItem
+from utils.traj_data import TrajData
+
+# 与main.py保持一致的日志格式
+LOG_FORMAT = '%(asctime)s - %(name)s - %(filename)s - %(levelname)s - %(funcName)s - %(lineno)d - %(message)s'
+
+
+def collect_files(input_path):
+    """
+    确定需处理的轨迹文件：文件夹（其中的json、csv、npz文件）或者通配符
+    :param input_path: 文件夹路径或者通配符，例如data/raw_data、data/raw_data/*.json
+    :return: 轨迹文件路径列表
+    """
+    if os.path.isdir(input_path):
+        file_paths = [os.path.join(input_path, name) for name in os.listdir(input_path)]
+    else:
+        file_paths = glob.glob(input_path)
+    return sorted(path for path in file_paths
+                  if os.path.isfile(path) and path.rsplit('.', 1)[-1].lower() in ("json", "csv", "npz"))
+
+
+def find_duplicate_names(file_paths):
+    """
+    查找结果文件会重名的轨迹文件：结果文件名由原文件名（不含扩展名）及处理环节后缀组成，
+    原文件名相同的轨迹文件（例如孤立噪点.csv、孤立噪点.json）保存结果时会相互覆盖
+    :param file_paths: 轨迹文件路径列表
+    :return: 重名的轨迹文件 ==> 与其重名的其他轨迹文件列表
+    """
+    name_info = {}
+    for file_path in file_paths:
+        name_info.setdefault(os.path.splitext(os.path.basename(file_path))[0], []).append(file_path)
+    return {file_path: [other for other in same_name if other != file_path]
+            for same_name in name_info.values() if len(same_name) > 1 for file_path in same_name}
+
+
+def parse_stages(stages):
+    """
+    解析处理环节：逗号分隔的环节名称（例如denoising,simplify），或者json格式的环节配置
+    :param stages: 处理环节
+    :return: 处理环节配置列表
+    """
+    if stages.strip().startswith('['):
+        return json.loads(stages)
+    return [{"stage": stage.strip()} for stage in stages.split(',') if stage.strip()]
+
+
+def init_worker(log_queue):
+    """
+    子进程初始化：日志统一发送至主进程，由主进程写入日志文件（避免多进程同时写文件）
+    :param log_queue: 日志队列
+    :return:
+    """
+    root_logger = logging.getLogger()
+    root_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root_logger.setLevel(logging.INFO)
+
+
+def process_file(file_path, stages, save_path="", coord_type="wgs84", save_type="json"):
+    """
+    处理单个轨迹文件（在子进程中执行），异常不向外抛出，保证单个文件失败不影响整个批次
+    :param file_path: 轨迹文件路径
+    :param stages: 处理环节配置
+    :param save_path: 保存路径
+    :param coord_type: 轨迹数据的坐标系
+    :param save_type: 保存类型
+    :return: 处理结果：文件、状态、信息
+    """
+    logger = logging.getLogger(__name__)
+    data_path, data_name = os.path.split(file_path)
+    inputs = {"data_path": data_path,
+              "data_name": data_name,
+              "data_type": data_name.rsplit('.', 1)[-1].lower(),
+              "stages": stages,
+              "coord_type": coord_type,
+              "save_path": save_path,
+              "save_type": save_type,
+              "logger": logger}
+    try:
+        PipelineItem(**inputs)
+        result = Pipeline(**inputs).process()
+        if result is None:
+            return {"file": file_path, "status": "failed", "message": "轨迹处理失败，详见日志"}
+
+        # npz文件的处理结果为TrajData
+        meta = result.meta if isinstance(result, TrajData) else result["meta"]
+        pipeline_info = meta["pipeline_info"]
+        failed_stages = [info["stage"] for info in pipeline_info if info["status"] != "success"]
+        if failed_stages:
+            return {"file": file_path, "status": "failed", "message": f"处理环节失败：{failed_stages}"}
+        return {"file": file_path, "status": "success", "message": ""}
+    except Exception as e:
+        logger.error(f"{file_path} 处理失败: {e}")
+        return {"file": file_path, "status": "failed", "message": str(e)}
+
+
+def run_batch(input_path, stages, save_path="", workers=None, coord_type="wgs84", save_type="json",
+              log_file_path=os.path.join('./logs', 'trajectory_service.log')):
+    """
+    批量处理轨迹文件：使用进程池并行处理，汇总各文件的处理结果
+    :param input_path: 文件夹路径或者通配符
+    :param stages: 处理环节配置
+    :param save_path: 保存路径（结果文件沿用_denoising、_supplement、_simplify后缀）
+    :param workers: 进程数，默认为CPU核数
+    :param coord_type: 轨迹数据的坐标系
+    :param save_type: 保存类型
+    :param log_file_path: 日志文件路径
+    :return: 各文件的处理结果
+    """
+    file_paths = collect_files(input_path)
+    if len(file_paths) == 0:
+        print(f"未找到轨迹文件：{input_path}")
+        return []
+
+    log_dir = os.path.dirname(log_file_path)
+    if log_dir and not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    if save_path and not os.path.exists(save_path):
+        os.makedirs(save_path)
+
+    # 主进程统一写日志文件
+    file_handler = logging.FileHandler(log_file_path, mode='a', encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    manager = multiprocessing.Manager()
+    log_queue = manager.Queue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    listener.start()
+
+    results = []
+    # 保存结果时，原文件名相同的轨迹文件结果会相互覆盖（并行时相互竞争），均不处理
+    duplicate_info = find_duplicate_names(file_paths) if save_path else {}
+    for file_path, others in duplicate_info.items():
+        result = {"file": file_path, "status": "failed",
+                  "message": f"结果文件与{others}重名，请重命名轨迹文件或分批处理"}
+        results.append(result)
+        print(f"[{result['status']}] {result['file']} {result['message']}")
+    file_paths = [file_path for file_path in file_paths if file_path not in duplicate_info]
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(log_queue,)) as executor:
+            futures = {executor.submit(process_file, file_path, stages, save_path, coord_type, save_type): file_path
+                       for file_path in file_paths}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # 子进程异常退出等情况
+                    result = {"file": futures[future], "status": "failed", "message": str(e)}
+                results.append(result)
+                print(f"[{result['status']}] {result['file']} {result['message']}")
+    finally:
+        listener.stop()
+        file_handler.close()
+        manager.shutdown()
+
+    results.sort(key=lambda r: r["file"])
+    success_num = sum(1 for result in results if result["status"] == "success")
+    print(f"共处理{len(results)}个轨迹文件，成功{success_num}个，失败{len(results) - success_num}个")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量处理轨迹文件（降噪、补全、抽稀）")
+    parser.add_argument("input", help="文件夹路径或者通配符，例如data/raw_data、'data/raw_data/*.json'")
+    parser.add_argument("--stages", default="denoising",
+                        help="处理环节：逗号分隔的环节名称（例如denoising,supplement,simplify），或者json格式的环节配置")
+    parser.add_argument("--save-path", default="", help="保存路径")
+    parser.add_argument("--save-type", default="json", choices=["json", "csv", "npz"], help="保存类型")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认为CPU核数")
+    parser.add_argument("--coord-type", default="wgs84", choices=["wgs84", "gcj02", "bd09ll"], help="轨迹数据的坐标系")
+    parser.add_argument("--report", default="", help="处理结果汇总文件（json）")
+    args = parser.parse_args()
+
+    results = run_batch(args.input, parse_stages(args.stages), args.save_path, args.workers, args.coord_type,
+                        args.save_type)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+
+
+if __name__ == '__main__':
+    main()
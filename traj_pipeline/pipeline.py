@@ -0,0 +1,215 @@
+import os
+import json
+import pandas as pd
+from pydantic import BaseModel, ValidationError
+from traj_denoising.denoising import Denoising, DenoisingItem
+from traj_simplify.simplify import Simplify, SimplifyItem
+from traj_supplement.supplement import Supplement, SupplementItem
+from utils.traj_data import TrajData
+from utils.geojson_stream import read_geojson_stream
+from utils.geojson_writer import write_geojson_compact
+
+
+class PipelineItem(BaseModel):
+    data_path: str
+    data_name: str
+    stages: list
+    data_type: str = "json"
+    coord_type: str = "wgs84"
+    save_path: str = ""
+    save_type: str = "json"
+    data_info: object = None
+    logger: object = None
+    traj_data: object = None
+    save_compact: bool = False
+    save_precision: int = 6
+
+
+class Pipeline(object):
+    def __init__(self, data_path, data_name, stages, data_type='json', data_info=None, logger=None, coord_type="wgs84",
+                 save_path="", save_type='json', traj_data=None, save_compact=False, save_precision=6):
+        self.data_path = data_path
+        self.data_name = data_name
+        # 处理环节配置（按顺序执行），形如[{"stage": "denoising", "denoising_level": "mid"}, {"stage": "simplify"}]
+        # 除stage外的字段作为对应模块的入参
+        self.stages = stages
+        self.data_type = data_type
+        # 若为json文件，轨迹信息在meta字段中；若为csv文件，则需要额外传入轨迹信息
+        self.data_info = data_info
+        self.logger = logger
+        self.coord_type = coord_type
+        self.save_path = save_path
+        self.save_type = save_type
+        # 内存中的轨迹数据（TrajData）：若传入，则不再读取文件，处理结果同样以TrajData的形式返回
+        self.traj_data = traj_data
+        # 最终结果保存为紧凑格式的json文件（无缩进，坐标保留save_precision位小数）
+        self.save_compact = save_compact
+        self.save_precision = save_precision
+
+        # 各个处理环节对应的模块、入参校验模型、结果文件后缀
+        self.stage_info = {
+            "denoising": (Denoising, DenoisingItem, "_denoising"),
+            "supplement": (Supplement, SupplementItem, "_supplement"),
+            "simplify": (Simplify, SimplifyItem, "_simplify"),
+        }
+
+        # 当前轨迹数据的坐标系：某一环节成功执行（已转换为wgs84坐标系）后才更新，失败时该环节的输入仍为原坐标系
+        self.current_coord_type = coord_type
+
+        self.result_data = None
+        self.result_info = None
+
+    def __read_traj(self):
+        """
+        读取轨迹数据，转换为TrajData（整个流程只读取、解析一次）
+        :return:
+        """
+        if self.traj_data is not None:
+            self.result_data = self.traj_data
+        elif self.data_type == "json":
+            # 流式读取：坐标、时间戳等数组直接解析到numpy数组，不构造python列表
+            data, columns = read_geojson_stream(os.path.join(self.data_path, self.data_name))
+            self.result_data = TrajData(columns["lng"], columns["lat"], columns["timestamp"], columns["speed"],
+                                        columns["direction"], data.get("meta"))
+        elif self.data_type == "npz":
+            # 内存映射加载，不解析文件
+            self.result_data = TrajData.from_npz(os.path.join(self.data_path, self.data_name))
+        elif self.data_type == "csv":
+            data = pd.read_csv(os.path.join(self.data_path, self.data_name))
+            self.result_data = TrajData.from_pd(data, {} if self.data_info is None else self.data_info)
+        else:
+            self.logger.error("暂不支持该类轨迹文件，请转换为json、csv或npz格式")
+            raise Exception("暂不支持该类轨迹文件，请转换为json、csv或npz格式")
+
+    def __check_stages(self):
+        """
+        检查处理环节配置：环节名称、各环节的入参
+        :return:
+        """
+        if len(self.stages) == 0:
+            self.logger.error("未指定处理环节")
+            raise Exception("未指定处理环节")
+
+        for stage_config in self.stages:
+            stage = stage_config.get("stage")
+            if stage not in self.stage_info:
+                self.logger.error(f"暂不支持{stage}，请换用denoising、supplement或者simplify")
+                raise Exception(f"暂不支持{stage}，请换用denoising、supplement或者simplify")
+            _, stage_item, _ = self.stage_info[stage]
+            stage_item(**self.__stage_params(stage_config))
+
+    def __stage_params(self, stage_config):
+        """
+        确定处理环节的入参：轨迹数据在内存中传递，中间结果不保存
+        :param stage_config: 处理环节配置
+        :return: 入参
+        """
+        params = {key: value for key, value in stage_config.items() if key != "stage"}
+        params.update({"data_path": self.data_path,
+                       "data_name": self.data_name,
+                       # 首个成功执行的环节完成坐标转换后，后续环节的轨迹均为wgs84坐标系
+                       "coord_type": self.current_coord_type,
+                       "save_path": "",
+                       "logger": self.logger,
+                       "traj_data": self.result_data})
+        return params
+
+    def __pipeline_core(self):
+        """
+        依次执行各个处理环节，前一环节的结果（TrajData）直接作为后一环节的输入
+        :return: 成功执行的环节对应的结果文件后缀
+        """
+        suffix = ""
+        pipeline_info = []
+        for stage_config in self.stages:
+            stage = stage_config["stage"]
+            stage_class, _, stage_suffix = self.stage_info[stage]
+            stage_result = stage_class(**self.__stage_params(stage_config)).process()
+
+            # 各环节共用同一个meta，性能记录（开启profile时）移至各环节的执行状态中，避免被后续环节覆盖
+            stage_perf = self.result_data.meta.pop("perf", None)
+
+            # 各环节的process()内部处理异常：若失败，则返回输入的轨迹数据（或None）
+            if stage_result is None or stage_result is self.result_data:
+                self.logger.warning(f"处理环节{stage}失败，使用该环节的输入继续后续环节")
+                stage_status = {"stage": stage, "status": "failed"}
+            else:
+                self.result_data = stage_result
+                self.current_coord_type = "wgs84"
+                stage_status = {"stage": stage, "status": "success"}
+                suffix += stage_suffix
+            if stage_perf is not None:
+                stage_status["perf"] = stage_perf
+            pipeline_info.append(stage_status)
+
+        # 各环节的信息（noise_info、missing_supplement_info、simplify_info等）均记录在同一个meta中
+        self.result_data.meta["pipeline_info"] = pipeline_info
+        return suffix
+
+    def __save_traj(self, suffix):
+        """
+        保存最终结果：文件名由原文件名及成功执行的各环节后缀组成，例如"孤立噪点_denoising_simplify.json"
+        :param suffix: 结果文件后缀
+        :return:
+        """
+        file_path = os.path.join(self.save_path, os.path.splitext(self.data_name)[0] + suffix + '.' + self.save_type)
+        if self.save_type == "csv":
+            self.result_data.to_pd().to_csv(file_path, index=False)
+        elif self.save_type == "npz":
+            self.result_data.to_npz(file_path)
+        elif self.save_compact:
+            write_geojson_compact(file_path, self.result_data.to_pd(), self.result_data.meta, self.save_precision)
+        else:
+            # 返回结果为TrajData时转换为geojson；先生成文件内容再写入，避免序列化失败时留下空文件
+            json_data = (self.result_data.to_geojson() if isinstance(self.result_info, TrajData)
+                         else self.result_info)
+            content = json.dumps(json_data, ensure_ascii=False, indent=4)
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+
+    def process(self):
+        """
+        轨迹处理全流程：读取轨迹数据；依次执行降噪、补全、抽稀等环节；保存结果
+        :return: geojson格式的轨迹数据（若输入为TrajData则返回TrajData）：可能为None（轨迹读取或配置异常）、处理后的轨迹
+        """
+        try:
+            self.__check_stages()
+            self.__read_traj()
+            self.logger.info("轨迹数据读取完毕")
+
+            suffix = self.__pipeline_core()
+            self.logger.info("轨迹处理全流程执行完毕")
+
+            # 仅在流程结束时转换为geojson（输入为TrajData或npz文件时，直接返回TrajData）
+            if self.traj_data is not None or self.data_type == "npz":
+                self.result_info = self.result_data
+            else:
+                self.result_info = self.result_data.to_geojson()
+            if self.save_path != "":
+                self.__save_traj(suffix)
+        except Exception as e:
+            self.logger.error(f"轨迹处理失败: {e}")
+
+        return self.result_info
+
+
+if __name__ == '__main__':
+    import logging
+
+    path = r'../data/raw_data'
+    save_path = r'../data/result_data'
+
+    file = '孤立噪点.json'
+    stages = [{"stage": "denoising", "denoising_level": "low"},
+              {"stage": "supplement", "supplement_mode": "interpolate"},
+              {"stage": "simplify", "simplify_mode": "rdp"}]
+    params = {'data_path': path, 'data_name': file, 'stages': stages, 'save_path': save_path,
+              'logger': logging.getLogger(__name__)}
+
+    try:
+        PipelineItem(**params)
+        pipeline = Pipeline(**params)
+        pipeline.process()
+    except ValidationError as e:
+        print(e)
+    print("finished")
@@ -2,11 +2,15 @@ import os
 import json
 import numpy as np
 import pandas as pd
-from pyproj import CRS, Transformer
-from shapely.geometry import Point, LineString
 from pydantic import BaseModel, ValidationError
-from utils.basic_utils import (cal_haversine_dis, cal_bearing,
+from utils.basic_utils import (cal_bearing_vector,
                                examine_and_update_raw_data, update_pd_data, cal_traj_info, pd_to_geojson, geojson_to_pd)
+from utils.traj_data import TrajData
+from utils.perf import PerfRecorder
+from utils.geojson_stream import geojson_stream_to_pd
+from utils.geojson_writer import write_geojson_compact
+from utils.projection import get_utm_transformers
+from traj_simplify.stream_simplify import StreamSimplify
 
 
 class SimplifyItem(BaseModel):
@@ -20,32 +24,58 @@ class SimplifyItem(BaseModel):
     simplify_level: str = "low"
     data_info: object = None
     logger: object = None
+    traj_data: object = None
+    profile: bool = False
+    stream_read: bool = False
+    save_compact: bool = False
+    save_precision: int = 6
+    utm_zone: int = None
+    sync_time: bool = False
+    window_size: int = 100
 
 
 class Simplify(object):
     def __init__(self, data_path, data_name, data_type='json', data_info=None, logger=None, coord_type="wgs84",
                  save_path="", save_type='json',
-                 simplify_mode='interval_oriented', simplify_level="low"):
+                 simplify_mode='interval_oriented', simplify_level="low", traj_data=None,
+                 profile=False, stream_read=False,
+                 save_compact=False, save_precision=6, utm_zone=None, sync_time=False, window_size=100):
         self.data_path = data_path
         self.data_name = data_name
         self.data_type = data_type
         # 若为json文件，轨迹信息在meta字段中；若为csv文件，则需要额外传入轨迹信息
         self.data_info = data_info
         self.logger = logger
+        # 内存中的轨迹数据（TrajData）：若传入，则不再读取文件，处理结果同样以TrajData的形式返回
+        self.traj_data = traj_data
+        # 性能记录（默认不开启）：各环节的耗时、轨迹点数量、峰值内存，记录在meta的perf字段中
+        self.perf = PerfRecorder(profile)
+        # 流式读取json文件（内存占用与轨迹点数量成正比，适用于超大文件），处理失败时返回None而不是原始轨迹
+        self.stream_read = stream_read
+        # 结果保存为紧凑格式的json文件（无缩进，坐标保留save_precision位小数），数组直接由numpy格式化，适用于超大轨迹
+        self.save_compact = save_compact
+        self.save_precision = save_precision
         self.coord_type = coord_type
         self.save_path = save_path
         self.save_type = save_type
         self.simplify_mode = simplify_mode
         self.simplify_level = simplify_level
+        # 投影坐标系的UTM带号（1~60），默认根据轨迹中心自动确定
+        self.utm_zone = utm_zone
+        # opening_window：是否使用时间同步误差（需要时间戳）、窗口最多包含的轨迹点数量
+        self.sync_time = sync_time
+        self.window_size = window_size
 
         # simplify_level越大，表示抽稀力度越大，保留的轨迹点越少
         # interval_oriented：参数表示轨迹点期望采样间隔
         # downclocking：参数表示轨迹点期望下采样频率（若为1，则表示跳过1个点保留1个点）
         # rdp：参数表示drp算法的距离阈值
+        # opening_window：参数表示开窗法的误差阈值（单位：m）
         self.simplify_info = {
             "interval_oriented": {"low": 5, "mid": 10, "high": 15},
             "downclocking": {"low": 1, "mid": 2, "high": 3},
-            "rdp": {"low": 5, "mid": 8, "high": 10}
+            "rdp": {"low": 5, "mid": 8, "high": 10},
+            "opening_window": {"low": 5, "mid": 8, "high": 10}
         }
         self.core_param = self.simplify_info[self.simplify_mode][self.simplify_level]
 
@@ -58,18 +88,29 @@ class Simplify(object):
 
         self.result_info = None
 
-        self.from_crs = CRS('EPSG: 4326')
-        self.to_crs = CRS('EPSG: 32648')
-
-        self.trans_4326 = Transformer.from_crs(self.from_crs, self.to_crs, always_xy=True)
-        self.trans_32648 = Transformer.from_crs(self.to_crs, self.from_crs, always_xy=True)
-
     def __read_examine_update_traj(self):
         """
         读取轨迹数据并检查关键字段
         :return:
         """
-        if self.data_type == "json":
+        self.perf.begin("read")
+        if self.traj_data is None and self.data_type == "npz":
+            # npz文件以内存映射的方式加载为TrajData，按内存中的轨迹数据处理（结果同样为TrajData）
+            self.traj_data = TrajData.from_npz(os.path.join(self.data_path, self.data_name))
+        if self.traj_data is not None:
+            self.data = self.traj_data
+            self.result_info = self.traj_data
+            self.data_info = self.traj_data.meta
+            self.pd_data = self.traj_data.to_pd()
+            self.coordinates = self.pd_data[["lng", "lat"]].values
+
+        elif self.data_type == "json" and self.stream_read:
+            self.pd_data, self.coordinates, self.data_info = geojson_stream_to_pd(
+                os.path.join(self.data_path, self.data_name))
+            if self.data_info is None:
+                self.data_info = {}
+
+        elif self.data_type == "json":
             with open(os.path.join(self.data_path, self.data_name), encoding='utf-8') as f:
                 self.data = json.load(f)
                 self.result_info = self.data
@@ -89,10 +130,14 @@ class Simplify(object):
                 self.data_info = {}
             self.result_info = pd_to_geojson(self.pd_data, self.data_info)
         else:
-            self.logger.error("暂不支持该类轨迹文件，请转换为json或csv格式")
-            raise Exception("暂不支持该类轨迹文件，请转换为json或csv格式")
+            self.logger.error("暂不支持该类轨迹文件，请转换为json、csv或npz格式")
+            raise Exception("暂不支持该类轨迹文件，请转换为json、csv或npz格式")
+
+        self.perf.end("read", points_out=len(self.pd_data))
 
         # 检查轨迹数据：关键字段
+        self.perf.begin("examine")
+        points_in = len(self.pd_data)
         available_flag, self.pd_data, key_msg = examine_and_update_raw_data(self.pd_data)
 
         # 分情况处理轨迹信息
@@ -106,96 +151,92 @@ class Simplify(object):
         else:
             self.logger.error(f"轨迹数据存在异常：{key_msg}")
             raise Exception(f'轨迹数据存在异常：{key_msg}')
+        self.perf.end("examine", points_in, len(self.pd_data))
 
     def __rdp_process(self):
         # 轨迹抽稀
-        def cal_projection_distance(left_p, right_p, other_p):
-            # 实现方式1：
-            # 构造shapely库的Point、LineString对象，使用函数得到点到线的距离
-            # Point.distance获取点到线的最小距离：若点在线的范围内，返回投影距离；若不在范围内，则大概率返回点到线的端点的距离（受线形影响）
-            # points_utm = [self.trans_4326.transform(lng, lat) for lng, lat in [left_p, right_p, other_p]]
-            # line_utm = LineString(points_utm[:-1])
-            # h_1 = Point(points_utm[-1]).distance(line_utm)
-
-            # 实现方式2：
+        # 预先计算各个轨迹点的弧度、纬度的余弦值，haversine公式与cal_haversine_dis一致
+        radian_lng = np.radians(self.coordinates[:, 0])
+        radian_lat = np.radians(self.coordinates[:, 1])
+        cos_lat = np.cos(radian_lat)
+
+        def cal_haversine_dis(i, j):
+            """
+            计算轨迹点i与轨迹点j（索引或者切片）之间的球面距离（单位：m）
+            """
+            d = (np.sin((radian_lat[j] - radian_lat[i]) * 0.5) ** 2
+                 + cos_lat[i] * cos_lat[j] * np.sin((radian_lng[j] - radian_lng[i]) * 0.5) ** 2)
+            return 2 * 6371.0088 * np.arcsin(np.sqrt(d)) * 1000
+
+        def cal_projection_distance(left, right):
+            """
+            计算窗口内各个轨迹点到首末点连线的距离
+            :param left: 窗口起点索引
+            :param right: 窗口终点索引
+            :return: 窗口内中间轨迹点（left+1 ~ right-1）的距离数组
+            """
             # 计算点之间的距离，根据海伦公式（Heron’s formula）计算三角形的面积（若共线则为0），根据面积计算某条边的高
-            a = cal_haversine_dis(left_p, other_p)
-            b = cal_haversine_dis(right_p, other_p)
-            c = cal_haversine_dis(left_p, right_p)
-            if a + b > c and b + c > a and c + a > b:
-                s = (a + b + c) / 2
-                h_2 = 2 * np.sqrt(s * (s - a) * (s - b) * (s - c)) / c
-            else:
-                h_2 = 0
-
-            # 【说明】当点不在线的范围内时（比如噪点），根据投影计算的距离比根据三角形计算的数值大，对于确定间距最大的点无影响；
-            #        当点在线的范围内时，两种计算方式的结果基本相等
-            # print(f'根据投影计算的距离为{round(h_1,2)}，根据三角形计算的距离为{round(h_2,2)}')
-            return h_2
-
-        def rdp_core(left, right):
+            # 之前逐点计算三个haversine距离，现改为整个窗口一次性计算，计算公式、顺序不变，结果与逐点计算一致
+            window = slice(left + 1, right)
+            a = cal_haversine_dis(left, window)
+            b = cal_haversine_dis(right, window)
+            c = cal_haversine_dis(left, right)
+            if c == 0:
+                # 首末点重合时不构成三角形
+                return np.zeros(right - left - 1)
+            triangle_mask = (a + b > c) & (b + c > a) & (c + a > b)
+            s = (a + b + c) / 2
+            area_square = np.where(triangle_mask, s * (s - a) * (s - b) * (s - c), 0)
+            return np.where(triangle_mask, 2 * np.sqrt(area_square) / c, 0)
+
+        # 使用显式栈代替递归，避免长直线路段（大量轨迹点）触发递归深度限制
+        remained_mask = np.zeros(len(self.coordinates), dtype=bool)
+        remained_mask[[0, -1]] = True
+        stack = [(0, len(self.coordinates) - 1)]
+        while stack:
+            left, right = stack.pop()
             if right - left < 2:
-                return [left, right]
+                continue
 
             # 若首末点坐标相同，则剔除中间的其他点
-            # if self.coordinates[left] == self.coordinates[right]:
-            #     return [left, right]
-
             if np.all(self.coordinates[left] == self.coordinates[right]):
-                return [left, right]
-
-            max_dis = 0.0
-            max_i = 0
-            for i in range(left + 1, right):
-                distance = cal_projection_distance(
-                    self.coordinates[left], self.coordinates[right], self.coordinates[i]
-                )
-                if distance > max_dis:
-                    max_i = i
-                    max_dis = distance
-
-            if max_dis > self.core_param:
-                results1 = rdp_core(left, max_i)
-                results2 = rdp_core(max_i, right)
-                return results1[:-1] + results2
-            else:
-                return [left, right]
-
-        remained = rdp_core(0, len(self.coordinates) - 1)
+                continue
+
+            distances = cal_projection_distance(left, right)
+            # argmax返回第一个最大值的位置，与逐点比较（distance > max_dis）的结果一致
+            max_i = int(np.argmax(distances))
+            if distances[max_i] > self.core_param:
+                max_i += left + 1
+                remained_mask[max_i] = True
+                stack.append((max_i, right))
+                stack.append((left, max_i))
+
+        remained = np.flatnonzero(remained_mask).tolist()
         self.logger.info(f"是否将要剔除的轨迹点重投影保持轨迹点数量不变:{self.reproject_flag}")
         # 若要重投影，则找到被剔除点，使用投影坐标替换原坐标
         if self.reproject_flag:
-            simplified = []
-            updated_info = []
-            for left, right in zip(remained, remained[1:]):
-                if left + 1 == right:
-                    continue
-                # 找到被剔除点，使用投影坐标替换原坐标
-                for other in range(left + 1, right):
-                    points_utm = [
-                        self.trans_4326.transform(lng, lat)
-                        for lng, lat in [
-                            self.coordinates[left],
-                            self.coordinates[right],
-                            self.coordinates[other],
-                        ]
-                    ]
-                    line_utm = LineString(points_utm[:-1])
-                    # 对于line.project(point)，若点的投影点在线的起点之前，则返回0；若在线的终点之后，则返回线的长度；若在线上，则返回起点到投影点之间的长度
-                    # line.interpolate(line.project(point))，若点的投影点在线的起点之前，则返回起点
-                    point_pro = line_utm.interpolate(
-                        line_utm.project(Point(points_utm[-1]))
-                    )
-                    x, y = point_pro.x, point_pro.y
-                    lng, lat = self.trans_32648.transform(x, y)
-                    # self.coordinates[other] = [lng, lat]
-                    simplified.append(other)
-                    updated_info.append([lng, lat])
-                    # 计算航向角
-                    bearing = cal_bearing(
-                        *self.coordinates[left], *self.coordinates[right]
-                    )
-                    updated_info[-1].append(bearing)
+            remained = np.asarray(remained)
+            simplified = np.flatnonzero(~remained_mask)
+            # 被剔除点所在区间的首末点
+            right = remained[np.searchsorted(remained, simplified)]
+            left = remained[np.searchsorted(remained, simplified) - 1]
+            # 批量转换为投影坐标，计算被剔除点在首末点连线上的投影点
+            trans_to_utm, trans_to_wgs84 = get_utm_transformers(self.coordinates[:, 0], self.coordinates[:, 1],
+                                                                self.utm_zone)
+            x, y = trans_to_utm.transform(self.coordinates[:, 0], self.coordinates[:, 1])
+            dx = x[right] - x[left]
+            dy = y[right] - y[left]
+            square_length = dx ** 2 + dy ** 2
+            # 投影点在连线上的位置（比例）：投影点在连线的起点之前取起点，在终点之后取终点；首末点重合时取起点
+            ratio = np.divide((x[simplified] - x[left]) * dx + (y[simplified] - y[left]) * dy, square_length,
+                              out=np.zeros_like(square_length), where=square_length > 0)
+            ratio = np.clip(ratio, 0, 1)
+            lng, lat = trans_to_wgs84.transform(x[left] + ratio * dx, y[left] + ratio * dy)
+            # 航向角为首末点连线的角度
+            bearing = cal_bearing_vector(self.coordinates[left, 0], self.coordinates[left, 1],
+                                         self.coordinates[right, 0], self.coordinates[right, 1])
+            updated_info = np.column_stack((lng, lat, bearing)).tolist()
+            simplified = simplified.tolist()
             remained = list(range(len(self.coordinates)))
             return {
                 "remained": remained,
@@ -207,7 +248,7 @@ class Simplify(object):
 
     def __simplify_core(self):
         """
-        轨迹抽稀核心模块：降频、滑动窗口、rdp
+        轨迹抽稀核心模块：降频、滑动窗口、rdp、开窗法（流式）
         :return:
         """
         if "interval_oriented" == self.simplify_mode:
@@ -236,6 +277,15 @@ class Simplify(object):
                 self.pd_data.loc[result["simplified"], ["lng", "lat", "direction"]] = (
                     result["updated_info"]
                 )
+        elif "opening_window" == self.simplify_mode:
+            # 逐点输入流式抽稀（与实时接入时的处理结果一致），窗口大小固定，内存占用与轨迹长度无关
+            stream_simplify = StreamSimplify(self.core_param, self.sync_time, self.window_size)
+            timestamps = self.pd_data['timestamp'].values if 'timestamp' in self.pd_data else None
+            remained_points = []
+            for i, (lng, lat) in enumerate(self.coordinates):
+                kept = stream_simplify.push(lng, lat, None if timestamps is None else timestamps[i], i)
+                remained_points.extend(point for _, point in kept)
+            remained_points.extend(point for _, point in stream_simplify.flush())
         else:
             self.logger.error("暂不支持该抽稀方式，请换用有效的抽稀方式")
             raise Exception("暂不支持该抽稀方式，请换用有效的抽稀方式")
@@ -248,7 +298,19 @@ class Simplify(object):
         self.pd_data = self.pd_data.iloc[remained_points]
         self.pd_data.reset_index(drop=True, inplace=True)
 
-        self.result_info = pd_to_geojson(self.pd_data, self.data_info)
+        self.__update_result_info()
+
+    def __update_result_info(self):
+        """
+        更新处理结果：输入为TrajData时返回TrajData（不构造geojson），否则返回geojson
+        :return:
+        """
+        self.perf.begin("serialize")
+        if self.traj_data is not None:
+            self.result_info = TrajData.from_pd(self.pd_data, self.data_info)
+        else:
+            self.result_info = pd_to_geojson(self.pd_data, self.data_info)
+        self.perf.end("serialize", len(self.pd_data))
 
     def process(self):
         """
@@ -260,22 +322,48 @@ class Simplify(object):
             self.__read_examine_update_traj()
             self.logger.info("轨迹数据检查完毕")
             # 计算轨迹基础信息
+            self.perf.begin("traj_info")
             traj_info = cal_traj_info(self.pd_data)
             self.data_info["traj_info"] = traj_info
+            self.perf.end("traj_info", len(self.pd_data))
 
             # 识别噪点并剔除
+            points_in = len(self.pd_data)
+            self.perf.begin("core")
             self.__simplify_core()
+            self.perf.end("core", points_in, len(self.pd_data))
             self.logger.info("轨迹抽稀成功")
             if self.save_path != "":
-                # 结果保存为geojson格式，抽稀前后的轨迹点数量放在meta字段中
-                file_path = os.path.join(self.save_path, self.data_name.split('.')[0] + '_simplify.json')
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    # 使用json.dump()方法将feature_collection对象写入文件
-                    json.dump(self.result_info, f, ensure_ascii=False, indent=4)
+                # 保存前写入性能记录（不含保存环节），保存的文件同样包含meta中的perf字段
+                self.perf.record(self.data_info)
+                # 结果保存为geojson格式（save_type为npz时保存为npz格式），抽稀前后的轨迹点数量放在meta字段中
+                file_type = "npz" if self.save_type == "npz" else "json"
+                file_path = os.path.join(self.save_path, os.path.splitext(self.data_name)[0] + '_simplify.' + file_type)
+                if file_type == "npz":
+                    self.perf.begin("save")
+                    TrajData.from_pd(self.pd_data, self.data_info).to_npz(file_path)
+                    self.perf.end("save", len(self.pd_data))
+                elif self.save_compact:
+                    # 格式化与写入同时进行，统一记录在save环节中
+                    self.perf.begin("save")
+                    write_geojson_compact(file_path, self.pd_data, self.data_info, self.save_precision)
+                    self.perf.end("save", len(self.pd_data))
+                else:
+                    self.perf.begin("serialize")
+                    json_data = (self.result_info.to_geojson() if isinstance(self.result_info, TrajData)
+                                 else self.result_info)
+                    content = json.dumps(json_data, ensure_ascii=False, indent=4)
+                    self.perf.end("serialize", len(self.pd_data))
+
+                    self.perf.begin("save")
+                    with open(file_path, 'w', encoding='utf-8') as f:
+                        f.write(content)
+                    self.perf.end("save", len(self.pd_data))
         except Exception as e:
             print(f"轨迹抽稀失败: {e}")
             self.logger.error(f"轨迹抽稀失败: {e}")
 
+        self.perf.finish(self.data_info, self.logger, "simplify", self.data_name)
         return self.result_info
 
 
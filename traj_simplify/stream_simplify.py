@@ -0,0 +1,112 @@
+import numpy as np
+
+# 每度纬度对应的弧长（单位：m），与cal_haversine_dis使用相同的地球平均半径
+METER_PER_DEGREE = 6371008.8 * np.pi / 180
+
+
+class StreamSimplify(object):
+    """
+    流式（在线）轨迹抽稀：开窗法（opening window），逐个接收轨迹点并输出保留的轨迹点，每辆车（每条轨迹）使用一个实例
+    - 以最近保留的轨迹点为锚点，窗口内的轨迹点到“锚点 ==> 当前轨迹点”线段的距离均不超过max_error时，继续扩大窗口
+    - 否则保留窗口中的最后一个轨迹点（作为新的锚点），窗口内的其他轨迹点剔除，因此被剔除的点到抽稀后轨迹的距离不超过max_error
+    - 窗口最多window_size个轨迹点（超出时同样保留窗口中的最后一个轨迹点），内存占用与轨迹长度无关
+    """
+    def __init__(self, max_error=5, sync_time=False, window_size=100):
+        if max_error < 0:
+            raise Exception(f"max_error不能小于0：{max_error}")
+        if window_size < 1:
+            raise Exception(f"window_size需大于0：{window_size}")
+        # 误差阈值（单位：m）
+        self.max_error = max_error
+        # 时间同步误差（synchronized euclidean distance）：比较轨迹点与线段上同一时刻的位置（按时间线性插值），需要传入时间戳
+        self.sync_time = sync_time
+        self.window_size = window_size
+
+        # 已接收的轨迹点数量、保留的轨迹点数量
+        self.point_num = 0
+        self.remained_num = 0
+
+        # 锚点（经度、纬度、时间戳）；窗口内的轨迹点（预先分配，window_size个）；窗口中最后一个轨迹点（索引、轨迹点）
+        self.anchor = None
+        self.window_lng = np.empty(window_size, dtype=np.float64)
+        self.window_lat = np.empty(window_size, dtype=np.float64)
+        self.window_timestamp = np.empty(window_size, dtype=np.float64)
+        self.window_num = 0
+        self.last_item = None
+
+    def __cal_max_error(self, lng, lat, timestamp):
+        """
+        计算窗口内各个轨迹点相对于“锚点 ==> 当前轨迹点”线段的最大误差（单位：m）
+        以锚点为原点投影到局部平面坐标系（等距圆柱投影，使用锚点与当前轨迹点的平均纬度），逐点计算的开销较小
+        :param lng: 当前轨迹点的经度
+        :param lat: 当前轨迹点的纬度
+        :param timestamp: 当前轨迹点的时间戳
+        :return: 最大误差
+        """
+        anchor_lng, anchor_lat, anchor_timestamp = self.anchor
+        cos_lat = np.cos(np.radians((anchor_lat + lat) / 2))
+        x = (self.window_lng[:self.window_num] - anchor_lng) * METER_PER_DEGREE * cos_lat
+        y = (self.window_lat[:self.window_num] - anchor_lat) * METER_PER_DEGREE
+        dx = (lng - anchor_lng) * METER_PER_DEGREE * cos_lat
+        dy = (lat - anchor_lat) * METER_PER_DEGREE
+        if self.sync_time:
+            # 时间同步误差：线段上按时间比例插值得到同一时刻的位置
+            duration = timestamp - anchor_timestamp
+            ratio = (self.window_timestamp[:self.window_num] - anchor_timestamp) / duration if duration > 0 else 0.0
+        else:
+            # 到线段的距离：投影点在线段的起点之前取起点，在终点之后取终点；锚点与当前轨迹点重合时取锚点
+            square_length = dx ** 2 + dy ** 2
+            ratio = np.clip((x * dx + y * dy) / square_length, 0, 1) if square_length > 0 else 0.0
+        return float(np.max(np.hypot(x - ratio * dx, y - ratio * dy)))
+
+    def push(self, lng, lat, timestamp=None, point=None):
+        """
+        接收一个轨迹点，输出确定保留的轨迹点
+        :param lng: 经度
+        :param lat: 纬度
+        :param timestamp: 时间戳（单位：ms），sync_time为True时必须传入
+        :param point: 轨迹点（原样输出），默认为{"lng": lng, "lat": lat}
+        :return: 保留的轨迹点列表，每项为(索引, 轨迹点)，按接收顺序输出
+        """
+        if self.sync_time and timestamp is None:
+            raise Exception("计算时间同步误差时，轨迹点需要包含时间戳")
+        index = self.point_num
+        self.point_num += 1
+        item = (index, {"lng": lng, "lat": lat} if point is None else point)
+        timestamp = 0.0 if timestamp is None else float(timestamp)
+
+        result = []
+        if self.anchor is None:
+            # 保留第一个轨迹点
+            self.anchor = (float(lng), float(lat), timestamp)
+            self.remained_num += 1
+            return [item]
+        if self.window_num > 0 and (self.window_num == self.window_size
+                                    or self.__cal_max_error(lng, lat, timestamp) > self.max_error):
+            # 保留窗口中的最后一个轨迹点，作为新的锚点
+            last = self.window_num - 1
+            self.anchor = (self.window_lng[last], self.window_lat[last], self.window_timestamp[last])
+            self.window_num = 0
+            self.remained_num += 1
+            result.append(self.last_item)
+
+        self.window_lng[self.window_num] = lng
+        self.window_lat[self.window_num] = lat
+        self.window_timestamp[self.window_num] = timestamp
+        self.window_num += 1
+        self.last_item = item
+        return result
+
+    def flush(self):
+        """
+        轨迹结束：保留最后一个轨迹点
+        :return: 保留的轨迹点列表，每项为(索引, 轨迹点)
+        """
+        result = []
+        if self.window_num > 0:
+            self.remained_num += 1
+            result.append(self.last_item)
+        self.anchor = None
+        self.window_num = 0
+        self.last_item = None
+        return result
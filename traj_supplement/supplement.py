@@ -2,12 +2,16 @@ import os
 import json
 import numpy as np
 import pandas as pd
-from pyproj import CRS, Transformer
-from shapely.geometry import Point, LineString
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel, ValidationError
 from traj_acquisition.traj_acquisition import TrajAcquisition, TrajAcquisitionItem
-from utils.basic_utils import (cal_haversine_dis, cal_bearing,
+from utils.basic_utils import (cal_haversine_dis_pairs, cal_bearing, cal_bearing_vector,
                                examine_and_update_raw_data, update_pd_data, cal_traj_info, pd_to_geojson, geojson_to_pd)
+from utils.traj_data import TrajData
+from utils.perf import PerfRecorder
+from utils.geojson_stream import geojson_stream_to_pd
+from utils.geojson_writer import write_geojson_compact
+from utils.projection import get_utm_transformers
 
 
 class SupplementItem(BaseModel):
@@ -20,26 +24,48 @@ class SupplementItem(BaseModel):
     supplement_mode: str = "route_plan"
     missing_segment_lower: float = 10.0
     missing_segment_upper: float = 50.0
+    route_plan_concurrency: int = 4
     data_info: object = None
     logger: object = None
+    traj_data: object = None
+    profile: bool = False
+    stream_read: bool = False
+    save_compact: bool = False
+    save_precision: int = 6
+    utm_zone: int = None
 
 
 class Supplement(object):
     def __init__(self, data_path, data_name, data_type='json', data_info=None, logger=None, coord_type="wgs84",
                  save_path="", save_type='json',
-                 supplement_mode="route_plan", missing_segment_lower=10.0, missing_segment_upper=50.0):
+                 supplement_mode="route_plan", missing_segment_lower=10.0, missing_segment_upper=50.0, traj_data=None,
+                 route_plan_concurrency=4, profile=False, stream_read=False,
+                 save_compact=False, save_precision=6, utm_zone=None):
         self.data_path = data_path
         self.data_name = data_name
         self.data_type = data_type
         # 若为json文件，轨迹信息在meta字段中；若为csv文件，则需要额外传入轨迹信息
         self.data_info = data_info
         self.logger = logger
+        # 内存中的轨迹数据（TrajData）：若传入，则不再读取文件，处理结果同样以TrajData的形式返回
+        self.traj_data = traj_data
+        # 性能记录（默认不开启）：各环节的耗时、轨迹点数量、峰值内存，记录在meta的perf字段中
+        self.perf = PerfRecorder(profile)
+        # 流式读取json文件（内存占用与轨迹点数量成正比，适用于超大文件），处理失败时返回None而不是原始轨迹
+        self.stream_read = stream_read
+        # 结果保存为紧凑格式的json文件（无缩进，坐标保留save_precision位小数），数组直接由numpy格式化，适用于超大轨迹
+        self.save_compact = save_compact
+        self.save_precision = save_precision
         self.coord_type = coord_type
         self.save_path = save_path
         self.save_type = save_type
         self.supplement_mode = supplement_mode
         self.missing_segment_lower = missing_segment_lower
         self.missing_segment_upper = missing_segment_upper
+        # 采用route_plan方式时，同时请求路径规划的缺失段数量上限（线程池大小）
+        self.route_plan_concurrency = route_plan_concurrency
+        # 投影坐标系的UTM带号（1~60），默认根据缺失段的中心自动确定
+        self.utm_zone = utm_zone
 
         # supplement_mode：
         # 方式1：route_plan，调用【轨迹获取模块 traj acquisition】，使用API的路径规划能力补全缺失段
@@ -58,18 +84,29 @@ class Supplement(object):
 
         self.result_info = None
 
-        self.from_crs = CRS('EPSG: 4326')
-        self.to_crs = CRS('EPSG: 32648')
-
-        self.trans_4326 = Transformer.from_crs(self.from_crs, self.to_crs, always_xy=True)
-        self.trans_32648 = Transformer.from_crs(self.to_crs, self.from_crs, always_xy=True)
-
     def __read_examine_update_traj(self):
         """
         读取轨迹数据并检查关键字段
         :return:
         """
-        if self.data_type == "json":
+        self.perf.begin("read")
+        if self.traj_data is None and self.data_type == "npz":
+            # npz文件以内存映射的方式加载为TrajData，按内存中的轨迹数据处理（结果同样为TrajData）
+            self.traj_data = TrajData.from_npz(os.path.join(self.data_path, self.data_name))
+        if self.traj_data is not None:
+            self.data = self.traj_data
+            self.result_info = self.traj_data
+            self.data_info = self.traj_data.meta
+            self.pd_data = self.traj_data.to_pd()
+            self.coordinates = self.pd_data[["lng", "lat"]].values
+
+        elif self.data_type == "json" and self.stream_read:
+            self.pd_data, self.coordinates, self.data_info = geojson_stream_to_pd(
+                os.path.join(self.data_path, self.data_name))
+            if self.data_info is None:
+                self.data_info = {}
+
+        elif self.data_type == "json":
             with open(os.path.join(self.data_path, self.data_name), encoding='utf-8') as f:
                 self.data = json.load(f)
                 self.result_info = self.data
@@ -89,10 +126,14 @@ class Supplement(object):
                 self.data_info = {}
             self.result_info = pd_to_geojson(self.pd_data, self.data_info)
         else:
-            self.logger.error("暂不支持该类轨迹文件，请转换为json或csv格式")
-            raise Exception("暂不支持该类轨迹文件，请转换为json或csv格式")
+            self.logger.error("暂不支持该类轨迹文件，请转换为json、csv或npz格式")
+            raise Exception("暂不支持该类轨迹文件，请转换为json、csv或npz格式")
+
+        self.perf.end("read", points_out=len(self.pd_data))
 
         # 检查轨迹数据：关键字段
+        self.perf.begin("examine")
+        points_in = len(self.pd_data)
         available_flag, self.pd_data, key_msg = examine_and_update_raw_data(self.pd_data)
 
         # 分情况处理轨迹信息
@@ -106,6 +147,7 @@ class Supplement(object):
         else:
             self.logger.error(f"轨迹数据存在异常：{key_msg}")
             raise Exception(f'轨迹数据存在异常：{key_msg}')
+        self.perf.end("examine", points_in, len(self.pd_data))
 
     def interpolate_point(self, start, end, distance, start_time, interval):
         """
@@ -117,22 +159,21 @@ class Supplement(object):
         :param interval: 缺失段时间间隔
         :return: 补全的轨迹点（不包含缺失段起终点）
         """
-        points = []
-
         direction = cal_bearing(*start, *end)
 
-        point_utm = [self.trans_4326.transform(lng, lat) for lng, lat in [start, end]]
-        line = LineString(point_utm)
+        # 起终点一次性转换为投影坐标，计算直线长度
+        trans_to_utm, trans_to_wgs84 = get_utm_transformers([start[0], end[0]], [start[1], end[1]], self.utm_zone)
+        x, y = trans_to_utm.transform(np.array([start[0], end[0]]), np.array([start[1], end[1]]))
+        line_length = np.hypot(x[1] - x[0], y[1] - y[0])
 
-        # 直线等距插值，默认100m一个点
-        for d in range(self.interpolate_interval, int(distance), self.interpolate_interval):
-            point = line.interpolate(d)
-            x, y = point.x, point.y
-            lng, lat = self.trans_32648.transform(x, y)
-            t = start_time + d / distance * interval
-            points.append([lng, lat, t])
+        # 直线等距插值，默认100m一个点：根据累计长度插值得到投影坐标（超出直线长度时取终点），再批量转换为经纬度
+        distance_list = np.arange(self.interpolate_interval, int(distance), self.interpolate_interval, dtype=float)
+        x_list = np.interp(distance_list, [0, line_length], x)
+        y_list = np.interp(distance_list, [0, line_length], y)
+        lng_list, lat_list = trans_to_wgs84.transform(x_list, y_list)
+        t_list = start_time + distance_list / distance * interval
 
-        data = pd.DataFrame(points, columns=['lng', 'lat', 'timestamp'])
+        data = pd.DataFrame({'lng': lng_list, 'lat': lat_list, 'timestamp': t_list})
         data["direction"] = direction
         # 指定补全的轨迹点的瞬时速度，默认为200km/h
         data["speed"] = self.virtual_speed
@@ -146,7 +187,6 @@ class Supplement(object):
         :param interval: 缺失段时间间隔
         :return: 补全的轨迹点（不包含缺失段起终点）
         """
-        points = []
         # 轨迹点过滤：因为轨迹点可能存在偏移，若偏移到路的另一侧则据此得到的最短路会存在多余的掉头段
         # 根据起点、终点连线的夹角进行简单过滤：若夹角在[45,135][225,315]范围内，则根据起终点经度过滤；否则根据纬度过滤
         # 经测试，效果不佳，暂时不进行调整 -_-
@@ -159,20 +199,74 @@ class Supplement(object):
         #     path = [point for point in path if lat_range[0] <= point[1] <= lat_range[1]]
 
         # 计算direction、timestamp
-        point_utm = [self.trans_4326.transform(lng, lat) for lng, lat in path]
-        line = LineString(point_utm)
-
-        for i in range(1, len(path) - 1):
-            d = line.project(Point(point_utm[i]))
-            t = start_time + d / line.length * interval
-            direction = cal_bearing(*path[i - 1], *path[i])
-            points.append([path[i][0], path[i][1], t, direction])
+        path = np.asarray(path, dtype=float)
+        # 批量转换为投影坐标，计算各个轨迹点沿路线的累计长度
+        trans_to_utm, _ = get_utm_transformers(path[:, 0], path[:, 1], self.utm_zone)
+        x, y = trans_to_utm.transform(path[:, 0], path[:, 1])
+        cumulative_length = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))))
+        total_length = cumulative_length[-1]
+
+        # 根据累计长度所占比例确定时间戳；航向角为上一个轨迹点到当前轨迹点连线的角度
+        if total_length > 0:
+            t_list = start_time + cumulative_length[1:-1] / total_length * interval
+        else:
+            t_list = np.full(len(path) - 2, float(start_time))
+        direction_list = cal_bearing_vector(path[:-2, 0], path[:-2, 1], path[1:-1, 0], path[1:-1, 1])
 
-        data = pd.DataFrame(points, columns=['lng', 'lat', 'timestamp', 'direction'])
+        data = pd.DataFrame({'lng': path[1:-1, 0], 'lat': path[1:-1, 1],
+                             'timestamp': t_list, 'direction': direction_list})
         # 指定补全的轨迹点的瞬时速度，默认为200km/h
         data["speed"] = self.virtual_speed
         return data
 
+    def route_plan_segment(self, missing_segment):
+        """
+        调用【轨迹获取模块】补全单个缺失段，若失败则进行线性插值补全
+        :param missing_segment: 缺失段信息
+        :return: 补全的轨迹点（不包含缺失段起终点）
+        """
+        point_i = [missing_segment['start']['lng'], missing_segment['start']['lat']]
+        time_i = missing_segment['start']['timestamp']
+        point_j = [missing_segment['end']['lng'], missing_segment['end']['lat']]
+        distance = missing_segment['length']
+        delta_t = missing_segment['interval']
+
+        # 起点、终点、中间点的形式符合高德驾车路径规划API的要求
+        origin = str(missing_segment['start']['lng']) + "," + str(missing_segment['start']['lat'])
+        destination = str(missing_segment['end']['lng']) + "," + str(missing_segment['end']['lat'])
+        # 采用高德、ors获取轨迹需要一些额外的参数
+        other_params = {"show_fields": "polyline",
+                        "profile": "driving-hgv",
+                        "format": "geojson"}
+        # 入参都会被转换为wgs84坐标系，轨迹获取模块默认输出为wgs84坐标系
+        inputs = {"origin": origin,
+                  "destination": destination,
+                  "method_type": "amap",
+                  "coord_type": "wgs84",
+                  "other_params": other_params,
+                  "logger": self.logger
+                  }
+        try:
+            TrajAcquisitionItem(**inputs)
+            traj_acquisition = TrajAcquisition(**inputs)
+            geojson_data = traj_acquisition.process()
+        except Exception as e:
+            self.logger.error(f"缺失段 {str(point_i)} -> {str(point_j)}调用【轨迹获取模块】失败: {e}")
+            geojson_data = None
+
+        if geojson_data is None:
+            # 使用线性插值补全
+            print(f"缺失段 {str(point_i)} -> {str(point_j)}调用【轨迹获取模块】补全失败，转而进行线性插值补全")
+            return self.interpolate_point(point_i, point_j, distance, time_i, delta_t)
+
+        # geojson转换为Dataframe
+        api_data, _ = geojson_to_pd(geojson_data)
+
+        supplement_route = api_data[['lng', 'lat']].values.tolist()
+        supplement_route.insert(0, point_i)
+        supplement_route.append(point_j)
+        return self.update_shortest_path(supplement_route, time_i, delta_t)
+
     def get_supplement_point_data(self, missing_segments):
         """
         根据缺失段确定补全段：路径规划、等距插值
@@ -184,46 +278,9 @@ class Supplement(object):
         if "route_plan" == self.supplement_mode:
             self.logger.info("调用【轨迹获取模块】实现缺失段补全，默认调用高德路径规划API获取轨迹")
             print("调用【轨迹获取模块】实现缺失段补全，默认调用高德路径规划API获取轨迹")
-            for missing_segment in missing_segments:
-                point_i = [missing_segment['start']['lng'], missing_segment['start']['lat']]
-                time_i = missing_segment['start']['timestamp']
-                point_j = [missing_segment['end']['lng'], missing_segment['end']['lat']]
-                distance = missing_segment['length']
-                delta_t = missing_segment['interval']
-
-                # 起点、终点、中间点的形式符合高德驾车路径规划API的要求
-                origin = str(missing_segment['start']['lng']) + "," + str(missing_segment['start']['lat'])
-                destination = str(missing_segment['end']['lng']) + "," + str(missing_segment['end']['lat'])
-                # 采用高德、ors获取轨迹需要一些额外的参数
-                other_params = {"show_fields": "polyline",
-                                "profile": "driving-hgv",
-                                "format": "geojson"}
-                # 入参都会被转换为wgs84坐标系，轨迹获取模块默认输出为wgs84坐标系
-                inputs = {"origin": origin,
-                          "destination": destination,
-                          "method_type": "amap",
-                          "coord_type": "wgs84",
-                          "other_params": other_params,
-                          "logger": self.logger
-                          }
-                TrajAcquisitionItem(**inputs)
-                traj_acquisition = TrajAcquisition(**inputs)
-                geojson_data = traj_acquisition.process()
-
-                if geojson_data is None:
-                    # 使用线性插值补全
-                    print(f"缺失段 {str(point_i)} -> {str(point_j)}调用【轨迹获取模块】补全失败，转而进行线性插值补全")
-                    interpolate_data = self.interpolate_point(point_i, point_j, distance, time_i, delta_t)
-                    supplement_list.append(interpolate_data)
-                else:
-                    # geojson转换为Dataframe
-                    api_data, _ = geojson_to_pd(geojson_data)
-
-                    supplement_route = api_data[['lng', 'lat']].values.tolist()
-                    supplement_route.insert(0, point_i)
-                    supplement_route.append(point_j)
-                    api_data = self.update_shortest_path(supplement_route, time_i, delta_t)
-                    supplement_list.append(api_data)
+            # 各个缺失段的路径规划请求相互独立，使用有界线程池并发请求；map按缺失段顺序返回结果
+            with ThreadPoolExecutor(max_workers=max(1, self.route_plan_concurrency)) as executor:
+                supplement_list = list(executor.map(self.route_plan_segment, missing_segments))
 
             return supplement_list
         elif "interpolate" == self.supplement_mode:
@@ -249,26 +306,33 @@ class Supplement(object):
         :return:
         """
         # Step1：识别缺失段
-        # 相邻点的距离在指定的缺失段上下限内则进行记录
-        missing_segments = []
-        for i in range(len(self.coordinates) - 1):
-            point_i = self.coordinates[i]
-            point_j = self.coordinates[i + 1]
-            distance = cal_haversine_dis(point_i, point_j)
-            if self.missing_segment_lower * 1000 <= distance <= self.missing_segment_upper * 1000:
-
-                time_i = self.pd_data.loc[i, 'timestamp']
-                time_j = self.pd_data.loc[i + 1, 'timestamp']
-                delta_t = time_j - time_i
-
-                # {'start':{'lng','lat','timestamp'}, 'end':{'lng','lat','timestamp'}, 'length', 'interval'}
-                missing_segments.append({'start': {'lng': point_i[0],'lat': point_i[1], 'timestamp': time_i},
-                                         'end': {'lng': point_j[0],'lat': point_j[1], 'timestamp': time_j},
-                                         'length': distance, 'interval': delta_t})
+        # 相邻点的距离在指定的缺失段上下限内则进行记录：向量化计算相邻点的距离，一次性筛选出缺失段
+        coordinates = np.asarray(self.coordinates, dtype=float)
+        distance_list = cal_haversine_dis_pairs(coordinates[:-1], coordinates[1:])
+        missing_index = np.flatnonzero((distance_list >= self.missing_segment_lower * 1000)
+                                       & (distance_list <= self.missing_segment_upper * 1000))
+
+        # 根据索引数组确定缺失段起终点的坐标、时间戳
+        timestamps = self.pd_data['timestamp'].values
+        start_points = coordinates[missing_index].tolist()
+        end_points = coordinates[missing_index + 1].tolist()
+        start_times = timestamps[missing_index].tolist()
+        end_times = timestamps[missing_index + 1].tolist()
+        lengths = distance_list[missing_index].tolist()
+
+        # {'start':{'lng','lat','timestamp'}, 'end':{'lng','lat','timestamp'}, 'length', 'interval'}
+        missing_segments = [{'start': {'lng': point_i[0], 'lat': point_i[1], 'timestamp': time_i},
+                             'end': {'lng': point_j[0], 'lat': point_j[1], 'timestamp': time_j},
+                             'length': distance, 'interval': time_j - time_i}
+                            for point_i, point_j, time_i, time_j, distance
+                            in zip(start_points, end_points, start_times, end_times, lengths)]
 
         if len(missing_segments) == 0:
             self.logger.info("未识别到缺失段")
             print("未识别到缺失段")
+            # 输入为TrajData（或者流式读取，未保留原始轨迹）时，返回检查、坐标转换后的轨迹
+            if self.traj_data is not None or self.result_info is None:
+                self.__update_result_info()
             return
 
         self.logger.info(f"识别到{len(missing_segments)}个缺失段，信息如下：")
@@ -301,7 +365,19 @@ class Supplement(object):
         self.pd_data.reset_index(drop=True, inplace=True)
         self.coordinates = self.pd_data[['lng', 'lat']].values.tolist()
 
-        self.result_info = pd_to_geojson(self.pd_data, self.data_info)
+        self.__update_result_info()
+
+    def __update_result_info(self):
+        """
+        更新处理结果：输入为TrajData时返回TrajData（不构造geojson），否则返回geojson
+        :return:
+        """
+        self.perf.begin("serialize")
+        if self.traj_data is not None:
+            self.result_info = TrajData.from_pd(self.pd_data, self.data_info)
+        else:
+            self.result_info = pd_to_geojson(self.pd_data, self.data_info)
+        self.perf.end("serialize", len(self.pd_data))
 
     def process(self):
         """
@@ -313,21 +389,48 @@ class Supplement(object):
             self.__read_examine_update_traj()
             self.logger.info("轨迹数据检查完毕")
             # 计算轨迹基础信息
+            self.perf.begin("traj_info")
             traj_info = cal_traj_info(self.pd_data)
             self.data_info["traj_info"] = traj_info
+            self.perf.end("traj_info", len(self.pd_data))
 
             # 识别缺失段并补全
+            points_in = len(self.pd_data)
+            self.perf.begin("core")
             self.__supplement_core()
+            self.perf.end("core", points_in, len(self.pd_data))
             self.logger.info("轨迹补全成功")
             if self.save_path != "":
-                # 结果保存为geojson格式，缺失段及补全信息放在meta字段中
-                file_path = os.path.join(self.save_path, self.data_name.split('.')[0] + '_supplement.json')
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(self.result_info, f, ensure_ascii=False, indent=4)
+                # 保存前写入性能记录（不含保存环节），保存的文件同样包含meta中的perf字段
+                self.perf.record(self.data_info)
+                # 结果保存为geojson格式（save_type为npz时保存为npz格式），缺失段及补全信息放在meta字段中
+                file_type = "npz" if self.save_type == "npz" else "json"
+                file_path = os.path.join(self.save_path, os.path.splitext(self.data_name)[0] + '_supplement.' + file_type)
+                if file_type == "npz":
+                    self.perf.begin("save")
+                    TrajData.from_pd(self.pd_data, self.data_info).to_npz(file_path)
+                    self.perf.end("save", len(self.pd_data))
+                elif self.save_compact:
+                    # 格式化与写入同时进行，统一记录在save环节中
+                    self.perf.begin("save")
+                    write_geojson_compact(file_path, self.pd_data, self.data_info, self.save_precision)
+                    self.perf.end("save", len(self.pd_data))
+                else:
+                    self.perf.begin("serialize")
+                    json_data = (self.result_info.to_geojson() if isinstance(self.result_info, TrajData)
+                                 else self.result_info)
+                    content = json.dumps(json_data, ensure_ascii=False, indent=4)
+                    self.perf.end("serialize", len(self.pd_data))
+
+                    self.perf.begin("save")
+                    with open(file_path, 'w', encoding='utf-8') as f:
+                        f.write(content)
+                    self.perf.end("save", len(self.pd_data))
         except Exception as e:
             print(f"轨迹补全失败: {e}")
             self.logger.error(f"轨迹补全失败: {e}")
 
+        self.perf.finish(self.data_info, self.logger, "supplement", self.data_name)
         return self.result_info
 
 
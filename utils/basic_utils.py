@@ -7,6 +7,7 @@ import numpy as np
 import pandas as pd
 
 from utils.coordinates import CoordinatesTransform
+from utils.traj_data import TrajData
 
 
 def pd_to_geojson(data, data_info):
@@ -98,7 +99,26 @@ def geojson_to_pd(data):
                 pd_data['speed'] = feature['properties']['speeds']
     return pd_data, coordinates
 
-def save_data(data, data_info=None, save_path="", file_name="", save_type="csv"):
+def update_endpoint_info(data, data_info):
+    """
+    根据首尾轨迹点更新轨迹数据相关信息中的起终点、起止时间（与pd_to_geojson一致），直接读取数组，不构造geojson
+    :param data: dataframe格式的轨迹数据
+    :param data_info: 轨迹数据相关信息
+    :return:
+    """
+    if len(data) == 0:
+        return
+    lng = data["lng"].values
+    lat = data["lat"].values
+    data_info["start_point"] = {"lng": float(lng[0]), "lat": float(lat[0])}
+    data_info["end_point"] = {"lng": float(lng[-1]), "lat": float(lat[-1])}
+    if 'timestamp' in data:
+        timestamp = data["timestamp"].values
+        data_info["start_time"] = str(timestamp[0])
+        data_info["end_time"] = str(timestamp[-1])
+
+def save_data(data, data_info=None, save_path="", file_name="", save_type="csv", compact=False, precision=6,
+              return_json=True):
     """
     保存轨迹数据
     :param data: 轨迹数据
@@ -106,13 +126,15 @@ def save_data(data, data_info=None, save_path="", file_name="", save_type="csv")
     :param save_path: 保存路径
     :param file_name: 文件名
     :param save_type: 文件类型
-    :return:
+    :param compact: 保存为json文件时，是否使用紧凑格式（无缩进，数组直接由numpy格式化，速度更快、文件更小）
+    :param precision: 紧凑格式下坐标的小数位数
+    :param return_json: 是否返回geojson格式的轨迹数据；不需要时（例如批量生成轨迹），紧凑格式、npz格式不再构造geojson
+    :return: geojson格式的轨迹数据（return_json为False时可能为None）
     """
     json_data = None
     if data is not None:
         # 使用generate_info（meta字段的一个子属性）记录轨迹生成相关的信息
         data_info = {"generate_info": data_info}
-        json_data = pd_to_geojson(data, data_info)
 
     # 是否保存处理后的轨迹
     if data is not None and save_path != "":
@@ -122,14 +144,25 @@ def save_data(data, data_info=None, save_path="", file_name="", save_type="csv")
         else:
             file_path = os.path.join(save_path, file_name + '.' + save_type)
 
-        if save_type == "json":
+        if save_type == "json" and compact:
+            # 避免循环导入
+            from utils.geojson_writer import write_geojson_compact
+            write_geojson_compact(file_path, data, data_info, precision)
+        elif save_type == "npz":
+            # 更新meta中的起终点信息（与geojson一致）
+            update_endpoint_info(data, data_info)
+            TrajData.from_pd(data, data_info).to_npz(file_path)
+        elif save_type == "json":
             # 保存为geojson格式的json文件
+            json_data = pd_to_geojson(data, data_info)
             with open(file_path, 'w', encoding='utf-8') as f:
                 # 使用json.dump()方法将feature_collection对象写入文件
                 json.dump(json_data, f, ensure_ascii=False, indent=4)
         else:
             data.to_csv(file_path, index=False)
 
+    if data is not None and json_data is None and return_json:
+        json_data = pd_to_geojson(data, data_info)
     return json_data
 
 def cal_haversine_dis(cur_point, next_point):
@@ -152,6 +185,30 @@ def cal_haversine_dis(cur_point, next_point):
     d = 2 * AVG_EARTH_RADIUS * math.asin(math.sqrt(d))  # in kilometers
     return d * 1000
 
+def cal_haversine_dis_pairs(cur_points, next_points):
+    """
+    向量化计算两组点之间（按位置一一对应）的球面距离（单位：m），返回距离数组
+    :param cur_points: 点的坐标数组，形如[[lng, lat], ...]
+    :param next_points: 另一组点的坐标数组，形状与cur_points相同
+    :return: 距离数组
+    """
+    AVG_EARTH_RADIUS = 6371.0088  # in kilometers
+
+    cur_points = np.radians(np.asarray(cur_points, dtype=float)).reshape(-1, 2)
+    next_points = np.radians(np.asarray(next_points, dtype=float)).reshape(-1, 2)
+    lat1 = cur_points[:, 1]
+    lat2 = next_points[:, 1]
+    dlon = next_points[:, 0] - cur_points[:, 0]
+    dlat = lat2 - lat1
+
+    # Haversine 公式
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arcsin(np.sqrt(a))
+
+    # 计算距离
+    distance = AVG_EARTH_RADIUS * c
+    return distance * 1000
+
 def cal_haversine_dis_vector(df):
     """
     向量化计算相邻点之间的球面距离（单位：m），返回距离数组
@@ -236,39 +293,76 @@ def split_segment(l):
     return segment
 
 
-def cal_direction(data):
+def cal_bearing_vector(lng1, lat1, lng2, lat2):
     """
-    对于轨迹数据，计算或者更新航向角
-    :param data: 轨迹数据（要求有lng、lat列）
-    :return: 更新后的轨迹数据
+    向量化计算航向角（两点连线的角度），与cal_bearing的计算方式一致
+    :param lng1: 上游轨迹点经度数组
+    :param lat1: 上游轨迹点纬度数组
+    :param lng2: 下游轨迹点经度数组
+    :param lat2: 下游轨迹点纬度数组
+    :return: 航向角数组
     """
-    data[['lng_up', 'lat_up']] = data[['lng', 'lat']].shift(1)
-    data[['lng_up', 'lat_up']] = data[['lng_up', 'lat_up']].bfill()
-    data['direction'] = data.apply(
-        lambda row: cal_bearing(row['lng_up'], row['lat_up'], row['lng'], row['lat']), axis=1)
+    # 将经纬度从度转换为弧度
+    lng1_rad, lat1_rad, lng2_rad, lat2_rad = map(np.radians, [lng1, lat1, lng2, lat2])
 
-    # 用第2个点的方向角作为第1个点的方向角
-    data.loc[0, 'direction'] = data.loc[1, 'direction']
-    data.drop(columns=['lng_up', 'lat_up'], inplace=True)
+    # 计算经度差
+    delta_lon = lng2_rad - lng1_rad
 
-    raw_coordinates = data[['lng', 'lat']].values.tolist()
-    # 若相邻轨迹点经纬度相同，则cal_bearing计算得到的航向角为0，使用两侧的轨迹点坐标重新计算航向角
-    # 记录坐标相同的轨迹点
-    i = 0
-    stay_points = []
-    while i < len(raw_coordinates) - 1:
-        if raw_coordinates[i] == raw_coordinates[i + 1]:
-            stay_points.extend([i, i + 1])
-        i += 1
+    # 计算方位角的 y 和 x 分量
+    y = np.sin(delta_lon) * np.cos(lat2_rad)
+    x = np.cos(lat1_rad) * np.sin(lat2_rad) - np.sin(lat1_rad) * np.cos(lat2_rad) * np.cos(delta_lon)
+
+    # 将弧度转换为角度，并确保在 0 到 360 度之间
+    return (np.degrees(np.arctan2(y, x)) + 360) % 360
 
-    stay_segments = split_segment(sorted(set(stay_points)))
 
-    # 更新航向角
-    for stay_segment in stay_segments:
-        up_point = raw_coordinates[max(0, stay_segment[0] - 1)]
-        down_point = raw_coordinates[min(len(raw_coordinates) - 1, stay_segment[-1] + 1)]
-        direction = cal_bearing(*up_point, *down_point)
-        data.loc[stay_segment, 'direction'] = direction
+def cal_direction_vector(lng, lat):
+    """
+    根据经纬度坐标向量化计算航向角：相邻点连线的角度，坐标相同的轨迹点（停留段）使用两侧的轨迹点重新计算
+    :param lng: 经度数组
+    :param lat: 纬度数组
+    :return: 航向角数组
+    """
+    lng = np.asarray(lng, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    n = len(lng)
+    direction = np.zeros(n)
+    if n < 2:
+        return direction
+
+    # 第i个点的航向角为第i-1个点到第i个点连线的角度，用第2个点的方向角作为第1个点的方向角
+    direction[1:] = cal_bearing_vector(lng[:-1], lat[:-1], lng[1:], lat[1:])
+    direction[0] = direction[1]
+
+    # 若相邻轨迹点经纬度相同，则计算得到的航向角为0，使用两侧的轨迹点坐标重新计算航向角
+    # 记录坐标相同的轨迹点，连续的此类轨迹点构成停留段
+    same_flag = (lng[1:] == lng[:-1]) & (lat[1:] == lat[:-1])
+    stay_flag = np.zeros(n, dtype=bool)
+    stay_flag[:-1] |= same_flag
+    stay_flag[1:] |= same_flag
+    if not stay_flag.any():
+        return direction
+
+    # 游程检测：确定各个停留段的起止索引
+    flag_diff = np.diff(np.concatenate(([0], stay_flag.astype(np.int8), [0])))
+    segment_start = np.flatnonzero(flag_diff == 1)
+    segment_end = np.flatnonzero(flag_diff == -1) - 1
+
+    # 停留段的航向角：停留段上游一个点到下游一个点连线的角度
+    up_index = np.maximum(0, segment_start - 1)
+    down_index = np.minimum(n - 1, segment_end + 1)
+    segment_direction = cal_bearing_vector(lng[up_index], lat[up_index], lng[down_index], lat[down_index])
+    direction[stay_flag] = np.repeat(segment_direction, segment_end - segment_start + 1)
+    return direction
+
+
+def cal_direction(data):
+    """
+    对于轨迹数据，计算或者更新航向角
+    :param data: 轨迹数据（要求有lng、lat列）
+    :return: 更新后的轨迹数据
+    """
+    data['direction'] = cal_direction_vector(data['lng'].values, data['lat'].values)
 
 
 def update_direction(data):
@@ -277,38 +371,7 @@ def update_direction(data):
     :param data: 轨迹数据
     :return: 更新后的轨迹数据
     """
-    data["lng_up"] = data["lng"].shift(1)
-    data["lat_up"] = data["lat"].shift(1)
-    data[["lng_up", "lat_up"]] = data[["lng_up", "lat_up"]].bfill()
-    data["direction"] = data.apply(
-        lambda row: cal_bearing(row["lng_up"], row["lat_up"], row["lng"], row["lat"]),
-        axis=1,
-    )
-
-    # 用第2个点的方向角作为第1个点的方向角
-    data.loc[0, "direction"] = data.loc[1, "direction"]
-    data.drop(columns=["lng_up", "lat_up"], inplace=True)
-
-    raw_coordinates = data[["lng", "lat"]].values.tolist()
-    # 若相邻轨迹点经纬度相同，则cal_bearing计算得到的航向角为0，使用两侧的轨迹点坐标重新计算航向角
-    # 记录坐标相同的轨迹点
-    i = 0
-    stay_points = []
-    while i < len(raw_coordinates) - 1:
-        if raw_coordinates[i] == raw_coordinates[i + 1]:
-            stay_points.extend([i, i + 1])
-        i += 1
-
-    stay_segments = split_segment(sorted(set(stay_points)))
-
-    # 更新航向角
-    for stay_segment in stay_segments:
-        up_point = raw_coordinates[max(0, stay_segment[0] - 1)]
-        down_point = raw_coordinates[
-            min(len(raw_coordinates) - 1, stay_segment[-1] + 1)
-        ]
-        direction = cal_bearing(*up_point, *down_point)
-        data.loc[stay_segment, "direction"] = direction
+    data["direction"] = cal_direction_vector(data["lng"].values, data["lat"].values)
     return data
 
 
@@ -332,16 +395,19 @@ def update_speed(data):
     return data
 
 
-def update_pd_data(data, from_crs="gcj02", to_crs="wgs84"):
+def update_pd_data(data, from_crs="gcj02", to_crs="wgs84", offset_mode="formula", precision="normal"):
     """
     更新轨迹数据：对经纬度坐标进行坐标系转换
     :param data: 轨迹数据
     :param from_crs: 现状坐标系
     :param to_crs: 目标坐标系
+    :param offset_mode: gcj02偏移量的计算方式：formula（公式计算）、table（查找表，速度更快，最大误差约2毫米）
+    :param precision: 转换精度：normal（一步近似，误差可达米级）、high（迭代求逆，误差小于毫米）
     :return: 坐标转换后的轨迹数据
     """
-    coord_list = CoordinatesTransform().coord_transform(data[['lng', 'lat']].values.tolist(), from_crs, to_crs, 'list')
-    coord_data = pd.DataFrame(coord_list, columns=['lng_transformed', 'lat_transformed'])
+    coord_array = CoordinatesTransform(offset_mode).coord_transform_array(data[['lng', 'lat']].values, from_crs, to_crs,
+                                                                          precision)
+    coord_data = pd.DataFrame(coord_array, columns=['lng_transformed', 'lat_transformed'])
     result = pd.concat([data, coord_data], axis=1)
     # 删除原有的坐标列，新增WGS84坐标列（命名为lng、lat）
     result.drop(columns=["lng", "lat"], inplace=True)
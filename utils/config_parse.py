@@ -1,12 +1,34 @@
 import os
+import threading
 import configparser
 
+# 项目根目录：配置中的相对路径（例如缓存文件）以项目根目录为基准，与运行时的工作目录无关
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 进程内共享的配置（按配置文件路径区分），每个配置文件只解析一次
+_config_registry = {}
+_config_lock = threading.Lock()
+
+
+def read_config(path=''):
+    """
+    读取配置文件（进程内只解析一次），返回的对象为共享对象，不要修改
+    :param path: 配置文件所在路径
+    :return: configparser.ConfigParser
+    """
+    config_path = os.path.abspath(os.path.join(path, 'config.ini'))
+    with _config_lock:
+        config = _config_registry.get(config_path)
+        if config is None:
+            config = configparser.ConfigParser()
+            config.read(config_path)
+            _config_registry[config_path] = config
+        return config
+
 
 def get_api_key(path='', method='amap'):
-    # 创建一个 ConfigParser 对象
-    config = configparser.ConfigParser()
     # 读取配置文件
-    config.read(os.path.join(path, 'config.ini'))
+    config = read_config(path)
     try:
         # 从配置文件中获取 API Key
         api_key = config.get('API', method)
@@ -16,6 +38,46 @@ def get_api_key(path='', method='amap'):
         return None
 
 
+def get_route_cache_config(path=''):
+    """
+    读取路径规划结果缓存的配置
+    :param path: 配置文件所在路径
+    :return: 缓存配置（dict），未配置或未启用时返回None；缓存文件的相对路径以项目根目录为基准
+    """
+    config = read_config(path)
+    if not config.has_section('ROUTE_CACHE') or not config.getboolean('ROUTE_CACHE', 'enabled', fallback=False):
+        return None
+    try:
+        cache_path = config.get('ROUTE_CACHE', 'path', fallback='cache/route_cache.sqlite')
+        return {"path": os.path.join(PROJECT_ROOT, cache_path),
+                "precision": config.getint('ROUTE_CACHE', 'precision', fallback=5),
+                "ttl": config.getfloat('ROUTE_CACHE', 'ttl', fallback=604800),
+                "max_entries": config.getint('ROUTE_CACHE', 'max_entries', fallback=100000),
+                "prune_interval": config.getint('ROUTE_CACHE', 'prune_interval', fallback=1000)}
+    except ValueError:
+        print("路径规划结果缓存配置有误，请检查配置文件。")
+        return None
+
+
+def get_http_config(path=''):
+    """
+    读取调用路径规划API的HTTP配置（连接池、超时、重试），未配置的项使用默认值
+    :param path: 配置文件所在路径
+    :return: HTTP配置（dict）
+    """
+    config = read_config(path)
+    http_config = {"connect_timeout": config.getfloat('HTTP', 'connect_timeout', fallback=5),
+                   "read_timeout": config.getfloat('HTTP', 'read_timeout', fallback=15),
+                   "retries": config.getint('HTTP', 'retries', fallback=3),
+                   "backoff_factor": config.getfloat('HTTP', 'backoff_factor', fallback=0.5),
+                   "pool_maxsize": config.getint('HTTP', 'pool_maxsize', fallback=10)}
+    # 可选：替换服务商的接口地址
+    for url_name in ['amap_url', 'baidu_url', 'ors_url']:
+        if config.has_option('HTTP', url_name):
+            http_config[url_name] = config.get('HTTP', url_name)
+    return http_config
+
+
 if __name__ == "__main__":
     api_key = get_api_key('../', 'ors')
     if api_key:
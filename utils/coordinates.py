@@ -1,12 +1,25 @@
 import math
+import threading
+import numpy as np
+
+# gcj02偏移量查找表：覆盖is_in_china的范围，间距为0.001度
+GCJ02_TABLE_BOUNDS = (73.66, 135.05, 3.86, 53.55)
+GCJ02_TABLE_STEP = 0.001
+# 进程内共享的查找表（仅构建一次）
+_offset_table_registry = {}
+_registry_lock = threading.Lock()
 
 
 class CoordinatesTransform:
-    def __init__(self):
+    def __init__(self, offset_mode="formula"):
         self.x_pi = math.pi * 3000.0 / 180.0
         self.pi = math.pi
         self.a = 6378245.0  # 长半轴
         self.es = 0.00669342162296594323  # 偏心率平方
+        # gcj02偏移量的计算方式（仅影响向量化的转换）：formula为公式计算；table为查找表线性插值，速度更快，最大误差约2毫米
+        if offset_mode not in ["formula", "table"]:
+            raise Exception(f"暂不支持该偏移量计算方式：{offset_mode}，请换用formula或者table")
+        self.offset_mode = offset_mode
 
     def is_in_china(self, lng, lat):
         """
@@ -18,6 +31,15 @@ class CoordinatesTransform:
         """"""
         return 73.66 <= lng <= 135.05 and 3.86 <= lat <= 53.55
 
+    def is_in_china_array(self, lng, lat):
+        """
+        粗略判断坐标是否在中国范围内（向量化，要求坐标系为WGS84）
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :return: 是否在国内（bool数组）
+        """
+        return (73.66 <= lng) & (lng <= 135.05) & (3.86 <= lat) & (lat <= 53.55)
+
     def wgs84_to_gcj02(self, lng, lat):
         """
         wgs84 to gcj02
@@ -94,6 +116,315 @@ class CoordinatesTransform:
                 math.sin(lng / 30.0 * self.pi)) * 2.0 / 3.0
         return ret
 
+    def __transform_lat_array(self, lng, lat):
+        """
+        计算纬度偏移（向量化）
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :return: 偏移量数组
+        """
+        ret = -100.0 + 2.0 * lng + 3.0 * lat + 0.2 * lat * lat + \
+              0.1 * lng * lat + 0.2 * np.sqrt(np.fabs(lng))
+        ret += (20.0 * np.sin(6.0 * lng * self.pi) + 20.0 *
+                np.sin(2.0 * lng * self.pi)) * 2.0 / 3.0
+        ret += (20.0 * np.sin(lat * self.pi) + 40.0 *
+                np.sin(lat / 3.0 * self.pi)) * 2.0 / 3.0
+        ret += (160.0 * np.sin(lat / 12.0 * self.pi) + 320 *
+                np.sin(lat * self.pi / 30.0)) * 2.0 / 3.0
+        return ret
+
+    def __transform_lng_array(self, lng, lat):
+        """
+        计算经度偏移（向量化）
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :return: 偏移量数组
+        """
+        ret = 300.0 + lng + 2.0 * lat + 0.1 * lng * lng + \
+              0.1 * lng * lat + 0.1 * np.sqrt(np.fabs(lng))
+        ret += (20.0 * np.sin(6.0 * lng * self.pi) + 20.0 *
+                np.sin(2.0 * lng * self.pi)) * 2.0 / 3.0
+        ret += (20.0 * np.sin(lng * self.pi) + 40.0 *
+                np.sin(lng / 3.0 * self.pi)) * 2.0 / 3.0
+        ret += (150.0 * np.sin(lng / 12.0 * self.pi) + 300.0 *
+                np.sin(lng / 30.0 * self.pi)) * 2.0 / 3.0
+        return ret
+
+    def __gcj02_offset_array(self, lng, lat):
+        """
+        计算wgs84与gcj02之间的经纬度偏移（向量化）
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :return: 经度偏移数组、纬度偏移数组
+        """
+        if self.offset_mode == "table":
+            return self.__gcj02_offset_table_array(lng, lat)
+        return self.__gcj02_offset_formula_array(lng, lat)
+
+    def __gcj02_offset_formula_array(self, lng, lat):
+        """
+        计算wgs84与gcj02之间的经纬度偏移（公式计算，向量化）
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :return: 经度偏移数组、纬度偏移数组
+        """
+        d_lat = self.__transform_lat_array(lng - 105.0, lat - 35.0)
+        d_lng = self.__transform_lng_array(lng - 105.0, lat - 35.0)
+        rad_lat = lat / 180.0 * self.pi
+        magic = np.sin(rad_lat)
+        magic = 1 - self.es * magic * magic
+        magic_sqrt = np.sqrt(magic)
+        d_lat = (d_lat * 180.0) / ((self.a * (1 - self.es)) / (magic * magic_sqrt) * self.pi)
+        d_lng = (d_lng * 180.0) / (self.a / magic_sqrt * np.cos(rad_lat) * self.pi)
+        return d_lng, d_lat
+
+    def __build_offset_table(self):
+        """
+        构建gcj02偏移量查找表：偏移公式可以拆分为经度的函数、纬度的函数及交叉项之和，因此只需两个一维表
+        transform_lat(x, y) = transform_lat(x, 0) + transform_lat(0, y) + 100 + 0.1xy
+        transform_lng(x, y) = transform_lng(x, 0) + 2y + 0.1xy
+        偏移量（度）再乘以只与纬度相关的换算系数
+        :return: 经度表（transform_lat(x, 0)、transform_lng(x, 0)）、纬度表（transform_lat(0, y) + 100、纬度偏移换算系数、经度偏移换算系数）
+        """
+        min_lng, max_lng, min_lat, max_lat = GCJ02_TABLE_BOUNDS
+        # 范围为步长的整数倍，取整（而不是向上取整）避免浮点误差多出一个节点，使查找表恰好覆盖GCJ02_TABLE_BOUNDS
+        lng = min_lng + np.arange(int(round((max_lng - min_lng) / GCJ02_TABLE_STEP)) + 1) * GCJ02_TABLE_STEP
+        lat = min_lat + np.arange(int(round((max_lat - min_lat) / GCJ02_TABLE_STEP)) + 1) * GCJ02_TABLE_STEP
+        lng_table = np.vstack((self.__transform_lat_array(lng - 105.0, np.zeros_like(lng)),
+                               self.__transform_lng_array(lng - 105.0, np.zeros_like(lng))))
+
+        rad_lat = lat / 180.0 * self.pi
+        magic = 1 - self.es * np.sin(rad_lat) ** 2
+        magic_sqrt = np.sqrt(magic)
+        lat_table = np.vstack((self.__transform_lat_array(np.zeros_like(lat), lat - 35.0) + 100.0,
+                               180.0 / ((self.a * (1 - self.es)) / (magic * magic_sqrt) * self.pi),
+                               180.0 / (self.a / magic_sqrt * np.cos(rad_lat) * self.pi)))
+        return lng_table, lat_table
+
+    def __get_offset_table(self):
+        """
+        获取共享的gcj02偏移量查找表（进程内仅构建一次，约2MB）
+        :return: 经度表、纬度表
+        """
+        with _registry_lock:
+            table = _offset_table_registry.get("gcj02")
+            if table is None:
+                table = self.__build_offset_table()
+                _offset_table_registry["gcj02"] = table
+            return table
+
+    def __gcj02_offset_table_array(self, lng, lat):
+        """
+        计算wgs84与gcj02之间的经纬度偏移（查找表线性插值，向量化），查找表范围之外的坐标使用公式计算
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :return: 经度偏移数组、纬度偏移数组
+        """
+        lng_table, lat_table = self.__get_offset_table()
+        min_lng, _, min_lat, _ = GCJ02_TABLE_BOUNDS
+        lng_position = (lng - min_lng) / GCJ02_TABLE_STEP
+        lat_position = (lat - min_lat) / GCJ02_TABLE_STEP
+        inside = ((lng_position >= 0) & (lng_position <= lng_table.shape[1] - 1) &
+                  (lat_position >= 0) & (lat_position <= lat_table.shape[1] - 1))
+        # 所在区间的左端点及区间内的位置（比例），范围之外的坐标取第一个区间，之后替换为公式计算的结果
+        lng_index = np.clip(np.nan_to_num(lng_position).astype(np.int64), 0, lng_table.shape[1] - 2)
+        lat_index = np.clip(np.nan_to_num(lat_position).astype(np.int64), 0, lat_table.shape[1] - 2)
+        lng_ratio = lng_position - lng_index
+        lat_ratio = lat_position - lat_index
+
+        def interpolate(table, index, ratio):
+            left = table[index]
+            return left + ratio * (table[index + 1] - left)
+
+        x = lng - 105.0
+        y = lat - 35.0
+        cross = 0.1 * x * y
+        d_lat = ((interpolate(lng_table[0], lng_index, lng_ratio) + interpolate(lat_table[0], lat_index, lat_ratio)
+                  + cross) * interpolate(lat_table[1], lat_index, lat_ratio))
+        d_lng = ((interpolate(lng_table[1], lng_index, lng_ratio) + 2.0 * y + cross)
+                 * interpolate(lat_table[2], lat_index, lat_ratio))
+
+        if not inside.all():
+            outside = ~inside
+            d_lng[outside], d_lat[outside] = self.__gcj02_offset_formula_array(lng[outside], lat[outside])
+        return d_lng, d_lat
+
+    def offset_table_max_error(self, sample_num=1000000, random_state=0):
+        """
+        查找表与公式计算的偏移量之间的最大误差：在查找表范围内随机抽样
+        :param sample_num: 抽样的坐标数量
+        :param random_state: 随机种子
+        :return: 最大误差（单位：m）
+        """
+        min_lng, max_lng, min_lat, max_lat = GCJ02_TABLE_BOUNDS
+        rng = np.random.default_rng(random_state)
+        lng = rng.uniform(min_lng, max_lng, sample_num)
+        lat = rng.uniform(min_lat, max_lat, sample_num)
+        d_lng, d_lat = self.__gcj02_offset_formula_array(lng, lat)
+        table_d_lng, table_d_lat = self.__gcj02_offset_table_array(lng, lat)
+        # 经纬度误差换算为距离（局部平面近似）
+        error = np.hypot((table_d_lng - d_lng) * 111320 * np.cos(np.radians(lat)), (table_d_lat - d_lat) * 110574)
+        return float(error.max())
+
+    def wgs84_to_gcj02_array(self, lng, lat):
+        """
+        wgs84 to gcj02（向量化）
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :return: 转换后的经度数组、纬度数组
+        """
+        lng = np.asarray(lng, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        d_lng, d_lat = self.__gcj02_offset_array(lng, lat)
+        # 若不在中国国内，保持wgs84坐标系下的坐标
+        in_china = self.is_in_china_array(lng, lat)
+        return np.where(in_china, lng + d_lng, lng), np.where(in_china, lat + d_lat, lat)
+
+    def gcj02_to_wgs84_array(self, lng, lat):
+        """
+        gcj02 to wgs84（向量化）
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :return: 转换后的经度数组、纬度数组
+        """
+        lng = np.asarray(lng, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        d_lng, d_lat = self.__gcj02_offset_array(lng, lat)
+        return lng * 2 - lng - d_lng, lat * 2 - lat - d_lat
+
+    def __gcj02_forward_array(self, lng, lat):
+        """
+        wgs84 to gcj02（向量化，不判断是否在国内）：迭代求逆时的正向转换
+        一步近似的gcj02_to_wgs84_array对范围之外的坐标同样计算偏移量，正向转换与之保持一致，两种精度对范围之外的坐标处理相同
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :return: 转换后的经度数组、纬度数组
+        """
+        d_lng, d_lat = self.__gcj02_offset_array(lng, lat)
+        return lng + d_lng, lat + d_lat
+
+    def __bd09_forward_array(self, lng, lat):
+        """
+        wgs84 to bd09（向量化，不判断是否在国内）：迭代求逆时的正向转换
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :return: 转换后的经度数组、纬度数组
+        """
+        return self.gcj02_to_bd09_array(*self.__gcj02_forward_array(lng, lat))
+
+    def __inverse_array(self, forward_func, lng, lat, initial, tolerance=1e-9, max_iteration=20):
+        """
+        迭代求逆（向量化）：求解forward_func(x) = (lng, lat)，每次迭代用正向转换的残差修正x
+        所有坐标同时迭代，已收敛的坐标（残差小于阈值或者为NaN）不再参与后续迭代
+        :param forward_func: 正向转换（例如__gcj02_forward_array）
+        :param lng: 经度数组（正向转换的结果）
+        :param lat: 纬度数组
+        :param initial: 初始值（一步近似的结果）
+        :param tolerance: 收敛阈值（单位：度，1e-9度约为0.1毫米）
+        :param max_iteration: 最大迭代次数，达到后未收敛的坐标保留最后一次迭代的结果
+        :return: 转换后的经度数组、纬度数组
+        """
+        result_lng = np.array(initial[0], dtype=float)
+        result_lat = np.array(initial[1], dtype=float)
+        active_mask = np.ones(len(result_lng), dtype=bool)
+        for _ in range(max_iteration):
+            index = np.flatnonzero(active_mask)
+            if len(index) == 0:
+                break
+            forward_lng, forward_lat = forward_func(result_lng[index], result_lat[index])
+            d_lng = forward_lng - lng[index]
+            d_lat = forward_lat - lat[index]
+            result_lng[index] -= d_lng
+            result_lat[index] -= d_lat
+            active_mask[index] = (np.abs(d_lng) > tolerance) | (np.abs(d_lat) > tolerance)
+        return result_lng, result_lat
+
+    def gcj02_to_wgs84_iterative_array(self, lng, lat, tolerance=1e-9, max_iteration=20):
+        """
+        gcj02 to wgs84（迭代求逆，向量化）：一步近似的误差可达米级，迭代后误差小于tolerance
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :param tolerance: 收敛阈值（单位：度）
+        :param max_iteration: 最大迭代次数
+        :return: 转换后的经度数组、纬度数组
+        """
+        lng = np.asarray(lng, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        return self.__inverse_array(self.__gcj02_forward_array, lng, lat, self.gcj02_to_wgs84_array(lng, lat),
+                                    tolerance, max_iteration)
+
+    def bd09_to_gcj02_iterative_array(self, lng, lat, tolerance=1e-9, max_iteration=20):
+        """
+        bd09 to gcj02（迭代求逆，向量化）
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :param tolerance: 收敛阈值（单位：度）
+        :param max_iteration: 最大迭代次数
+        :return: 转换后的经度数组、纬度数组
+        """
+        lng = np.asarray(lng, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        return self.__inverse_array(self.gcj02_to_bd09_array, lng, lat, self.bd09_to_gcj02_array(lng, lat),
+                                    tolerance, max_iteration)
+
+    def bd09_to_wgs84_iterative_array(self, lng, lat, tolerance=1e-9, max_iteration=20):
+        """
+        bd09 to wgs84（迭代求逆，向量化）
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :param tolerance: 收敛阈值（单位：度）
+        :param max_iteration: 最大迭代次数
+        :return: 转换后的经度数组、纬度数组
+        """
+        lng = np.asarray(lng, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        return self.__inverse_array(self.__bd09_forward_array, lng, lat, self.bd09_to_wgs84_array(lng, lat),
+                                    tolerance, max_iteration)
+
+    def gcj02_to_bd09_array(self, lng, lat):
+        """
+        gcj02 to bd09（向量化）
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :return: 转换后的经度数组、纬度数组
+        """
+        lng = np.asarray(lng, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        z = np.sqrt(lng * lng + lat * lat) + 0.00002 * np.sin(lat * self.x_pi)
+        theta = np.arctan2(lat, lng) + 0.000003 * np.cos(lng * self.x_pi)
+        return z * np.cos(theta) + 0.0065, z * np.sin(theta) + 0.006
+
+    def bd09_to_gcj02_array(self, lng, lat):
+        """
+        bd09 to gcj02（向量化）
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :return: 转换后的经度数组、纬度数组
+        """
+        x = np.asarray(lng, dtype=float) - 0.0065
+        y = np.asarray(lat, dtype=float) - 0.006
+        z = np.sqrt(x * x + y * y) - 0.00002 * np.sin(y * self.x_pi)
+        theta = np.arctan2(y, x) - 0.000003 * np.cos(x * self.x_pi)
+        return z * np.cos(theta), z * np.sin(theta)
+
+    def wgs84_to_bd09_array(self, lng, lat):
+        """
+        wgs84 to bd09（向量化）
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :return: 转换后的经度数组、纬度数组
+        """
+        return self.gcj02_to_bd09_array(*self.wgs84_to_gcj02_array(lng, lat))
+
+    def bd09_to_wgs84_array(self, lng, lat):
+        """
+        bd09 to wgs84（向量化）
+        :param lng: 经度数组
+        :param lat: 纬度数组
+        :return: 转换后的经度数组、纬度数组
+        """
+        return self.gcj02_to_wgs84_array(*self.bd09_to_gcj02_array(lng, lat))
+
     # GCJ02转BD09（火星坐标系转百度坐标系）
     def gcj02_to_bd09(self, lng, lat):
         """
@@ -146,37 +477,58 @@ class CoordinatesTransform:
         gcj02 = self.bd09_to_gcj02(lng, lat)
         return self.gcj02_to_wgs84(gcj02[0], gcj02[1])
 
-    def coord_transform(self, coord, from_coord_type, to_coord_type, coord_type='str'):
+    def coord_transform_array(self, coords, from_coord_type, to_coord_type, precision="normal"):
         """
-        坐标转换
-        :param coord: 坐标
+        坐标转换（向量化）
+        :param coords: 坐标数组，形状为(N,2)，每行为[lng, lat]
         :param from_coord_type: 现状坐标系
         :param to_coord_type: 目标坐标系
-        :param coord_type: 坐标数据类型（str形如'112,32;113,33'；list形如[[112,32],[113,33]]）
-        :return: 转换后的坐标，形如[[112,32],[113,33]]
+        :param precision: 转换精度：normal（一步近似）、high（gcj02、bd09ll转换为wgs84以及bd09ll转换为gcj02时迭代求逆）
+        :return: 转换后的坐标数组，形状为(N,2)
         """
-        if coord_type == 'str':
-            coord_list = [list(map(float, coord.split(','))) for coord in coord.split(';')]
-        else:
-            coord_list = coord
-        result_list = coord_list
+        if precision not in ["normal", "high"]:
+            raise Exception(f"暂不支持该转换精度：{precision}，请换用normal或者high")
+        high_precision = precision == "high"
+        coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        transform_func = None
         if 'gcj02' == from_coord_type:
             if 'wgs84' == to_coord_type:
-                result_list = [list(self.gcj02_to_wgs84(*coord)) for coord in coord_list]
+                transform_func = self.gcj02_to_wgs84_iterative_array if high_precision else self.gcj02_to_wgs84_array
             if 'bd09ll' == to_coord_type:
-                result_list = [list(self.gcj02_to_bd09(*coord)) for coord in coord_list]
+                transform_func = self.gcj02_to_bd09_array
         elif 'wgs84' == from_coord_type:
             if 'gcj02' == to_coord_type:
-                result_list = [list(self.wgs84_to_gcj02(*coord)) for coord in coord_list]
+                transform_func = self.wgs84_to_gcj02_array
             if 'bd09ll' == to_coord_type:
-                result_list = [list(self.wgs84_to_bd09(*coord)) for coord in coord_list]
+                transform_func = self.wgs84_to_bd09_array
         else:
             if 'wgs84' == to_coord_type:
-                result_list = [list(self.bd09_to_wgs84(*coord)) for coord in coord_list]
+                transform_func = self.bd09_to_wgs84_iterative_array if high_precision else self.bd09_to_wgs84_array
             if 'gcj02' == to_coord_type:
-                result_list = [list(self.bd09_to_gcj02(*coord)) for coord in coord_list]
+                transform_func = self.bd09_to_gcj02_iterative_array if high_precision else self.bd09_to_gcj02_array
+
+        if transform_func is None:
+            return coords.copy()
+        return np.column_stack(transform_func(coords[:, 0], coords[:, 1]))
+
+    def coord_transform(self, coord, from_coord_type, to_coord_type, coord_type='str', precision="normal"):
+        """
+        坐标转换
+        :param coord: 坐标
+        :param from_coord_type: 现状坐标系
+        :param to_coord_type: 目标坐标系
+        :param coord_type: 坐标数据类型（str形如'112,32;113,33'；list形如[[112,32],[113,33]]）
+        :param precision: 转换精度：normal（一步近似）、high（迭代求逆），详见coord_transform_array
+        :return: 转换后的坐标，形如[[112,32],[113,33]]
+        """
+        if coord_type == 'str':
+            coord_list = [list(map(float, coord.split(','))) for coord in coord.split(';')]
+        else:
+            coord_list = coord
+        if len(coord_list) == 0:
+            return coord_list
 
-        return result_list
+        return self.coord_transform_array(coord_list, from_coord_type, to_coord_type, precision).tolist()
 
 
 if __name__ == '__main__':
@@ -205,4 +557,7 @@ if __name__ == '__main__':
     print('bd09转换为gcj02')
     print('lng_gcj02:', lng_gcj02, 'lat_gcj02:', lat_gcj02)
 
+    # 查找表与公式计算的最大误差
+    print('offset table max error(m):', CoordinatesTransform("table").offset_table_max_error())
+
     print('finished')
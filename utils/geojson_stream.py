@@ -0,0 +1,179 @@
+import os
+import re
+import json
+import warnings
+import numpy as np
+import pandas as pd
+
+# 需要流式解析的大数组：LineString的坐标（二维数组）、轨迹点的时间戳、速度、航向角（一维数组）
+BULK_START = re.compile(r'"(coordinates)"\s*:\s*\[\s*\[|"(timestamps|speeds|directions)"\s*:\s*\[')
+# 二维数组的结束位置："]"后紧跟"]"
+BULK_END_2D = re.compile(r'\]\s*\]')
+# 大数组在骨架（其余部分）中的占位符
+PLACEHOLDER = "__bulk_{}__"
+PLACEHOLDER_PATTERN = re.compile(r'__bulk_\d+__')
+# 数值解析前去除方括号、引号（时间戳可能为字符串）
+NUMBER_TABLE = str.maketrans('[]"', '   ')
+# 大数组起始标记可能被分块截断，未匹配时保留末尾的字符，与下一块拼接后再次匹配
+CARRY_LENGTH = 256
+
+
+class ArrayBuffer(object):
+    """
+    预分配的numpy缓冲区：容量不足时按2倍扩容，避免构造python列表
+    """
+    def __init__(self, capacity=1024):
+        self.values = np.empty(max(1, capacity), dtype=np.float64)
+        self.size = 0
+
+    def append(self, values):
+        if self.size + len(values) > len(self.values):
+            new_values = np.empty(max(2 * len(self.values), self.size + len(values)), dtype=np.float64)
+            new_values[:self.size] = self.values[:self.size]
+            self.values = new_values
+        self.values[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+    def to_array(self):
+        # 原地截取有效部分（释放多余的容量，不复制数组），之后追加时再扩容
+        if len(self.values) != self.size:
+            self.values.resize(self.size, refcheck=False)
+        return self.values
+
+
+def parse_numbers(text):
+    """
+    解析以","分隔的数值（可以包含方括号、引号及空白字符）
+    :param text: 数值文本
+    :return: 数值数组
+    """
+    text = text.translate(NUMBER_TABLE).strip().strip(',').strip()
+    if text == "":
+        return np.empty(0, dtype=np.float64)
+    with warnings.catch_warnings():
+        # 无法解析的内容（例如null）会触发DeprecationWarning，视为异常
+        warnings.simplefilter("error", DeprecationWarning)
+        values = np.fromstring(text, dtype=np.float64, sep=',')
+    if len(values) != text.count(',') + 1:
+        raise Exception("轨迹数组中存在无法解析的数值")
+    return values
+
+
+def read_geojson_stream(file_path, chunk_size=4 * 1024 * 1024):
+    """
+    流式读取geojson格式的轨迹文件：分块读取，LineString的坐标及timestamps、speeds、directions直接解析到numpy缓冲区，
+    其余部分（meta、起终点等，体积很小）替换大数组后作为“骨架”使用json解析；内存占用约为数组本身的大小，与文件格式化方式无关
+    :param file_path: 轨迹文件路径
+    :param chunk_size: 每次读取的字符数
+    :return: geojson骨架（不包含LineString的数组）、轨迹数据（字典：lng、lat、timestamp、speed、direction，缺失的字段为None），
+             其中lng、lat为坐标数组的视图（不连续），由调用方（TrajData、dataframe）在构造时复制为连续数组
+    """
+    # 根据文件大小预估缓冲区容量（每个轨迹点的各个字段合计至少占用约100个字节），不足时再扩容
+    capacity = max(1024, os.path.getsize(file_path) // 128)
+    skeleton = []
+    buffers = []
+    bulk_2d_list = []
+    # 当前正在解析的大数组：None表示正在读取骨架
+    bulk_buffer = None
+    bulk_2d = False
+    text = ""
+
+    with open(file_path, encoding='utf-8') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            text += chunk
+            eof = chunk == ""
+            while True:
+                if bulk_buffer is None:
+                    match = BULK_START.search(text)
+                    if match is None:
+                        # 未找到大数组，保留末尾字符与下一块拼接
+                        split = len(text) if eof else max(0, len(text) - CARRY_LENGTH)
+                        skeleton.append(text[:split])
+                        text = text[split:]
+                        break
+                    key = match.group(1) or match.group(2)
+                    skeleton.append(text[:match.start()] + f'"{key}": "{PLACEHOLDER.format(len(buffers))}"')
+                    bulk_buffer = ArrayBuffer(capacity * 2 if match.group(1) else capacity)
+                    bulk_2d = match.group(1) is not None
+                    buffers.append(bulk_buffer)
+                    bulk_2d_list.append(bulk_2d)
+                    text = text[match.end():]
+                else:
+                    match = BULK_END_2D.search(text) if bulk_2d else re.search(r'\]', text)
+                    if match is not None:
+                        bulk_buffer.append(parse_numbers(text[:match.start()]))
+                        text = text[match.end():]
+                        bulk_buffer = None
+                        continue
+                    if eof:
+                        raise Exception("轨迹文件不完整，数组未结束")
+                    # 数组未结束：解析到最后一个完整元素（二维数组以"]"为界，一维数组以","为界），其余部分与下一块拼接
+                    split = text.rfind(']') if bulk_2d else text.rfind(',')
+                    if split > 0:
+                        bulk_buffer.append(parse_numbers(text[:split]))
+                        text = text[split:]
+                    break
+            if eof:
+                break
+
+    data = json.loads(''.join(skeleton))
+    if "type" not in data or data["type"] != "FeatureCollection":
+        raise Exception('轨迹数据为json格式时，需要符合geojson的字段标准')
+
+    def get_bulk(value):
+        # 占位符 ==> 数组
+        if isinstance(value, str) and PLACEHOLDER_PATTERN.fullmatch(value):
+            return buffers[int(value[len("__bulk_"):-2])].to_array()
+        return None if value is None else np.asarray(value, dtype=np.float64)
+
+    def restore(value):
+        # 其他位置（例如meta中同名的字段）的占位符还原为列表
+        if isinstance(value, dict):
+            return {key: restore(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [restore(item) for item in value]
+        if isinstance(value, str) and PLACEHOLDER_PATTERN.fullmatch(value):
+            index = int(value[len("__bulk_"):-2])
+            array = buffers[index].to_array()
+            return (array.reshape(-1, 2) if bulk_2d_list[index] else array).tolist()
+        return value
+
+    columns = None
+    for feature in data["features"]:
+        if feature["geometry"]["type"] == "LineString":
+            coordinates = get_bulk(feature["geometry"]["coordinates"])
+            if coordinates is None or len(coordinates) % 2 != 0:
+                raise Exception("LineString的坐标格式不正确")
+            coordinates = coordinates.reshape(-1, 2)
+            properties = feature["properties"]
+            timestamps = get_bulk(properties.get("timestamps"))
+            columns = {"lng": coordinates[:, 0],
+                       "lat": coordinates[:, 1],
+                       "timestamp": None if timestamps is None else timestamps.astype(np.int64),
+                       "speed": get_bulk(properties.get("speeds")),
+                       "direction": get_bulk(properties.get("directions"))}
+            # 骨架中不保留LineString的数组
+            feature["geometry"]["coordinates"] = []
+            for name in ["timestamps", "speeds", "directions"]:
+                if name in properties:
+                    properties[name] = []
+            break
+    if columns is None:
+        raise Exception("geojson中不包含LineString类型的轨迹")
+    return restore(data), columns
+
+
+def geojson_stream_to_pd(file_path, chunk_size=4 * 1024 * 1024):
+    """
+    流式读取geojson格式的轨迹文件并转换为dataframe，结果与geojson_to_pd一致
+    :param file_path: 轨迹文件路径
+    :param chunk_size: 每次读取的字符数
+    :return: dataframe格式的轨迹数据、经纬度坐标数据、轨迹数据相关信息（meta）
+    """
+    data, columns = read_geojson_stream(file_path, chunk_size)
+    pd_data = pd.DataFrame({"lng": columns["lng"], "lat": columns["lat"]})
+    for name in ["timestamp", "direction", "speed"]:
+        if columns[name] is not None:
+            pd_data[name] = columns[name]
+    return pd_data, pd_data[["lng", "lat"]].values, data.get("meta")
@@ -0,0 +1,146 @@
+import json
+import numpy as np
+from utils.basic_utils import pd_to_geojson
+
+# 大数组在geojson骨架中的占位符
+ARRAY_PLACEHOLDER = "__array_{}__"
+# 分块格式化数组，限制字节矩阵占用的内存
+CHUNK_SIZE = 100000
+# 非有限值的输出与json.dump保持一致
+NON_FINITE_TEXT = [(np.isnan, b'NaN'), (np.isposinf, b'Infinity'), (np.isneginf, b'-Infinity')]
+
+
+def format_number_bytes(values, precision=0):
+    """
+    数值数组格式化为ASCII字节矩阵：每行一个数值，按固定小数位数输出，右对齐（左侧以空格补齐，拼接时去除）
+    通过整数运算逐位填充，不构造python字符串、列表
+    :param values: 数值数组（整数数组忽略precision）
+    :param precision: 小数位数
+    :return: 字节矩阵（uint8，形状为(N,宽度)）
+    """
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.integer):
+        precision = 0
+        finite_mask = np.ones(len(values), dtype=bool)
+        scaled = values.astype(np.int64)
+    else:
+        values = values.astype(np.float64)
+        finite_mask = np.isfinite(values)
+        scaled = np.round(np.where(finite_mask, values, 0) * 10 ** precision).astype(np.int64)
+    negative_mask = scaled < 0
+    scaled = np.abs(scaled)
+
+    # 整数部分的位数（至少1位）
+    integer_part = scaled // 10 ** precision
+    integer_width = len(str(int(integer_part.max()))) if len(values) > 0 else 1
+    digit_num = np.ones(len(values), dtype=np.int64)
+    for k in range(1, integer_width):
+        digit_num += integer_part >= 10 ** k
+
+    fraction_width = precision + 1 if precision > 0 else 0
+    width = integer_width + fraction_width + int(negative_mask.any())
+    if not finite_mask.all():
+        width = max(width, 9)
+    matrix = np.full((len(values), width), ord(' '), dtype=np.uint8)
+
+    # 从右往左依次填充小数部分、小数点、整数部分
+    column = width - 1
+    for _ in range(precision):
+        matrix[:, column] = ord('0') + scaled % 10
+        scaled //= 10
+        column -= 1
+    if precision > 0:
+        matrix[:, column] = ord('.')
+        column -= 1
+    for k in range(integer_width):
+        matrix[:, column] = np.where(k < digit_num, ord('0') + scaled % 10, ord(' '))
+        scaled //= 10
+        column -= 1
+
+    # 负号紧挨着整数部分的第一位
+    rows = np.flatnonzero(negative_mask)
+    matrix[rows, width - fraction_width - digit_num[rows] - 1] = ord('-')
+
+    if not finite_mask.all():
+        for func, text in NON_FINITE_TEXT:
+            rows = np.flatnonzero(func(values))
+            matrix[rows] = ord(' ')
+            matrix[rows, width - len(text):] = np.frombuffer(text, dtype=np.uint8)
+    return matrix
+
+
+def join_rows(matrix):
+    """
+    字节矩阵的各行以","拼接为字节串，并去除右对齐时补齐的空格（数值及分隔符中不包含空格）
+    :param matrix: 字节矩阵
+    :return: 字节串
+    """
+    if len(matrix) == 0:
+        return b""
+    rows = np.empty((matrix.shape[0], matrix.shape[1] + 1), dtype=np.uint8)
+    rows[:, :-1] = matrix
+    rows[:, -1] = ord(',')
+    rows = rows.ravel()[:-1]
+    return rows[rows != ord(' ')].tobytes()
+
+
+def write_array(f, columns, precisions):
+    """
+    分块写入数组：单列为一维数组，两列（经度、纬度）为二维数组
+    :param f: 文件对象（二进制）
+    :param columns: 数组列表
+    :param precisions: 各列的小数位数
+    :return:
+    """
+    f.write(b'[')
+    length = len(columns[0])
+    for start in range(0, length, CHUNK_SIZE):
+        end = min(length, start + CHUNK_SIZE)
+        matrices = [format_number_bytes(column[start:end], precision)
+                    for column, precision in zip(columns, precisions)]
+        if len(matrices) == 2:
+            def separator(char):
+                return np.full((end - start, 1), ord(char), dtype=np.uint8)
+            matrix = np.hstack([separator('['), matrices[0], separator(','), matrices[1], separator(']')])
+        else:
+            matrix = matrices[0]
+        if start > 0:
+            f.write(b',')
+        f.write(join_rows(matrix))
+    f.write(b']')
+
+
+def write_geojson_compact(file_path, data, data_info, precision=6, value_precision=None):
+    """
+    保存为紧凑的geojson文件：无缩进，坐标按给定的小数位数输出，数组直接由numpy数组格式化（不构造python列表）
+    字段与pd_to_geojson一致（同样会更新data_info中的起终点信息）
+    :param file_path: 文件路径
+    :param data: dataframe格式的轨迹数据
+    :param data_info: 轨迹数据相关信息
+    :param precision: 坐标的小数位数
+    :param value_precision: 速度、航向角的小数位数，默认与坐标相同（小于原始数据的精度时会丢失精度）
+    :return:
+    """
+    if len(data) == 0:
+        raise Exception("轨迹数据为空，无法保存为geojson文件")
+    if value_precision is None:
+        value_precision = precision
+    # 起终点、meta等使用pd_to_geojson生成（仅传入首尾轨迹点），LineString中的数组使用占位符
+    json_data = pd_to_geojson(data.iloc[[0, -1]], data_info)
+    line = json_data["features"][-1]
+    arrays = [([data["lng"].values, data["lat"].values], [precision, precision])]
+    line["geometry"]["coordinates"] = ARRAY_PLACEHOLDER.format(0)
+    for name, column, column_precision in [("timestamps", "timestamp", 0),
+                                           ("speeds", "speed", value_precision),
+                                           ("directions", "direction", value_precision)]:
+        if name in line["properties"]:
+            line["properties"][name] = ARRAY_PLACEHOLDER.format(len(arrays))
+            arrays.append(([data[column].values], [column_precision]))
+
+    content = json.dumps(json_data, ensure_ascii=False, separators=(',', ':'))
+    with open(file_path, 'wb') as f:
+        for index, (columns, precisions) in enumerate(arrays):
+            before, content = content.split(f'"{ARRAY_PLACEHOLDER.format(index)}"', 1)
+            f.write(before.encode('utf-8'))
+            write_array(f, columns, precisions)
+        f.write(content.encode('utf-8'))
@@ -0,0 +1,105 @@
+import json
+import time
+import tracemalloc
+
+
+class PerfRecorder(object):
+    """
+    性能记录：按环节（read、examine、traj_info、core、serialize、save）记录耗时、输入输出的轨迹点数量、峰值内存
+    默认不开启，此时begin、end直接返回；开启后使用tracemalloc统计内存（会拖慢执行速度，仅用于定位性能问题）
+    环节可以嵌套（例如core中包含serialize），外层环节的耗时不包含内层环节的耗时
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.phases = {}
+        self.start_time = time.perf_counter()
+        # 正在执行的环节（栈）：名称、开始时刻、开始时的内存、内层环节耗时、峰值内存
+        self.stack = []
+        # 是否由本对象开启tracemalloc（结束时需关闭）
+        self.tracemalloc_flag = False
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.tracemalloc_flag = True
+
+    def begin(self, name):
+        """
+        环节开始
+        :param name: 环节名称
+        :return:
+        """
+        if not self.enabled:
+            return
+        current_memory, peak_memory = tracemalloc.get_traced_memory()
+        # 重置峰值前，先记录外层环节的峰值内存
+        if self.stack:
+            self.stack[-1]["peak_memory"] = max(self.stack[-1]["peak_memory"], peak_memory)
+        tracemalloc.reset_peak()
+        self.stack.append({"name": name, "start": time.perf_counter(), "start_memory": current_memory,
+                           "inner_time": 0.0, "peak_memory": current_memory})
+
+    def end(self, name, points_in=None, points_out=None):
+        """
+        环节结束：同名环节多次执行时累加耗时，峰值内存取最大值
+        :param name: 环节名称
+        :param points_in: 输入的轨迹点数量
+        :param points_out: 输出的轨迹点数量
+        :return:
+        """
+        if not self.enabled or not self.stack or self.stack[-1]["name"] != name:
+            return
+        current = self.stack.pop()
+        elapsed = time.perf_counter() - current["start"]
+        peak_memory = max(current["peak_memory"], tracemalloc.get_traced_memory()[1])
+        if self.stack:
+            self.stack[-1]["inner_time"] += elapsed
+            self.stack[-1]["peak_memory"] = max(self.stack[-1]["peak_memory"], peak_memory)
+
+        info = self.phases.setdefault(name, {"wall_time": 0.0, "points_in": points_in, "points_out": points_out,
+                                             "peak_memory_mb": 0.0})
+        info["wall_time"] = round(info["wall_time"] + elapsed - current["inner_time"], 6)
+        if points_out is not None:
+            info["points_out"] = points_out
+        peak_memory = max(0, peak_memory - current["start_memory"]) / 1024 / 1024
+        info["peak_memory_mb"] = round(max(info["peak_memory_mb"], peak_memory), 3)
+
+    def __perf_info(self):
+        """
+        当前的性能记录：总耗时、各环节的信息（复制，之后的记录不影响已写入的结果）
+        :return: 性能记录
+        """
+        return {"total_time": round(time.perf_counter() - self.start_time, 6),
+                "phases": {name: dict(info) for name, info in self.phases.items()}}
+
+    def record(self, data_info):
+        """
+        将当前的性能记录写入data_info（即meta）的perf字段，不结束记录
+        在保存文件之前调用，使保存的文件同样包含性能记录（不含保存环节），结束时由finish更新为完整的记录
+        :param data_info: 轨迹数据相关信息
+        :return:
+        """
+        if not self.enabled or data_info is None:
+            return
+        data_info["perf"] = self.__perf_info()
+
+    def finish(self, data_info, logger=None, stage="", data_name=""):
+        """
+        结束记录：结果写入data_info（即meta）的perf字段，并输出一行结构化日志（json）
+        :param data_info: 轨迹数据相关信息
+        :param logger: 日志对象
+        :param stage: 处理环节名称
+        :param data_name: 轨迹文件名称
+        :return:
+        """
+        if not self.enabled:
+            return
+        if self.tracemalloc_flag:
+            tracemalloc.stop()
+            self.tracemalloc_flag = False
+        self.stack = []
+
+        perf_info = self.__perf_info()
+        if data_info is not None:
+            data_info["perf"] = perf_info
+        if logger is not None:
+            logger.info("perf " + json.dumps({"stage": stage, "data_name": data_name, **perf_info},
+                                             ensure_ascii=False))
@@ -0,0 +1,54 @@
+import threading
+import numpy as np
+from pyproj import CRS, Transformer
+
+WGS84_CRS = "EPSG:4326"
+
+# 进程内共享的坐标转换器（键为源坐标系、目标坐标系），避免每个模块、每个缺失段重复构建
+_transformer_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_transformer(from_crs, to_crs):
+    """
+    获取共享的坐标转换器（经度在前、纬度在后）；pyproj 3.1及以上版本的Transformer可以在多线程间共享
+    :param from_crs: 源坐标系，例如"EPSG:4326"
+    :param to_crs: 目标坐标系，例如"EPSG:32651"
+    :return: pyproj.Transformer
+    """
+    key = (str(from_crs), str(to_crs))
+    with _registry_lock:
+        transformer = _transformer_registry.get(key)
+        if transformer is None:
+            transformer = Transformer.from_crs(CRS(from_crs), CRS(to_crs), always_xy=True)
+            _transformer_registry[key] = transformer
+        return transformer
+
+
+def get_utm_crs(lng, lat, utm_zone=None):
+    """
+    确定UTM投影坐标系：默认根据坐标中心（经纬度均值）所在的6度带确定，也可以指定带号；南北半球根据中心的纬度确定
+    :param lng: 经度（数组）
+    :param lat: 纬度（数组）
+    :param utm_zone: UTM带号（1~60），默认为None（自动确定）
+    :return: 坐标系，例如"EPSG:32651"（北半球第51带，东经120°~126°）
+    """
+    center_lng = float(np.mean(lng))
+    center_lat = float(np.mean(lat))
+    if utm_zone is None:
+        utm_zone = int(np.floor((center_lng + 180) / 6)) % 60 + 1
+    elif not 1 <= utm_zone <= 60:
+        raise Exception(f"UTM带号需在1~60之间：{utm_zone}")
+    return f"EPSG:{(32600 if center_lat >= 0 else 32700) + utm_zone}"
+
+
+def get_utm_transformers(lng, lat, utm_zone=None):
+    """
+    获取经纬度（wgs84）与UTM投影坐标相互转换的共享转换器，投影带的确定方式见get_utm_crs
+    :param lng: 经度（数组）
+    :param lat: 纬度（数组）
+    :param utm_zone: UTM带号（1~60），默认为None（自动确定）
+    :return: 经纬度 ==> 投影坐标的转换器、投影坐标 ==> 经纬度的转换器
+    """
+    utm_crs = get_utm_crs(lng, lat, utm_zone)
+    return get_transformer(WGS84_CRS, utm_crs), get_transformer(utm_crs, WGS84_CRS)
@@ -0,0 +1,215 @@
+import json
+import struct
+import zipfile
+import geojson
+import numpy as np
+import pandas as pd
+
+# 轨迹点的各个字段（列）
+COLUMNS = ["lng", "lat", "timestamp", "speed", "direction"]
+
+
+class TrajData(object):
+    """
+    列式存储的轨迹数据：lng、lat、timestamp、speed、direction分别为连续的numpy数组，meta为轨迹相关信息
+    各个处理模块（降噪、抽稀、补全）之间直接传递该对象，仅在读取、保存文件时与geojson相互转换
+    """
+    def __init__(self, lng, lat, timestamp=None, speed=None, direction=None, meta=None):
+        self.lng = np.ascontiguousarray(lng, dtype=np.float64)
+        self.lat = np.ascontiguousarray(lat, dtype=np.float64)
+        # 时间戳单位为ms，指定为int64避免超出范围
+        self.timestamp = None if timestamp is None else np.ascontiguousarray(timestamp, dtype=np.int64)
+        self.speed = None if speed is None else np.ascontiguousarray(speed, dtype=np.float32)
+        self.direction = None if direction is None else np.ascontiguousarray(direction, dtype=np.float32)
+        # 若为geojson，轨迹信息对应meta字段
+        self.meta = {} if meta is None else meta
+
+        if len(self.lng) != len(self.lat):
+            raise Exception("轨迹数据的经度、纬度数量不一致")
+        for name in ["timestamp", "speed", "direction"]:
+            values = getattr(self, name)
+            if values is not None and len(values) != len(self.lng):
+                raise Exception(f"轨迹数据的{name}与坐标数量不一致")
+
+    def __len__(self):
+        return len(self.lng)
+
+    @property
+    def coordinates(self):
+        """
+        经纬度坐标数组，形状为(N,2)
+        :return: 坐标数组
+        """
+        return np.column_stack((self.lng, self.lat))
+
+    def take(self, index):
+        """
+        根据索引（或者布尔掩码）筛选轨迹点，meta保持不变
+        :param index: 轨迹点索引或者布尔掩码
+        :return: 筛选后的轨迹数据
+        """
+        return TrajData(self.lng[index], self.lat[index],
+                        None if self.timestamp is None else self.timestamp[index],
+                        None if self.speed is None else self.speed[index],
+                        None if self.direction is None else self.direction[index],
+                        self.meta)
+
+    @classmethod
+    def from_pd(cls, data, meta=None):
+        """
+        dataframe转换为TrajData
+        :param data: dataframe格式的轨迹数据
+        :param meta: 轨迹数据相关信息
+        :return: TrajData格式的轨迹数据
+        """
+        return cls(data["lng"].values, data["lat"].values,
+                   data["timestamp"].values if "timestamp" in data else None,
+                   data["speed"].values if "speed" in data else None,
+                   data["direction"].values if "direction" in data else None,
+                   meta)
+
+    def to_pd(self):
+        """
+        TrajData转换为dataframe（列名与geojson_to_pd一致）
+        :return: dataframe格式的轨迹数据
+        """
+        columns = {"lng": self.lng, "lat": self.lat}
+        if self.timestamp is not None:
+            columns["timestamp"] = self.timestamp
+        if self.direction is not None:
+            columns["direction"] = self.direction
+        if self.speed is not None:
+            columns["speed"] = self.speed
+        return pd.DataFrame(columns)
+
+    @classmethod
+    def from_geojson(cls, data):
+        """
+        geojson转换为TrajData
+        :param data: geojson格式的轨迹数据
+        :return: TrajData格式的轨迹数据
+        """
+        for feature in data["features"]:
+            if feature["geometry"]["type"] == "LineString":
+                coordinates = np.asarray(feature["geometry"]["coordinates"], dtype=np.float64).reshape(-1, 2)
+                properties = feature["properties"]
+                return cls(coordinates[:, 0], coordinates[:, 1],
+                           properties.get("timestamps"), properties.get("speeds"), properties.get("directions"),
+                           data.get("meta"))
+        raise Exception("geojson中不包含LineString类型的轨迹")
+
+    def to_geojson(self):
+        """
+        TrajData转换为geojson，字段与pd_to_geojson一致（同样会更新meta中的起终点信息）
+        :return: geojson格式的轨迹数据
+        """
+        start_point = {"lng": float(self.lng[0]), "lat": float(self.lat[0])}
+        end_point = {"lng": float(self.lng[-1]), "lat": float(self.lat[-1])}
+        self.meta["start_point"] = start_point
+        self.meta["end_point"] = end_point
+
+        sp_properties = {"color": "green",
+                         "point": start_point,
+                         "popup": {"title": "起点"}}
+        ep_properties = {"color": "red",
+                         "point": end_point,
+                         "popup": {"title": "终点"}}
+        properties = {"color": "green",
+                      "start_point": start_point,
+                      "end_point": end_point}
+
+        if self.timestamp is not None:
+            start_time = str(self.timestamp[0])
+            end_time = str(self.timestamp[-1])
+
+            self.meta["start_time"] = start_time
+            self.meta["end_time"] = end_time
+
+            sp_properties["time"] = start_time
+            ep_properties["time"] = end_time
+
+            properties["start_time"] = start_time
+            properties["end_time"] = end_time
+            properties["timestamps"] = self.timestamp.tolist()
+        if self.speed is not None:
+            properties["speeds"] = float32_to_list(self.speed)
+        if self.direction is not None:
+            properties["directions"] = float32_to_list(self.direction)
+
+        sp = geojson.Feature(geometry=geojson.Point((start_point["lng"], start_point["lat"])),
+                             properties=sp_properties)
+        ep = geojson.Feature(geometry=geojson.Point((end_point["lng"], end_point["lat"])),
+                             properties=ep_properties)
+        line = geojson.Feature(geometry=geojson.LineString(self.coordinates.tolist()),
+                               properties=properties)
+
+        return geojson.FeatureCollection(features=[sp, ep, line], meta=self.meta)
+
+    def to_npz(self, file_path):
+        """
+        保存为npz文件（列式二进制格式）：各字段分别保存为一个数组，meta以json字符串保存
+        不压缩，读取时可以内存映射
+        :param file_path: 文件路径（后缀为.npz）
+        :return:
+        """
+        columns = {name: getattr(self, name) for name in COLUMNS if getattr(self, name) is not None}
+        with open(file_path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(self.meta, ensure_ascii=False)), **columns)
+
+    @classmethod
+    def from_npz(cls, file_path, mmap_mode="r"):
+        """
+        读取npz文件：各字段的数组以内存映射的方式加载（不复制、不解析），文件较大时加载几乎不耗时
+        :param file_path: 文件路径
+        :param mmap_mode: 内存映射模式，与np.load一致；None表示全部读入内存
+        :return: TrajData格式的轨迹数据
+        """
+        with np.load(file_path) as data:
+            if "meta" not in data or "lng" not in data or "lat" not in data:
+                raise Exception("npz文件中缺少轨迹数据（meta、lng、lat）")
+            meta = json.loads(data["meta"].item())
+            if mmap_mode is None:
+                columns = {name: data[name] for name in COLUMNS if name in data}
+            else:
+                columns = load_npz_memmap(file_path, [name for name in COLUMNS if name in data], mmap_mode)
+        return cls(meta=meta, **columns)
+
+
+def load_npz_memmap(file_path, names, mmap_mode="r"):
+    """
+    内存映射npz文件中的数组：npz为zip文件，未压缩时每个数组（.npy）在文件中连续存储，直接定位数据的起始位置
+    :param file_path: 文件路径
+    :param names: 数组名称列表
+    :param mmap_mode: 内存映射模式
+    :return: 数组（名称 ==> 数组）
+    """
+    arrays = {}
+    with zipfile.ZipFile(file_path) as zip_file, open(file_path, 'rb') as f:
+        for name in names:
+            info = zip_file.getinfo(name + '.npy')
+            if info.compress_type != zipfile.ZIP_STORED:
+                # 压缩的npz文件无法内存映射，读入内存
+                with zip_file.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            # zip本地文件头：固定30个字节，其后为文件名、扩展字段
+            f.seek(info.header_offset)
+            name_length, extra_length = struct.unpack('<HH', f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            arrays[name] = np.memmap(file_path, dtype=dtype, mode=mmap_mode, offset=f.tell(), shape=shape,
+                                     order='F' if fortran_order else 'C')
+    return arrays
+
+
+def float32_to_list(values):
+    """
+    float32数组转换为列表：按float32的最短表示输出（例如81.3，而不是81.30000305175781）
+    :param values: float32数组
+    :return: 列表
+    """
+    return values.astype(str).astype(np.float64).tolist()